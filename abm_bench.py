@@ -0,0 +1,211 @@
+"""
+无界面的性能基准：分别计时环境步进、单宿主更新、病毒传播和毒株总量，输出 JSON
+
+    python abm_bench.py --agents 50 1000 100000 --strains 1 10 50 --days 1 --output bench.json
+    python abm_bench.py --baseline bench.json        # 与保存的基准比较，变慢超过 tolerance 时返回 1
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from typing import List
+from lib.abm_model import *
+
+
+def measure(func, min_time: float, max_calls: int = 1_000_000) -> dict:
+    """重复调用 func 至少 min_time 秒；每次调用的耗时取中位数，减少状态变化与系统抖动的影响"""
+    durations, start = [], time.perf_counter()
+    while True:
+        begin = time.perf_counter()
+        func()
+        end = time.perf_counter()
+        durations.append(end - begin)
+        if end - start >= min_time or len(durations) >= max_calls:
+            break
+    median = float(np.median(durations))
+    return {'seconds_per_call': median, 'calls_per_sec': 1 / median, 'calls': len(durations),
+            'mean_seconds_per_call': float(np.mean(durations))}
+
+
+def peak_memory(func) -> int:
+    """func 执行期间 Python 与 numpy 分配的峰值内存（字节），单独运行，不计入耗时"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def strains_of(count: int) -> List[Virus]:
+    return [Virus(f's{k}', 1.0, ImmuneData(s=0.6 + 0.01 * k)) for k in range(count)]
+
+
+def build_environment(agents: int, strains: int, mode: str, seed: int = 0) -> ImmuneEnvironment:
+    """约每 25 个格子一个代理，1% 的代理（至少一个）携带全部毒株"""
+    side = max(10, int(math.sqrt(agents * 25)))
+    engine = PopulationEngine(capacity=agents) if mode != 'sequential' else None
+    env = ImmuneEnvironment(map_size=(side, side), engine=engine, transmission='grid', rng=random.Random(seed),
+                            sparse=mode == 'sparse')
+    viruses = strains_of(strains)
+    population = [ImmuneAgent(id=k, record_every=0) for k in range(agents)]
+    for agent in population[:max(1, agents // 100)]:
+        for virus in viruses:
+            agent.add_virus(virus)
+    env.add_agents(population)
+    return env
+
+
+def bench_step(agents: int, strains: int, mode: str, days: float, min_time: float) -> dict:
+    """ImmuneEnvironment.step：先推进 days 天使疫情展开，再计时"""
+    def run():
+        env = build_environment(agents, strains, mode)
+        for _ in range(int(round(days / env.step_time))):
+            env.step()
+        return env
+    env = run()
+    result = measure(env.step, min_time)
+    result['peak_memory_bytes'] = peak_memory(run)
+    result['steps_per_sec'] = result['calls_per_sec']
+    return result
+
+
+def bench_update(strains: int, min_time: float) -> dict:
+    """MultiSimulation.update：单个宿主一个子步"""
+    def build():
+        sim = MultiSimulation(ImmuneData(), 1e-2, record_every=0)
+        for virus in strains_of(strains):
+            sim.add_virus(virus)
+        return sim
+    sim = build()
+    result = measure(sim.update, min_time)
+    result['peak_memory_bytes'] = peak_memory(lambda: [build().update() for _ in range(10)])
+    return result
+
+
+def bench_spread(agents: int, strains: int, min_time: float) -> dict:
+    """ImmuneAgent.spread_virus：一个传染源对 agents 个目标"""
+    rng = random.Random(0)
+    def build():
+        source = ImmuneAgent(id='source', position=(50, 50), record_every=0)
+        for virus in strains_of(strains):
+            source.add_virus(virus)
+        targets = [ImmuneAgent(id=k, position=(rng.randint(45, 55), rng.randint(45, 55)), record_every=0)
+                   for k in range(agents)]
+        return source, targets
+    source, targets = build()
+    result = measure(lambda: source.spread_virus(targets), min_time)
+    result['peak_memory_bytes'] = peak_memory(lambda: build()[0].spread_virus(build()[1]))
+    return result
+
+
+def total_from_history(history: StrainHistory) -> list:
+    """按毒株历史逐列重新求和并转成列表，与旧 MultiList.total 做的事情相同"""
+    return np.sum([history.history(id) for id in history.ids], axis=0).tolist()
+
+
+def bench_total(strains: int, days: float, min_time: float) -> dict:
+    """毒株总量：记录 days 天完整历史后，从各毒株的历史重新汇总出逐列总和（不读取增量维护的 total）"""
+    def build():
+        sim = MultiSimulation(ImmuneData(), 1e-2, record_every=1)
+        for virus in strains_of(strains):
+            sim.add_virus(virus)
+        sim.simulate(days)
+        return sim
+    sim = build()
+    result = measure(lambda: total_from_history(sim.virus_values), min_time)
+    result['peak_memory_bytes'] = peak_memory(build)
+    return result
+
+
+def run_benchmarks(args) -> List[dict]:
+    results = []
+
+    def add(name: str, params: dict, func):
+        print(f'{name} {params} ...', file=sys.stderr, flush=True)
+        results.append({'name': name, 'params': params, **func()})
+
+    for agents in args.agents:
+        for strains in args.strains:
+            for mode in args.modes:
+                if mode == 'sequential' and agents > args.sequential_limit: continue
+                add('env_step', {'agents': agents, 'strains': strains, 'mode': mode, 'days': args.days},
+                    lambda: bench_step(agents, strains, mode, args.days, args.min_time))
+            add('spread_virus', {'agents': min(agents, args.spread_limit), 'strains': strains},
+                lambda: bench_spread(min(agents, args.spread_limit), strains, args.min_time))
+    for strains in args.strains:
+        add('multisim_update', {'strains': strains}, lambda: bench_update(strains, args.min_time))
+        add('strain_total', {'strains': strains, 'days': args.days}, lambda: bench_total(strains, args.days, args.min_time))
+    return results
+
+
+def key_of(result: dict) -> str:
+    return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[dict]:
+    """按 (名称, 参数) 与基准对比每次调用的耗时，ratio > 1 + tolerance 视为回退"""
+    reference = {key_of(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        base = reference.get(key_of(result))
+        if base is None: continue
+        result['baseline_seconds_per_call'] = base['seconds_per_call']
+        result['ratio'] = result['seconds_per_call'] / base['seconds_per_call']
+        if result['ratio'] > 1 + tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def print_table(results: List[dict]):
+    print(f'{"benchmark":<16} {"params":<60} {"s/call":>12} {"calls/s":>12} {"peak MB":>9} {"ratio":>7}', file=sys.stderr)
+    for result in results:
+        params = ' '.join(f'{k}={v}' for k, v in result['params'].items())
+        ratio = f'{result["ratio"]:.2f}' if 'ratio' in result else '-'
+        print(f'{result["name"]:<16} {params:<60} {result["seconds_per_call"]:>12.3e} {result["calls_per_sec"]:>12.1f} '
+              f'{result["peak_memory_bytes"] / 2 ** 20:>9.1f} {ratio:>7}', file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Headless benchmarks for the simulation hot paths')
+    parser.add_argument('--agents', type=int, nargs='+', default=[50, 1000, 10000, 100000])
+    parser.add_argument('--strains', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--days', type=float, default=1.0, help='simulated days before timing / of recorded history')
+    parser.add_argument('--modes', nargs='+', default=['sequential', 'engine', 'sparse'], choices=['sequential', 'engine', 'sparse'])
+    parser.add_argument('--sequential-limit', type=int, default=2000, help='skip the sequential mode above this many agents')
+    parser.add_argument('--spread-limit', type=int, default=10000, help='cap on spread_virus targets')
+    parser.add_argument('--min-time', type=float, default=0.5, help='minimum timed seconds per benchmark')
+    parser.add_argument('--output', help='write results as JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', help='JSON file from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a result counts as a regression')
+    args = parser.parse_args(argv)
+
+    report = {'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                       'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+              'results': run_benchmarks(args)}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report['results'], json.load(f), args.tolerance)
+        report['regressions'] = [key_of(result) for result in regressions]
+    print_table(report['results'])
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    for result in regressions:
+        print(f'REGRESSION {key_of(result)}: {result["ratio"]:.2f}x slower than baseline', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import random
 import string
 import abc
+import itertools
+import collections.abc
+import numpy as np
 from typing import Union
 
 
@@ -16,6 +19,8 @@ def clamp_value(value: float, min_value: float, max_value: float) -> float:
 
 
 class Base:
+    __slots__ = ('id',)  # 未声明 __slots__ 的子类（环境、日程……）仍然有 __dict__
+
     def __init__(self, id: str = generate_random_string(4)):
         self.id = id
 
@@ -31,23 +36,143 @@ class Environment:
 
 class Action:
     @abc.abstractmethod
-    def schedule(self, agent:Agent, env:Environment):...
+    def schedule(self, agent:Agent, env:Environment) -> Environment:
+        """返回 env（代理编排时所在的环境）中的 agent 在该时段应在的环境；None 表示留在 env"""
+
+class MoveTo(Action):
+    def __init__(self, target:Environment):
+        """把整个群组移到 target"""
+        self.target = target
+
+    def schedule(self, agent:Agent, env:Environment) -> Environment:
+        return self.target
+
+class Stay(Action):
+    def schedule(self, agent:Agent, env:Environment) -> Environment:
+        return None
 
 class Schedule(Base):
-    def __init__(self, id: str = generate_random_string(4)):
+    def __init__(self, id: str = generate_random_string(4), periods:int = 1):
+        """
+        一天的时间表：periods 个时段，每个时段为若干群组指定所在的环境
+
+        群组是编排时某个环境中的代理（例如一个班），add 为它在指定时段安排一个 Action；
+        没有安排的时段，代理回到编排时所在的环境。compile 只执行一次全部 Action，
+        得到按时段排列的目标环境编号，之后每个时段的移动都是批量转移。
+        各环境共用同一个 PopulationEngine 时，移动的代理不需要在引擎之间迁移。
+        """
         super().__init__(id)
-        self._schedule = []
-    
-    def add(self, env:Environment, action:type[Action]):...
+        self.periods = periods
+        self._schedule = []  # (环境, 动作, 时段, 群组)
+
+    def add(self, env:Environment, action:Union[Action, type[Action], Environment], periods=None, cohort:list[Agent]=None):
+        """
+        在 periods（时段编号，默认全部时段）中对 env 的代理执行 action
+
+        action: Action 实例、无参数的 Action 子类，或直接给出目标环境（相当于 MoveTo）
+        cohort: 只安排 env 中的这些代理，默认编排时 env 中的全部代理；同一代理的后加入的安排覆盖先加入的
+        """
+        if isinstance(action, Environment):
+            action = MoveTo(action)
+        elif isinstance(action, type):
+            action = action()
+        periods = range(self.periods) if periods is None else [periods] if isinstance(periods, int) else list(periods)
+        for period in periods:
+            if not 0 <= period < self.periods:
+                raise ValueError(f'Period {period} is outside 0..{self.periods - 1}')
+        self._schedule.append((env, action, list(periods), cohort))
+
+    def compile(self, root:Environment) -> 'Timetable':
+        """以 root 层级当前的代理分布为各代理的归属，执行所有 Action 并生成 Timetable"""
+        envs = root.environments()
+        key = {id(env): k for k, env in enumerate(envs)}
+        agents = [agent for env in envs for agent in env._agents]
+        home = np.array([key[id(env)] for env in envs for _ in env._agents], dtype=int)
+        number = {id(agent): k for k, agent in enumerate(agents)}
+        target = np.tile(home, (self.periods, 1))
+        for env, action, periods, cohort in self._schedule:
+            if id(env) not in key:
+                raise ValueError(f'Environment {env.id!r} is not part of {root.id!r}')
+            members = env._agents if cohort is None else cohort
+            for agent in members:
+                if id(agent) not in number or home[number[id(agent)]] != key[id(env)]:
+                    raise ValueError(f'Agent {agent.id!r} is not in environment {env.id!r}')
+                k = number[id(agent)]
+                for period in periods:
+                    destination = action.schedule(agent, env)
+                    if destination is None:
+                        destination = env
+                    elif id(destination) not in key:
+                        raise ValueError(f'Environment {destination.id!r} is not part of {root.id!r}')
+                    target[period, k] = key[id(destination)]
+        return Timetable(envs, agents, home, target)
+
+class Timetable:
+    def __init__(self, envs:list[Environment], agents:list[Agent], home:np.ndarray, target:np.ndarray):
+        """
+        Schedule.compile 的结果：target[时段, 代理] 为环境编号（envs 中的下标，即 root.environments() 的先序）
+
+        相邻时段之间的移动预先按 (来源, 目标) 分组为代理下标数组，apply 只对这些代理做批量转移；
+        跨天时最后一个时段接第 0 个时段。
+        """
+        self.envs = envs
+        self.agents = agents
+        self.home = home
+        self.target = target
+        self.periods = len(target)
+        self.period = None  # 最近一次 apply 的时段，None 表示代理仍在编排时的位置
+        self._moves = [self._group(target[period - 1], target[period]) for period in range(self.periods)]
+
+    def _group(self, source:np.ndarray, target:np.ndarray) -> list[tuple[int, int, np.ndarray]]:
+        """source 与 target 不同的代理按 (来源, 目标) 分组，组内保持代理的编号顺序"""
+        moving = np.flatnonzero(source != target)
+        code = source[moving] * len(self.envs) + target[moving]
+        order = np.argsort(code, kind='stable')
+        codes, starts = np.unique(code[order], return_index=True)
+        groups = np.split(moving[order], starts[1:])
+        return [(int(c // len(self.envs)), int(c % len(self.envs)), group) for c, group in zip(codes.tolist(), groups)]
+
+    def moves(self, period:int) -> list[tuple[int, int, np.ndarray]]:
+        """进入 period 时的移动 [(来源编号, 目标编号, 代理下标)]；与 apply 相同，从当前时段出发"""
+        if self.period == (period - 1) % self.periods:
+            return self._moves[period]
+        current = self.home if self.period is None else self.target[self.period]
+        return self._group(current, self.target[period])
+
+    def apply(self, period:int) -> int:
+        """把代理移到 period 的位置，返回移动的代理数；已不在来源环境中的代理（被移除或另行转移）跳过"""
+        moved = 0
+        for source, target, members in self.moves(period):
+            agents = self.agents
+            moved += len(self.envs[source].transfer_agents_to(self.envs[target], [agents[k] for k in members.tolist()]))
+        self.period = period
+        return moved
+
+    def advance(self) -> int:
+        """进入下一个时段（最后一个时段之后回到第 0 个）"""
+        return self.apply(0 if self.period is None else (self.period + 1) % self.periods)
+
+    def submit(self, runner, period:int):
+        """
+        多进程推进时，把进入 period 的移动交给 ShardedRunner（环境编号相同），在本步结束时执行；
+        按代理 id 转移，同一来源环境中的 id 需要互不相同
+        """
+        for source, target, members in self.moves(period):
+            runner.transfer(source, target, [self.agents[k].id for k in members.tolist()])
+        self.period = period
 
 class Agent(Base):
+    # 代理数量可达百万级，固定属性放在 __slots__ 中；保留 __dict__ 槽位以便给代理附加任意属性（例如供 filter_agents 查询），
+    # 它只在第一次附加属性时才创建，没有附加属性的代理只多一个指针
+    __slots__ = ('position', '__dict__')
+
     def __init__(self, id: str = generate_random_string(4), position:tuple=None):
         super().__init__(id)
         self.position = position if position is not None else (0, 0)
     
-    def move(self, grid_size:tuple):
+    def move(self, grid_size:tuple, rng:random.Random=None):
         # 随机选择上下左右移动
-        direction = random.choice(["up", "down", "left", "right"])
+        direction = (rng or random).choice(["up", "down", "left", "right"])
         x, y = self.position  # 当前坐标
         if direction == "up" and y < grid_size[1] - 1:
             y += 1
@@ -59,10 +184,122 @@ class Agent(Base):
             x += 1
         self.position = (x, y)  # 更新位置
 
+class AgentView(collections.abc.Sequence):
+    def __init__(self, lists:list[list[Agent]]):
+        """多个代理列表首尾相接的只读视图，不复制也不修改原列表，原列表的变化会直接反映出来"""
+        self._lists = lists
+
+    def __len__(self) -> int:
+        return sum(len(agents) for agents in self._lists)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._lists)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(itertools.islice(self, *index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for agents in self._lists:
+                if index < len(agents): return agents[index]
+                index -= len(agents)
+        raise IndexError('AgentView index out of range')
+
+class AttributeIndex:
+    def __init__(self, attribute:str, threshold:float=None):
+        """
+        按代理属性分桶的二级索引，由 Environment.add_index 创建并随环境的增删同步维护
+
+        键为 getattr(agent, attribute, None)；给出 threshold 时为 该值 >= threshold 的布尔值（例如按病毒量区分感染状态）。
+        索引按环境中的下标记录代理：每个下标的当前键、在桶中的位置，桶内用交换删除，
+        增、删、改键都是 O(1)，查询某个键的成员、数量与抽样与结果大小成正比。
+        """
+        self.attribute = attribute
+        self.threshold = threshold
+        self._keys = []  # 下标 -> 当前键
+        self._where = []  # 下标 -> 在桶中的位置
+        self._buckets = {}  # 键 -> 下标列表
+
+    def key(self, agent:Agent):
+        value = getattr(agent, self.attribute, None)
+        if self.threshold is None: return value
+        return value is not None and value >= self.threshold
+
+    def _insert(self, slot:int, key):
+        bucket = self._buckets.setdefault(key, [])
+        self._where[slot] = len(bucket)
+        bucket.append(slot)
+
+    def _discard(self, slot:int):
+        key = self._keys[slot]
+        bucket = self._buckets[key]
+        last = bucket.pop()
+        if last != slot:
+            bucket[self._where[slot]] = last
+            self._where[last] = self._where[slot]
+        elif not bucket:
+            del self._buckets[key]
+
+    def append(self, agent:Agent):
+        """环境在末尾加入了一个代理"""
+        key = self.key(agent)
+        self._keys.append(key)
+        self._where.append(0)
+        self._insert(len(self._keys) - 1, key)
+
+    def remove(self, slot:int):
+        """环境删除了 slot 处的代理，并把最后一个代理移到 slot"""
+        self._discard(slot)
+        last = len(self._keys) - 1
+        if slot != last:
+            key = self._keys[slot] = self._keys[last]
+            self._where[slot] = self._where[last]
+            self._buckets[key][self._where[slot]] = slot
+        self._keys.pop()
+        self._where.pop()
+
+    def update(self, slot:int, agent:Agent):
+        """重新计算 slot 处代理的键，变化时换桶"""
+        key = self.key(agent)
+        if key != self._keys[slot]:
+            self._discard(slot)
+            self._keys[slot] = key
+            self._insert(slot, key)
+
+    def refresh(self, agents:list[Agent]):
+        """按环境的完整代理列表重新计算所有键，只移动键变化的代理"""
+        keys = [self.key(agent) for agent in agents]
+        for slot in [slot for slot, (old, new) in enumerate(zip(self._keys, keys)) if old != new]:
+            self._discard(slot)
+            self._keys[slot] = keys[slot]
+            self._insert(slot, keys[slot])
+
+    def rebuild(self, agents:list[Agent]):
+        self._keys, self._where, self._buckets = [], [], {}
+        for agent in agents:
+            self.append(agent)
+
+    def slots(self, value) -> list[int]:
+        """键为 value 的代理在环境中的下标（只读，不要修改）"""
+        return self._buckets.get(value, [])
+
+    def count(self, value) -> int:
+        return len(self._buckets.get(value, ()))
+
+    def values(self) -> list:
+        return list(self._buckets)
+
 class Environment(Base):
-    def __init__(self, id: str = generate_random_string(4), generate_agents:tuple[Agent, int]=None, agents:list[Agent]=None, sub_env:list[Environment]=None, parent_env:list[Environment]=None, map_size:tuple=None):
+    # 与 Agent.move 相同顺序的方向：上、下、左、右
+    DIRECTIONS = np.array([[0, 1], [0, -1], [-1, 0], [1, 0]])
+
+    def __init__(self, id: str = generate_random_string(4), generate_agents:tuple[Agent, int]=None, agents:list[Agent]=None, sub_env:list[Environment]=None, parent_env:list[Environment]=None, map_size:tuple=None, rng:random.Random=None):
         super().__init__(id)
-        self._agents = agents if agents is not None else []
+        self.rng = rng if rng is not None else random  # 默认使用全局 random，可传入独立的 random.Random 以便复现
+        self._np_rng = None  # 批量移动使用的 numpy Generator，首次使用时由 rng 派生种子
+        self._indexes: dict[tuple, AttributeIndex] = {}  # (属性, 阈值) -> 二级索引
+        self._init_agents(agents if agents is not None else [])
         self._sub_env = sub_env if sub_env is not None else []
         self._parent_env = parent_env if parent_env is not None else []
         self.map_size = map_size if map_size is not None else (10, 10)
@@ -72,20 +309,101 @@ class Environment(Base):
                 self._generate(agent_class, number)
     
     def _generate(self, Agent: type[Agent], number: int):
-        print(number)
-        for i in range(number):
-            x = random.randint(0, self.map_size[0] - 1)
-            y = random.randint(0, self.map_size[1] - 1)
-            self._agents.append(Agent(id=f'{self.id}_{i}', position=(x, y)))
+        positions = self.random_positions(number)
+        for i, (x, y) in enumerate(positions):
+            self._append(Agent(id=f'{self.id}_{i}', position=(x, y)))
+
+    def _init_agents(self, agents:list[Agent]):
+        """
+        以 agents 作为本环境的代理列表，并建立 id(agent) -> 下标 的索引。
+        代理列表只能经由 add_agent、remove_agents 等方法修改，直接改动列表会使索引失效
+        """
+        self._agents = agents
+        self._slot_of = {id(agent): k for k, agent in enumerate(agents)}
+        for index in self._indexes.values():
+            index.rebuild(agents)
+
+    def __getstate__(self):
+        # id(agent) 在反序列化后会改变，索引在 __setstate__ 中重建；二级索引只记录下标，原样保留
+        state = self.__dict__.copy()
+        del state['_slot_of']
+        state['id'] = self.id
+        return state
+
+    def __setstate__(self, state:dict):
+        self.id = state.pop('id')
+        self.__dict__.update(state)
+        self._slot_of = {id(agent): k for k, agent in enumerate(self._agents)}
+
+    def __contains__(self, agent:Agent) -> bool:
+        return id(agent) in self._slot_of
+
+    def _append(self, agent:Agent):
+        if id(agent) in self._slot_of:
+            raise ValueError(f'Agent {agent.id!r} is already in environment {self.id!r}')
+        self._slot_of[id(agent)] = len(self._agents)
+        self._agents.append(agent)
+        for index in self._indexes.values():
+            index.append(agent)
+
+    def _discard(self, agent:Agent) -> bool:
+        """交换删除：最后一个代理移到被删除代理的位置，O(1)；代理不在本环境时返回 False"""
+        slot = self._slot_of.pop(id(agent), None)
+        if slot is None: return False
+        last = self._agents.pop()
+        if slot < len(self._agents):
+            self._agents[slot] = last
+            self._slot_of[id(last)] = slot
+        for index in self._indexes.values():
+            index.remove(slot)
+        return True
     
     def resize_map(self, x:int, y:int):
         self.map_size = (x, y)
+
+    @property
+    def np_rng(self) -> np.random.Generator:
+        if self._np_rng is None:
+            self._np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        return self._np_rng
+
+    @np_rng.setter
+    def np_rng(self, generator: np.random.Generator):
+        self._np_rng = generator
+
+    def random_positions(self, number:int) -> list[tuple]:
+        """一次抽取 number 个地图内的随机位置"""
+        x = self.np_rng.integers(0, self.map_size[0], number)
+        y = self.np_rng.integers(0, self.map_size[1], number)
+        return list(zip(x.tolist(), y.tolist()))
     
     def replace_agents(self):
-        for agent in self._agents:
-            x = random.randint(0, self.map_size[0] - 1)
-            y = random.randint(0, self.map_size[1] - 1)
+        for agent, position in zip(self._agents, self.random_positions(len(self._agents))):
+            agent.position = position
+
+    def move_agents(self, agents:list[Agent]=None) -> np.ndarray:
+        """
+        批量随机游走：一次抽取所有代理的方向，边界处保持不动，与 Agent.move 的规则相同。
+        重写了 move 的自定义代理仍逐个调用自己的 move。
+        全部代理都按此规则移动时返回移动后的位置（n x 2，与 agents 同序），否则返回 None
+        """
+        agents = self._agents if agents is None else agents
+        walkers = []
+        for agent in agents:
+            if type(agent).move is Agent.move:
+                walkers.append(agent)
+            else:
+                agent.move(self.map_size, self.rng)
+        if not walkers: return None
+        position = np.fromiter(itertools.chain.from_iterable([agent.position for agent in walkers]),
+                               dtype=np.int64, count=2 * len(walkers)).reshape(-1, 2)
+        step = self.DIRECTIONS[self.np_rng.integers(0, 4, len(walkers))]
+        limit = np.array(self.map_size[:2], dtype=np.int64) - 1
+        allowed = ((step > 0) & (position < limit)) | ((step < 0) & (position > 0))
+        position += np.where(allowed, step, 0)
+        for agent, x, y in zip(walkers, position[:, 0].tolist(), position[:, 1].tolist()):
             agent.position = (x, y)
+        return position if len(walkers) == len(agents) else None
 
     def size(self, deepth:int=0) -> int:
         size = len(self._agents)
@@ -96,19 +414,33 @@ class Environment(Base):
         return size
     
     def get_agents(self, deepth:int=0):
-        agents = self._agents
+        """deepth 为 0 时返回本环境的代理列表；否则返回包含子环境（deepth 层，负数为全部）的只读拼接视图"""
+        if deepth == 0: return self._agents
+        return AgentView(self._agent_lists(deepth))
+
+    def _agent_lists(self, deepth:int) -> list[list[Agent]]:
+        lists = [self._agents]
         deepth -= 1
-        if deepth == -1: return agents
+        if deepth == -1: return lists
         for env in self._sub_env:
-            agents += env.get_agents(deepth=deepth)
-        return agents
+            lists += env._agent_lists(deepth)
+        return lists
+
+    def environments(self, deepth:int=-1) -> list[Environment]:
+        """按先序返回本环境及其 deepth 层以内的子环境（负数为全部）"""
+        envs = [self]
+        deepth -= 1
+        if deepth == -1: return envs
+        for env in self._sub_env:
+            envs += env.environments(deepth)
+        return envs
     
     def add(self, object):
-        if type(object) == Agent:
+        if isinstance(object, Agent):
             self.add_agent(object)
-        if type(object) == Environment:
+        if isinstance(object, Environment):
             self._sub_env.append(object)
-        if type(object) == list:
+        if isinstance(object, list):
             for obj in object:
                 self.add(obj)
     
@@ -117,21 +449,88 @@ class Environment(Base):
 
     def transfer_agent_to(self, target_env:Environment, agent:Agent):
         """将个体从当前环境转移到目标环境"""
-        if agent in self.agents:
-            self._agents.remove(agent)
+        if self._discard(agent):
             target_env.add_agent(agent)
+
+    def remove_agent(self, agent:Agent) -> bool:
+        """移除一个个体（O(1)，环境中最后一个代理会移到它的位置），返回它是否在本环境中"""
+        return self._discard(agent)
+
+    def remove_agents(self, agents:list[Agent]) -> list[Agent]:
+        """一次移除多个个体，耗时与移除的个数成正比，返回实际被移除的个体（按传入顺序）"""
+        return [agent for agent in agents if self._discard(agent)]
+
+    def transfer_agents_to(self, target_env:Environment, agents:list[Agent]) -> list[Agent]:
+        """批量版本的 transfer_agent_to"""
+        moved = self.remove_agents(agents)
+        target_env.add_agents(moved)
+        return moved
     
     def add_agent(self, agent:Agent):
         """在当前环境中随机放置个体"""
-        agent.position = (random.randint(0, self.map_size[0] - 1),
-                          random.randint(0, self.map_size[1] - 1))
-        self._agents.append(agent)
+        agent.position = (self.rng.randint(0, self.map_size[0] - 1),
+                          self.rng.randint(0, self.map_size[1] - 1))
+        self._append(agent)
+
+    def add_agents(self, agents:list[Agent]):
+        """批量加入个体，位置一次性抽取"""
+        for agent, position in zip(agents, self.random_positions(len(agents))):
+            agent.position = position
+            self._append(agent)
+
+    def add_index(self, attribute:str, threshold:float=None) -> AttributeIndex:
+        """
+        为代理属性建立二级索引（已存在时直接返回），之后 filter_agents、random_agents 按该属性查询时
+        只访问结果中的代理。threshold 给出时按 属性 >= threshold 分为 True / False 两桶。
+        增删代理时索引自动维护；属性在环境之外被修改后请调用 reindex（ImmuneEnvironment 推进代理时逐个更新）
+        """
+        index = self._indexes.get((attribute, threshold))
+        if index is None:
+            index = self._indexes[(attribute, threshold)] = AttributeIndex(attribute, threshold)
+            index.rebuild(self._agents)
+        return index
+
+    def index(self, attribute:str, threshold:float=None) -> AttributeIndex:
+        """返回已建立的索引，没有时返回 None"""
+        return self._indexes.get((attribute, threshold))
+
+    def reindex(self, agents:list[Agent]=None):
+        """代理属性变化后刷新二级索引；agents 为 None 时刷新本环境的全部代理，给出不在本环境中的代理时抛出 ValueError"""
+        if not self._indexes: return
+        if agents is not None:
+            slots = []
+            for agent in agents:
+                slot = self._slot_of.get(id(agent))
+                if slot is None:
+                    raise ValueError(f'Agent {agent.id!r} is not in environment {self.id!r}')
+                slots.append((slot, agent))
+        for index in self._indexes.values():
+            if agents is None:
+                index.refresh(self._agents)
+            else:
+                for slot, agent in slots:
+                    index.update(slot, agent)
     
-    def random_agents(self, number:int, deepth:int=0) -> list[Agent]:
-        agents = self.get_agents(deepth=deepth)
+    def random_agents(self, number:int, deepth:int=0, attribute:str=None, value=None) -> list[Agent]:
+        """随机抽取 number 个代理；给出 attribute 时只在该属性等于 value 的代理中抽取"""
+        if attribute is None:
+            agents = self.get_agents(deepth=deepth)
+        elif deepth == 0 and (attribute, None) in self._indexes:
+            slots = self._indexes[(attribute, None)].slots(value)
+            return [self._agents[slot] for slot in self.rng.sample(slots, min(number, len(slots)))]
+        else:
+            agents = self.filter_agents(attribute, value, deepth)
         sample_size = min(number, len(agents))
-        return random.sample(agents, sample_size)
+        return self.rng.sample(agents, sample_size)
     
     def filter_agents(self, attribute:str, value, deepth:int=0) -> list[Agent]:
-        return [agent for agent in self.get_agents(deepth=deepth) if getattr(agent, attribute, None) == value]
+        """属性等于 value 的代理；建立了索引的环境只访问结果中的代理（顺序为索引中的顺序）"""
+        result = []
+        for env in self.environments(deepth):
+            index = env._indexes.get((attribute, None))
+            if index is None:
+                result += [agent for agent in env._agents if getattr(agent, attribute, None) == value]
+            else:
+                result += [env._agents[slot] for slot in index.slots(value)]
+        return result
     
\ No newline at end of file
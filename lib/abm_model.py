@@ -1,17 +1,62 @@
 from lib.abm import Agent, Environment, generate_random_string
 from .abm import *
 from .iiim_model import *
-from typing import Union, List, Tuple
+from .population import *
+from .spatial import ArrayGridIndex, GridIndex
+from .recorder import TrajectoryRecorder
+from .observer import Aggregates, Observer, StepRecord
+from . import field
+from . import profiler
+from . import telemetry
+from typing import Iterable, Iterator, List, Tuple
+import heapq
 import math
 
 class ImmuneAgent(Agent):
-    def __init__(self, id: str = generate_random_string(4), position: Tuple[int, int] = None, dt=1e-2, data:ImmuneData=ImmuneData()):
+    __slots__ = ('virus_simulation', 'immunity_level', 'virus_level')
+    infection_radius = 5.0  # 最大影响距离
+
+    def __init__(self, id: str = generate_random_string(4), position: Tuple[int, int] = None, dt=1e-2, data:ImmuneData=ImmuneData(), record_every: int = 1, engine: PopulationEngine = None):
+        """
+        data: 宿主的免疫参数，ImmuneData 不可变（frozen），所有代理可以共享同一个对象，修改参数请用 dataclasses.replace 生成新对象
+        engine: 直接在批量引擎中新建一行作为病毒模拟（dt 必须与引擎一致），不构造 MultiSimulation；
+                大规模人群请使用这种方式，并与 ImmuneEnvironment(engine=...) 搭配
+        """
         super().__init__(id, position)
-        self.virus_simulation = MultiSimulation(native_immune=data, dt=dt)
+        if engine is None:
+            self.virus_simulation = MultiSimulation(native_immune=data, dt=dt, record_every=record_every)
+        else:
+            self.virus_simulation = engine.spawn(data, dt)
         self.immunity_level = 0.0
         self.virus_level = 0.0
-        self.dt = dt
-        self.add_virus = self.virus_simulation.add_virus
+
+    @property
+    def dt(self) -> float:
+        """只读：步长由 virus_simulation 决定（构造时的 dt 或引擎的 dt），不能再赋值修改"""
+        return self.virus_simulation.dt
+
+    def add_virus(self, virus: Virus):
+        self.virus_simulation.add_virus(virus)
+
+    def add_virus_batch(self, strains, doses):
+        """按 STRAINS 编号与剂量批量加入病毒，不创建 Virus 对象"""
+        self.virus_simulation.add_virus_batch(strains, doses)
+
+    def bind(self, engine: PopulationEngine) -> EngineSimulation:
+        """把病毒模拟迁入批量引擎，之后 virus_simulation 只是引擎中一行的视图"""
+        sim = self.virus_simulation
+        if isinstance(sim, EngineSimulation):
+            if sim.engine is engine: return sim
+            sim = sim.engine.release(sim.row)
+        self.virus_simulation = engine.adopt(sim)
+        return self.virus_simulation
+
+    def unbind(self) -> MultiSimulation:
+        """从批量引擎中取回独立的病毒模拟并释放引擎中的行，例如在代理离开当前进程之前"""
+        sim = self.virus_simulation
+        if isinstance(sim, EngineSimulation):
+            self.virus_simulation = sim.engine.release(sim.row)
+        return self.virus_simulation
 
     def update_immunity(self, day=0.1):
         """更新免疫水平和病毒模拟"""
@@ -21,21 +66,17 @@ class ImmuneAgent(Agent):
 
     def spread_virus(self, other_agents: List[Agent]):
         """尝试感染周围的代理，并按距离计算感染比例"""
+        sim = self.virus_simulation
+        strains = sim.strain_indices.tolist()
+        levels = np.abs(sim.latest_virus_values()).tolist()  # 比例非负，abs(level * ratio) == abs(level) * ratio
         for other in other_agents:
             if other.id == self.id: continue
             if self.position != other.position:  # 仅在不同位置的代理之间传播
                 distance = self.calculate_distance(other)
                 infection_ratio = self.calculate_infection_ratio(distance)
-                for v in self.virus_simulation.infected_virus:
-                    level = self.virus_simulation.virus_values.lists[v.id][-1]
-                    other.add_virus(Virus(v.id, abs(level * infection_ratio), system=v.system, native=v.native))
-                    #print(f'Agent {self.id} increased Agent {other.id}\'s virus {v.id} level by {abs(level * infection_ratio):.2f} (Distance: {distance:.2f})')
             else:
                 infection_ratio = 0.9
-                for v in self.virus_simulation.infected_virus:
-                    level = self.virus_simulation.virus_values.lists[v.id][-1]
-                    other.add_virus(Virus(v.id, abs(level * infection_ratio), system=v.system, native=v.native))
-                #print(f'Agent {self.id} increased Agent {other.id}\'s virus {v.id} level by {abs(level * infection_ratio):.2f} (Distance: 0)')
+            other.add_virus_batch(strains, [level * infection_ratio for level in levels])
 
     def calculate_distance(self, other: Agent) -> float:
         """计算当前代理与其他代理之间的距离"""
@@ -43,31 +84,374 @@ class ImmuneAgent(Agent):
 
     def calculate_infection_ratio(self, distance: float) -> float:
         """根据距离计算感染比例"""
-        max_distance = 5.0  # 最大影响距离
+        max_distance = self.infection_radius  # 最大影响距离
         if distance <= max_distance:
             return 1 - (distance / max_distance)  # 距离越近，比例越高
         return 0.0  # 超过最大距离，不感染
 
+    def infection_ratios(self, distance: np.ndarray) -> np.ndarray:
+        """calculate_infection_ratio 的向量化版本，同一位置的比例为 0.9"""
+        max_distance = self.infection_radius
+        ratio = np.where(distance <= max_distance, 1 - (distance / max_distance), 0.0)
+        return np.where(distance == 0, 0.9, ratio)
+
 class ImmuneEnvironment(Environment):
-    def __init__(self, id: str = ..., generate_agents: Tuple[Agent | int] = None, agents: List[Agent] = None, sub_env: List[Environment] = None, parent_env: List[Environment] = None, map_size: Tuple = None):
-        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size)
+    step_time = 0.1  # 每个时间步对应的天数
+    aggregates: Aggregates = None  # 基类 __init__ 加入代理时实例属性尚未设置
+    _engine_rows: List[int] = None  # 下标 -> 引擎中的行（非免疫代理为 -1），首次批量推进时建立，之后随增删维护
+    LEVEL_ATTRIBUTES = ('immunity_level', 'virus_level')  # 批量推进写回的属性
+
+    def __init__(self, id: str = ..., generate_agents: Tuple[Agent | int] = None, agents: List[Agent] = None, sub_env: List[Environment] = None, parent_env: List[Environment] = None, map_size: Tuple = None, engine: PopulationEngine = None, transmission: str = 'pairwise', recorder: TrajectoryRecorder = None, rng: random.Random = None, sparse: bool = False):
+        """
+        engine: 可选的 PopulationEngine。设置后每步按同步顺序推进：先用 np_rng 一次移动全部代理，
+                再由引擎推进全部免疫代理，最后各传染源按下标顺序传播（读取本步推进之后的病毒量），
+                收到的病毒在下一步才参与推进。不设置时逐个代理依次 移动、推进、传播，排在后面的代理
+                在本步推进之前就收到前面代理的病毒，移动使用 rng。
+                两种方式的宿主内动力学逐位相同，但更新顺序与随机数不同，疫情轨迹不同：
+                设置 engine 改变的是传播模型，不只是加速。
+                免疫代理在加入环境时绑定到引擎，留在环境中期间不要对其调用 unbind
+        """
+        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size, rng)
+        if transmission not in ('pairwise', 'grid', 'field'):
+            raise ValueError(f'Unknown transmission mode: {transmission}')
+        if sparse and engine is None:
+            raise ValueError('Sparse stepping requires a PopulationEngine')
         self.agent_count_history = []  # 记录代理数量变化
         self.infected_count_history = []  # 记录感染人数变化
+        self.engine = engine  # 可选的批量引擎，为 None 时逐个代理模拟
+        # 'pairwise' 两两遍历；'grid' 用网格索引只访问感染半径内的代理；
+        # 'field' 先推进全部代理，再把排毒量栅格化并与距离核卷积，每个代理从所在格子读取暴露量
+        self.transmission = transmission
+        self.recorder = recorder  # 可选的轨迹记录器，每步结束时写入
+        # 只推进活跃代理（有病毒或感染细胞）并只让仍有病毒的代理作为传染源，
+        # 空闲代理的免疫细胞与抗体衰减在下次被访问时以闭式解补上
+        self.sparse = sparse
+        self.aggregates: Aggregates = None  # 增量汇总量，注册观察者或调用 run 时创建
+        self.observers: List[Observer] = []
 
     def step(self):
         """执行环境中的一个时间步"""
-        for agent in self._agents:
-            agent.move(self.map_size)  # 移动代理
-            if isinstance(agent, ImmuneAgent):
-                agent.update_immunity()  # 更新免疫代理的免疫水平
-                agent.spread_virus(self.get_agents())
+        prof = profiler.active()  # 未启用性能分析时为 None
+        scope = profiler.scope_of(self) if prof is not None else ''
+        started = prof.begin() if prof is not None else 0.0
+        aggregates = self.aggregates
+        # 二级索引随代理的移动与推进逐个更新（只改动键变化的代理），不在每步结束时整体刷新
+        indexes = list(self._indexes.values())
+        if self.engine is not None:
+            self._engine_step(prof, scope)
+        elif self.transmission == 'grid':
+            grid = self._spatial_index()
+            covered = {}
+            for slot, agent in enumerate(self._agents):
+                self._call(prof, 'move', scope, agent.move, self.map_size, self.rng)  # 移动代理
+                grid.update(agent)
+                if isinstance(agent, ImmuneAgent):
+                    self._call(prof, 'update_immunity', scope, agent.update_immunity, self.step_time)
+                    if aggregates is not None: aggregates.update(slot, agent)
+                    self._call(prof, 'spread_virus', scope, agent.spread_virus, grid.neighbours(agent.position))
+                    self._cover_strains(agent, covered)
+                for index in indexes:
+                    index.update(slot, agent)
+        elif self.transmission == 'field':
+            mark = prof.begin() if prof is not None else 0.0
+            self.move_agents()
+            if prof is not None: prof.end('move', mark, scope)
+            immune = []
+            for slot, agent in enumerate(self._agents):
+                if isinstance(agent, ImmuneAgent):
+                    immune.append(agent)
+                    self._call(prof, 'update_immunity', scope, agent.update_immunity, self.step_time)
+                    if aggregates is not None: aggregates.update(slot, agent)
+            if indexes:
+                self.reindex(self._agents)  # 全部代理都移动过
+            mark = prof.begin() if prof is not None else 0.0
+            self._field_spread(immune)
+            if prof is not None: prof.end('spread', mark, scope)
+        else:
+            for slot, agent in enumerate(self._agents):
+                self._call(prof, 'move', scope, agent.move, self.map_size, self.rng)  # 移动代理
+                if isinstance(agent, ImmuneAgent):
+                    self._call(prof, 'update_immunity', scope, agent.update_immunity, self.step_time)  # 更新免疫代理的免疫水平
+                    if aggregates is not None: aggregates.update(slot, agent)
+                    self._call(prof, 'spread_virus', scope, agent.spread_virus, self.get_agents())
+                for index in indexes:
+                    index.update(slot, agent)
 
         # 记录当前代理数量和感染人数
+        mark = prof.begin() if prof is not None else 0.0
         self.agent_count_history.append(len(self._agents))
         self.infected_count_history.append(self.count_infected())
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.observers:
+            record = aggregates.record(len(self.agent_count_history), len(self._agents))
+            for observer in self.observers:
+                observer(record)
+        if aggregates is not None:
+            aggregates.begin_step()  # 步与步之间加入的代理计入下一条记录
+        if prof is not None:
+            prof.end('record', mark, scope)
+            prof.end('step', started, scope, agents=len(self._agents))
+
+    def _append(self, agent: Agent):
+        super()._append(agent)
+        if self.aggregates is not None:
+            self.aggregates.append(agent if isinstance(agent, ImmuneAgent) else None)
+        if self._engine_rows is not None:
+            self._engine_rows.append(agent.bind(self.engine).row if isinstance(agent, ImmuneAgent) else -1)
+
+    def _discard(self, agent: Agent) -> bool:
+        slot = self._slot_of.get(id(agent))
+        if not super()._discard(agent): return False
+        # 与环境一样交换删除
+        if self.aggregates is not None:
+            self.aggregates.remove(slot)
+        if self._engine_rows is not None:
+            self._engine_rows[slot] = self._engine_rows[-1]
+            self._engine_rows.pop()
+        return True
+
+    @staticmethod
+    def _call(prof: profiler.Profiler, phase: str, scope: str, func, *args):
+        """逐代理调用 func(*args)；启用性能分析时经 Profiler.call 计入 phase 的统计"""
+        if prof is None: return func(*args)
+        return prof.call(phase, scope, func, *args)
+
+    def observe(self, observer: Observer = None, thresholds: Iterable[float] = (10,), level: float = 10) -> Aggregates:
+        """
+        开始增量维护汇总量，并可注册一个每步结束时以 StepRecord 调用的观察者
+
+        代理加入或离开环境时立即计入或撤销，之后只随本步重新计算过的代理更新（稀疏模式下只有活跃代理），不再每步扫描全部代理；
+        各毒株病毒量取代理本步推进之后、传播之前的值。
+        """
+        if self.aggregates is None:
+            self.aggregates = Aggregates(thresholds, level)
+            for agent in self._agents:
+                self.aggregates.append(agent if isinstance(agent, ImmuneAgent) else None)
+            self.aggregates.begin_step()
+        if observer is not None:
+            self.observers.append(observer)
+        return self.aggregates
+
+    def publish_telemetry(self, name: str = None, capacity: int = 4096, thresholds: Iterable[float] = (10,), level: float = 10) -> telemetry.TelemetryWriter:
+        """
+        每步结束时把汇总量写入共享内存中的环形缓冲区，可随时用 python -m lib.telemetry <name> 接入查看。
+        写入不加锁也不等待读取方；汇总量来自增量维护的 Aggregates（见 observe），不额外扫描代理。
+        返回写入方（其 name 为缓冲区名）；结束时从 observers 中移除并调用 close
+        """
+        aggregates = self.observe(thresholds=thresholds, level=level)
+        writer = telemetry.TelemetryWriter(name, capacity=capacity, thresholds=aggregates.thresholds, level=aggregates.level)
+        self.observers.append(writer)
+        return writer
+
+    def run(self, steps: int, thresholds: Iterable[float] = (10,), level: float = 10) -> Iterator[StepRecord]:
+        """生成器：推进 steps 步，每步产出一条 StepRecord"""
+        records = []
+        self.observe(records.append, thresholds, level)
+        try:
+            for _ in range(steps):
+                self.step()
+                yield records.pop()
+        finally:
+            self.observers.remove(records.append)
+
+    def _engine_step(self, prof: profiler.Profiler = None, scope: str = ''):
+        """
+        批量模式：先移动所有代理，再由引擎一次推进全部免疫代理，最后传播病毒
+
+        稀疏模式下逐代理的 Python 操作只涉及本步推进过的行：只有它们的 virus_level、immunity_level、
+        二级索引与汇总量会更新，空闲代理保留最后一次推进后的值（病毒量为 0，免疫细胞的衰减在下次推进时补上）
+        """
+        mark = prof.begin() if prof is not None else 0.0
+        positions = self.move_agents()
+        if prof is not None: mark = prof.lap('move', mark, scope)
+        agents, engine = self._agents, self.engine
+        indexes = [index for index in self._indexes.values() if index.attribute in self.LEVEL_ATTRIBUTES]
+        moved = [index for index in self._indexes.values() if index.attribute not in self.LEVEL_ATTRIBUTES]
+        if moved:
+            for slot, agent in enumerate(agents):
+                for index in moved:
+                    index.update(slot, agent)  # 按位置等随移动变化的属性建立的索引
+        if self._engine_rows is None:
+            self._engine_rows = [agent.bind(engine).row if isinstance(agent, ImmuneAgent) else -1 for agent in agents]
+        slot_rows = np.array(self._engine_rows, dtype=int)
+        slots = np.flatnonzero(slot_rows >= 0)
+        if not len(slots): return
+        rows = slot_rows[slots]
+        if prof is not None: mark = prof.lap('bind', mark, scope)
+        engine.simulate(self.step_time, rows, sparse=self.sparse)
+        if prof is not None: mark = prof.lap('simulate', mark, scope, rows=len(rows))
+        virus_levels = engine.total_virus(rows)
+        active = np.flatnonzero(engine.lag[rows] == 0) if self.sparse else np.arange(len(rows))
+        immune_levels = engine.M[rows[active]]  # 推进过的行没有推迟的步数
+        aggregates = self.aggregates
+        for slot, immunity_level, virus_level in zip(slots[active].tolist(), immune_levels, virus_levels[active]):
+            agent = agents[slot]
+            agent.immunity_level = immunity_level
+            agent.virus_level = virus_level
+            for index in indexes:
+                index.update(slot, agent)
+            if aggregates is not None: aggregates.update(slot, agent)
+        if prof is not None: mark = prof.lap('levels', mark, scope)
+        if self.transmission == 'field':
+            self._field_spread([agents[slot] for slot in slots.tolist()], rows)
+        else:
+            self._engine_spread(slots, rows, virus_levels, positions)
+        if prof is not None: prof.end('spread', mark, scope)
+
+    def _engine_spread(self, slots: np.ndarray, rows: np.ndarray, virus_levels: np.ndarray, positions: np.ndarray = None):
+        """
+        逐个传染源按顺序传播，每个传染源对其目标做一次向量化计算
+
+        slots 为免疫代理在环境中的下标，rows 为它们在引擎中的行，positions 为 move_agents 返回的全部代理的位置。剂量为 0 且已持有该毒株的目标不受影响，
+        因此只对收到病毒（两两遍历时为全部代理，网格模式为附近格子中的代理）或需要以 0 剂量登记槽位的目标调用 add_virus，
+        结果与两两遍历时对所有代理调用相同；没有传染源时不访问其他代理
+        """
+        engine, agents = self.engine, self._agents
+        # 所有代理都已持有的毒株（covered）不必再登记
+        held = engine.slot_of[rows] >= 0
+        full = held.all(axis=0)
+        covered = {sid: bool(full[column]) for sid, column in engine.strain_index.items()}
+        if self.sparse:
+            # 病毒量为 0 的代理仍以 0 剂量为其他代理登记毒株槽位，因此只让有病毒或持有未覆盖毒株的代理作为传染源。
+            # 本步被排在后面的代理若被传染或登记了未覆盖的毒株，也按顺序加入
+            sources = np.flatnonzero((virus_levels > 0) | held[:, ~full].any(axis=1)).tolist()
+        else:
+            sources = list(range(len(slots)))
+        if not sources: return
+        if positions is None:
+            positions = np.array([agents[slot].position for slot in slots.tolist()], dtype=float).reshape(-1, 2)
+        else:
+            positions = positions[slots].astype(float)
+        x, y = positions[:, 0].copy(), positions[:, 1].copy()
+        grid = None  # 网格模式下在第一个传染源处建立，每个传染源按自己的感染半径查询
+        everyone = np.arange(len(slots))
+        queued = np.zeros(len(slots), dtype=bool)
+        queued[sources] = True
+        while sources:
+            k = heapq.heappop(sources)
+            source = agents[slots[k]]
+            strains = source.virus_simulation.infected_virus
+            if not strains: continue
+            levels = engine.latest_virus(rows[k]).copy()
+            uncovered = [v for v in strains if not covered.get(v.id)]
+            if not levels.any() and not uncovered: continue  # 剂量全为 0 又无需登记槽位，对任何目标都不起作用
+            if self.transmission != 'grid':
+                near = everyone
+            else:
+                if grid is None: grid = ArrayGridIndex(positions, source.infection_radius)
+                near = grid.neighbours(k, source.infection_radius)
+            dx, dy = x[near] - x[k], y[near] - y[k]
+            ratio = source.infection_ratios(np.sqrt(dx * dx + dy * dy))
+            reach = ratio > 0 if levels.any() else np.zeros(len(near), dtype=bool)
+            targets, ratio = near[reach], ratio[reach]
+            if uncovered:
+                lacking = np.zeros(len(slots), dtype=bool)
+                for v in uncovered:
+                    lacking |= engine.slot_of[rows, engine._strain(v.id)] < 0
+                lacking[targets] = False
+                extra = np.flatnonzero(lacking)
+                order = np.argsort(np.concatenate([targets, extra]), kind='stable')
+                targets = np.concatenate([targets, extra])[order]
+                ratio = np.concatenate([ratio, np.zeros(len(extra))])[order]
+            keep = np.array([agents[slot].id != source.id for slot in slots[targets].tolist()], dtype=bool)
+            targets, ratio = targets[keep], ratio[keep]
+            for v, level in zip(strains, levels):
+                engine.add_virus(rows[targets], v, np.abs(level * ratio))
+            if uncovered:
+                for v in uncovered:
+                    covered[v.id] = bool((engine.slot_of[rows, engine.strain_index[v.id]] >= 0).all())
+            if self.sparse:
+                later = targets > k
+                reached = later & (ratio > 0) if levels.any() else np.zeros(len(targets), dtype=bool)
+                columns = [engine.strain_index[v.id] for v in uncovered if not covered[v.id]]
+                if columns:
+                    reached |= later & (engine.slot_of[rows[targets]][:, columns] >= 0).any(axis=1)
+                reached = targets[reached]
+                for target in reached[~queued[reached]].tolist():
+                    queued[target] = True
+                    heapq.heappush(sources, target)
+
+    def _field_spread(self, immune: List[ImmuneAgent], rows: np.ndarray = None):
+        """
+        场传播：每个毒株把所有代理的当前病毒量累加到格子上，与感染核卷积后，
+        每个代理从所在格子读取暴露量并减去自身的贡献。与两两遍历相比，所有传染源读取的都是
+        传播前的病毒量；代理 id 视为互不相同。所有代理都会登记环境中出现的每个毒株。
+        """
+        if not immune: return
+        engine = self.engine if rows is not None else None
+        positions = np.array([agent.position for agent in immune], dtype=int).reshape(-1, 2)
+        x = np.clip(positions[:, 0], 0, self.map_size[0] - 1)
+        y = np.clip(positions[:, 1], 0, self.map_size[1] - 1)
+        radius = max(agent.infection_radius for agent in immune)
+        strains = {}
+        for agent in immune:
+            for v in agent.virus_simulation.infected_virus:
+                strains.setdefault(v.id, v)
+
+        doses = {}
+        for sid in strains:
+            if engine is not None:
+                slots = engine.slot_of[rows, engine._strain(sid)]
+                levels = np.where(slots >= 0, engine.V[rows, np.maximum(slots, 0)], 0.0)
+            else:
+                levels = np.array([agent.virus_simulation.latest_virus(sid) if agent.virus_simulation.has_virus(sid) else 0.0
+                                   for agent in immune])
+            raster = field.rasterize(self.map_size, x, y, levels)
+            received = field.exposure(raster, radius)[x, y] - field.SAME_CELL_RATIO * levels
+            received[received < 1e-12 * raster.sum()] = 0.0
+            doses[sid] = received
+
+        # 全部读完再加入，保证所有传染源使用同一时刻的病毒量
+        if engine is not None:
+            for sid, v in strains.items():
+                engine.add_virus(rows, v, doses[sid])
+            return
+        indices = np.array([STRAINS.intern(v).index for v in strains.values()], dtype=int)
+        received = np.array([doses[sid] for sid in strains]).T
+        for agent, dose in zip(immune, received):
+            agent.add_virus_batch(indices, dose)
+
+    def _spatial_index(self) -> GridIndex:
+        """按当前位置为免疫代理建立网格索引，半径取各代理感染半径的最大值"""
+        immune = [agent for agent in self._agents if isinstance(agent, ImmuneAgent)]
+        radius = max((agent.infection_radius for agent in immune), default=ImmuneAgent.infection_radius)
+        grid = GridIndex(radius)
+        grid.rebuild(immune)
+        return grid
+
+    def _cover_strains(self, source: ImmuneAgent, covered: dict):
+        """
+        两两遍历时，半径外的代理也会以 0 剂量调用 add_virus，从而登记该毒株的槽位。
+        网格模式只访问半径内的代理，这里为其余代理补登记，保证结果与两两遍历一致。
+        covered 记录本步已确认全部代理都持有的毒株，每个毒株每步最多扫描一次。
+        """
+        for v in source.virus_simulation.infected_virus:
+            if covered.get(v.id): continue
+            complete = True
+            strain = np.array([STRAINS.intern(v).index])
+            for other in self._agents:
+                if not isinstance(other, ImmuneAgent) or other.virus_simulation.has_virus(v.id): continue
+                if other.id == source.id:
+                    complete = False  # 同 id 的代理不会被该传染源感染，留给后续传染源处理
+                    continue
+                other.add_virus_batch(strain, np.zeros(1))
+            covered[v.id] = complete
 
     def count_infected(self, level:float = 10) -> int:
-        """返回感染代理的数量"""
+        """返回感染代理的数量；该阈值有增量汇总或 add_index('virus_level', level) 建立的索引时直接读取"""
+        if self.aggregates is not None and level in self.aggregates.infected:
+            return self.aggregates.infected[level]
+        index = self._indexes.get(('virus_level', level))
+        if index is not None:
+            return index.count(True)
         return sum(1 for agent in self._agents if agent.virus_level >= level)
 
+    def infected_agents(self, level:float = 10) -> List[Agent]:
+        """病毒量不低于 level 的代理；有对应索引时只访问这些代理"""
+        index = self._indexes.get(('virus_level', level))
+        if index is not None:
+            return [self._agents[slot] for slot in index.slots(True)]
+        return [agent for agent in self._agents if getattr(agent, 'virus_level', 0.0) >= level]
+
 
@@ -0,0 +1,250 @@
+import dataclasses
+import hashlib
+import json
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple, Union
+from .iiim_model import ImmuneData, MultiSimulation, Virus
+from .sweep import IMMUNE_FIELDS, default_environment
+
+
+def host_trajectory(params: dict, dt: float, dose: float, steps: int, seed: int = 0, step_time: float = 0.1) -> np.ndarray:
+    """单个宿主的病毒总量曲线：以 dose 感染后每 step_time 天记录一次，共 steps 个点"""
+    data = ImmuneData(**params)
+    sim = MultiSimulation(data, dt, record_every=0)
+    sim.add_virus(Virus('virus', dose, data))
+    values = np.empty(steps)
+    for k in range(steps):
+        sim.simulate(step_time)
+        values[k] = sim.total_virus
+    return values
+
+
+def environment_trajectory(params: dict, dt: float, dose: float, steps: int, seed: int = 0) -> np.ndarray:
+    """sweep.default_environment 的 infected_count_history（宿主使用 ImmuneAgent 默认的 dt）"""
+    env = default_environment({**params, 'dose': dose}, random.Random(seed))
+    for _ in range(steps):
+        env.step()
+    return np.asarray(env.infected_count_history, dtype=float)
+
+
+def mse(prediction: np.ndarray, target: np.ndarray) -> float:
+    return float(np.mean((prediction - target) ** 2))
+
+
+def rmse(prediction: np.ndarray, target: np.ndarray) -> float:
+    return float(np.sqrt(mse(prediction, target)))
+
+
+def mae(prediction: np.ndarray, target: np.ndarray) -> float:
+    return float(np.mean(np.abs(prediction - target)))
+
+
+def log_mse(prediction: np.ndarray, target: np.ndarray) -> float:
+    """对数尺度上的均方误差，适合跨越多个数量级的病毒量"""
+    return mse(np.log1p(np.maximum(prediction, 0)), np.log1p(np.maximum(target, 0)))
+
+
+def poisson_deviance(prediction: np.ndarray, target: np.ndarray) -> float:
+    """感染人数等计数数据的泊松偏差"""
+    mu = np.maximum(prediction, 1e-9)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        term = np.where(target > 0, target * np.log(target / mu), 0.0)
+    return float(2 * np.mean(term - (target - mu)))
+
+
+LOSSES: Dict[str, Callable] = {'mse': mse, 'rmse': rmse, 'mae': mae, 'log_mse': log_mse, 'poisson': poisson_deviance}
+
+
+def trajectory_key(model: Callable, params: dict, dt: float, dose: float, steps: int, seed: int) -> str:
+    """参数、dt、初始剂量、长度、种子与模型函数的哈希；浮点数用 repr 保证精确"""
+    payload = {'model': f'{model.__module__}:{model.__qualname__}', 'dt': repr(float(dt)), 'dose': repr(float(dose)),
+               'steps': int(steps), 'seed': int(seed), 'params': {name: repr(float(value)) for name, value in sorted(params.items())}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class TrajectoryCache:
+    def __init__(self, path: str, max_bytes: int = 256 * 2 ** 20):
+        """
+        磁盘上的轨迹缓存，每条轨迹一个 .npy 文件，以 trajectory_key 命名
+
+        总大小超过 max_bytes 时按最近使用时间（文件的修改时间，读取时更新）淘汰最旧的条目。
+        写入先写临时文件再改名，多个进程或中断的拟合不会留下损坏的条目。
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        self._entries: Dict[str, Tuple[float, int]] = {}  # key -> (最近使用时间, 字节数)
+        for name in os.listdir(path):
+            if name.endswith('.npy'):
+                stat = os.stat(os.path.join(path, name))
+                self._entries[name[:-4]] = (stat.st_mtime, stat.st_size)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + '.npy')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def get(self, key: str) -> np.ndarray:
+        """返回缓存的轨迹，不存在时返回 None"""
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            values = np.load(self._file(key))
+            os.utime(self._file(key))
+        except (OSError, ValueError):
+            # 其他进程已淘汰或文件损坏
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries[key] = (os.stat(self._file(key)).st_mtime, self._entries[key][1])
+        self.hits += 1
+        return values
+
+    def put(self, key: str, values: np.ndarray):
+        temporary = self._file(key) + f'.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            np.save(f, np.asarray(values))
+        os.replace(temporary, self._file(key))
+        stat = os.stat(self._file(key))
+        self._entries[key] = (stat.st_mtime, stat.st_size)
+        self._evict()
+
+    def _evict(self):
+        total = self.size
+        for key, (_, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes: break
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+            del self._entries[key]
+            total -= size
+
+    def clear(self):
+        for key in list(self._entries):
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+        self._entries = {}
+
+
+def _run_models(args) -> List[np.ndarray]:
+    model, tasks = args
+    return [np.asarray(model(params, dt, dose, steps, seed), dtype=float) for params, dt, dose, steps, seed in tasks]
+
+
+class Calibrator:
+    def __init__(self, target, model: Callable = host_trajectory, loss: Union[str, Callable] = 'mse',
+                 base: ImmuneData = None, dt: float = 1e-2, dose: float = 0.1, seeds: Tuple[int, ...] = (0,),
+                 cache: Union[str, TrajectoryCache] = None, workers: int = None, chunksize: int = 8):
+        """
+        ImmuneData 参数拟合：批量评估候选参数与目标曲线的损失
+
+        target: 目标曲线，例如观测到的 infected_count_history；其长度决定模拟的步数
+        model: model(params, dt, dose, steps, seed) -> 曲线，必须是可 pickle 的模块级函数；
+               默认 host_trajectory（单宿主病毒量），environment_trajectory 对应感染人数
+        loss: LOSSES 中的名字或 loss(prediction, target) -> float
+        base: 候选参数未给出的字段取自 base
+        seeds: 每个候选的重复种子，多个种子时先对曲线取平均再计算损失
+        cache: 缓存目录或 TrajectoryCache；重复的候选与中断后继续的拟合直接从缓存读取
+        workers: 进程数，默认全部 CPU；为 1 时在当前进程中顺序执行
+        """
+        self.target = np.asarray(target, dtype=float)
+        self.model = model
+        self.loss = LOSSES[loss] if isinstance(loss, str) else loss
+        self.base = base if base is not None else ImmuneData()
+        self.dt = dt
+        self.dose = dose
+        self.seeds = tuple(seeds)
+        self.cache = TrajectoryCache(cache) if isinstance(cache, str) else cache
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.evaluations = 0  # 实际运行的模拟次数（不含缓存命中）
+        self.history: List[Tuple[dict, float]] = []  # 评估过的 (参数, 损失)
+
+    def params_of(self, candidate: dict) -> dict:
+        unknown = set(candidate) - set(IMMUNE_FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown ImmuneData fields: {sorted(unknown)}')
+        return {**dataclasses.asdict(self.base), **{name: float(value) for name, value in candidate.items()}}
+
+    def trajectories(self, candidates: List[dict]) -> List[np.ndarray]:
+        """每个候选（各种子平均后）的曲线；只运行缓存中没有的模拟，并在多个进程中并行"""
+        steps = len(self.target)
+        tasks = [(self.params_of(candidate), self.dt, self.dose, steps, seed) for candidate in candidates for seed in self.seeds]
+        keys = [trajectory_key(self.model, *task) for task in tasks]
+        results: Dict[str, np.ndarray] = {}
+        pending: Dict[str, tuple] = {}
+        for key, task in zip(keys, tasks):
+            if key in results or key in pending: continue
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                results[key] = cached
+            else:
+                pending[key] = task
+
+        if pending:
+            order = list(pending)
+            batches = [[pending[key] for key in order[k:k + self.chunksize]] for k in range(0, len(order), self.chunksize)]
+            if self.workers == 1 or len(order) <= 1:
+                values = [value for batch in batches for value in _run_models((self.model, batch))]
+            else:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+                    values = [value for batch in executor.map(_run_models, [(self.model, batch) for batch in batches])
+                              for value in batch]
+            self.evaluations += len(order)
+            for key, value in zip(order, values):
+                results[key] = value
+                if self.cache is not None:
+                    self.cache.put(key, value)
+
+        n = len(self.seeds)
+        return [np.mean([results[key] for key in keys[k:k + n]], axis=0) for k in range(0, len(keys), n)]
+
+    def evaluate(self, candidates: List[dict]) -> np.ndarray:
+        """返回每个候选的损失"""
+        losses = np.array([self.loss(trajectory, self.target) for trajectory in self.trajectories(candidates)])
+        self.history.extend(zip((dict(candidate) for candidate in candidates), losses.tolist()))
+        return losses
+
+    def best(self, candidates: List[dict]) -> Tuple[dict, float]:
+        """在一批候选中选出损失最小的一个"""
+        losses = self.evaluate(candidates)
+        index = int(np.argmin(losses))
+        return dict(candidates[index]), float(losses[index])
+
+    def random_search(self, bounds: Dict[str, Tuple[float, float]], samples: int, rounds: int = 1,
+                      shrink: float = 0.5, seed: int = 0) -> Tuple[dict, float]:
+        """
+        在 bounds 内均匀采样 samples 个候选并批量评估；rounds > 1 时每轮以当前最优为中心、
+        把区间缩小为原来的 shrink 倍后继续。种子相同的拟合产生相同的候选，重跑或续跑时都是缓存命中
+        """
+        rng = np.random.default_rng(seed)
+        low = {name: float(bound[0]) for name, bound in bounds.items()}
+        high = {name: float(bound[1]) for name, bound in bounds.items()}
+        best, best_loss = None, np.inf
+        for _ in range(rounds):
+            candidates = [{name: float(rng.uniform(low[name], high[name])) for name in bounds} for _ in range(samples)]
+            candidate, loss = self.best(candidates)
+            if loss < best_loss:
+                best, best_loss = candidate, loss
+            for name, (lower, upper) in bounds.items():
+                half = (high[name] - low[name]) * shrink / 2
+                low[name] = max(lower, best[name] - half)
+                high[name] = min(upper, best[name] + half)
+        return best, best_loss
@@ -0,0 +1,246 @@
+import dataclasses
+import importlib
+import json
+import random
+import numpy as np
+from typing import Dict, List
+from .abm import Environment
+from .abm_model import ImmuneEnvironment
+from .iiim_model import ImmuneData, Virus
+from .population import PopulationEngine, EngineSimulation
+
+
+CHECKPOINT_VERSION = 1
+IMMUNE_FIELDS = tuple(field.name for field in dataclasses.fields(ImmuneData))
+
+
+def _class_name(cls: type) -> str:
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+
+def _load_class(name: str) -> type:
+    module, qualname = name.split(':')
+    obj = importlib.import_module(module)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _encode_id(value):
+    """id 原样写入 JSON（字符串、整数……）；ImmuneEnvironment 的默认 id 是 Ellipsis"""
+    return {'ellipsis': True} if value is Ellipsis else value
+
+
+def _decode_id(value):
+    return Ellipsis if isinstance(value, dict) and value.get('ellipsis') else value
+
+
+def _rng_state(env: Environment) -> dict:
+    state = {'global': env.rng is random}
+    state['state'] = (random.getstate() if env.rng is random else env.rng.getstate())
+    if env._np_rng is not None:
+        state['np'] = {'bit_generator': type(env._np_rng.bit_generator).__name__, 'state': env._np_rng.bit_generator.state}
+    return state
+
+
+def _restore_rng(env: Environment, state: dict):
+    version, internal, gauss = state['state']
+    if state['global']:
+        random.setstate((version, tuple(internal), gauss))
+        env.rng = random
+    else:
+        env.rng = random.Random()
+        env.rng.setstate((version, tuple(internal), gauss))
+    env._np_rng = None
+    if 'np' in state:
+        bit_generator = getattr(np.random, state['np']['bit_generator'])()
+        bit_generator.state = state['np']['state']
+        env._np_rng = np.random.Generator(bit_generator)
+
+
+def save_checkpoint(path: str, root: Environment, compress: bool = False):
+    """
+    把环境层级的完整状态写入一个 .npz 文件（列式数组 + 一段 JSON 元数据）
+
+    包括：环境层级、地图尺寸、计数历史与随机数状态；代理的位置、免疫参数与水平；
+    每个宿主的 I、M、A、延迟缓冲区以及按感染顺序展平的各毒株病毒量与抗体。
+    代理的逐步历史曲线与 TrajectoryRecorder 不写入（需要时请用记录器保存轨迹）。
+    只支持 euler 求解器，所有宿主必须使用相同的 dt 和 d。
+    """
+    envs = root.environments()
+    env_index = {id(env): k for k, env in enumerate(envs)}
+    engines = []
+    for env in envs:
+        engine = getattr(env, 'engine', None)
+        if engine is not None and all(engine is not other for other in engines):
+            engines.append(engine)
+    classes: List[str] = []
+
+    def class_code(obj) -> int:
+        name = _class_name(type(obj))
+        if name not in classes:
+            classes.append(name)
+        return classes.index(name)
+
+    # 环境
+    env_meta, env_parent, parent_links, env_histories = [], [], [], []
+    for k, env in enumerate(envs):
+        engine = getattr(env, 'engine', None)
+        env_meta.append({'id': _encode_id(env.id), 'class': class_code(env), 'rng': _rng_state(env),
+                         'engine': next((e for e, other in enumerate(engines) if other is engine), -1),
+                         'transmission': getattr(env, 'transmission', None), 'sparse': getattr(env, 'sparse', False),
+                         'indexes': [list(key) for key in env._indexes]})
+        env_parent.append(next((p for p in range(k) if any(sub is env for sub in envs[p]._sub_env)), -1))
+        parent_links += [(k, env_index[id(parent)]) for parent in env._parent_env if id(parent) in env_index]
+        env_histories.append((getattr(env, 'agent_count_history', []), getattr(env, 'infected_count_history', [])))
+
+    # 代理与宿主：已绑定引擎的宿主直接引用其行，其余的先迁入临时引擎，再按引擎整列导出
+    agents = [(k, agent) for k, env in enumerate(envs) for agent in env._agents]
+    refs, scratch = [], {}
+    for _, agent in agents:
+        sim = getattr(agent, 'virus_simulation', None)
+        if sim is None:
+            refs.append(None)
+        elif isinstance(sim, EngineSimulation):
+            refs.append((sim.engine, sim.row, 1))
+        else:
+            key = (sim.dt, sim.d)
+            if key not in scratch:
+                scratch[key] = PopulationEngine(dt=sim.dt, d=sim.d, capacity=len(agents))
+            refs.append((scratch[key], scratch[key].adopt(sim).row, sim.record_every))
+    used = [engine for engine in {id(ref[0]): ref[0] for ref in refs if ref is not None}.values()]
+    if len({(engine.dt, engine.d) for engine in used}) > 1:
+        raise ValueError('All hosts in a checkpoint must share dt and d')
+
+    agent_host = np.full(len(agents), -1, dtype=int)
+    columns: Dict[str, list] = {}
+    natives, record_every, slot_virus = [], [], []
+    catalog: Dict[tuple, int] = {}
+    hosts = 0
+    for engine in used:
+        members = [k for k, ref in enumerate(refs) if ref is not None and ref[0] is engine]
+        rows = np.array([refs[k][1] for k in members], dtype=int)
+        for name, values in engine.export_rows(rows).items():
+            columns.setdefault(name, []).append(values)
+        for k, row in zip(members, rows.tolist()):
+            agent_host[k] = hosts
+            hosts += 1
+            view = engine._views[row]
+            natives.append([getattr(view.native, name) for name in IMMUNE_FIELDS])
+            record_every.append(refs[k][2])
+            for virus in view.infected_virus:
+                key = (virus.id, tuple(getattr(virus.system, name) for name in IMMUNE_FIELDS), virus.native)
+                slot_virus.append(catalog.setdefault(key, len(catalog)))
+
+    arrays = {f'host_{name}': np.concatenate(values) for name, values in columns.items()}
+    positions = [agent.position for _, agent in agents]
+    arrays.update({
+        'env_parent': np.array(env_parent, dtype=int),
+        'env_parent_links': np.array(parent_links, dtype=int).reshape(-1, 2),
+        'env_map_size': np.array([env.map_size[:2] for env in envs], dtype=int).reshape(-1, 2),
+        'env_history_length': np.array([len(a) for a, _ in env_histories], dtype=int),
+        'env_agent_count': np.array([value for a, _ in env_histories for value in a], dtype=int),
+        'env_infected_count': np.array([value for _, b in env_histories for value in b], dtype=int),
+        'agent_env': np.array([k for k, _ in agents], dtype=int),
+        'agent_class': np.array([class_code(agent) for _, agent in agents], dtype=int),
+        'agent_position': np.array(positions).reshape(len(agents), 2) if positions else np.zeros((0, 2), dtype=int),
+        'agent_host': agent_host,
+        'agent_immunity_level': np.array([getattr(agent, 'immunity_level', 0.0) for _, agent in agents], dtype=float),
+        'agent_virus_level': np.array([getattr(agent, 'virus_level', 0.0) for _, agent in agents], dtype=float),
+        'host_native': np.array(natives, dtype=float).reshape(-1, len(IMMUNE_FIELDS)),
+        'host_record_every': np.array(record_every, dtype=int),
+        'slot_virus': np.array(slot_virus, dtype=int),
+        'virus_system': np.array([key[1] for key in catalog], dtype=float).reshape(-1, len(IMMUNE_FIELDS)),
+        'virus_native': np.array([key[2] for key in catalog], dtype=float),
+    })
+    meta = {'version': CHECKPOINT_VERSION, 'classes': classes, 'envs': env_meta,
+            'engines': [{'dt': engine.dt, 'd': engine.d} for engine in engines],
+            'host_dt': used[0].dt if used else None, 'host_d': used[0].d if used else None,
+            'agent_ids': [_encode_id(agent.id) for _, agent in agents],
+            'virus_ids': [_encode_id(key[0]) for key in catalog]}
+    arrays['meta'] = np.array(json.dumps(meta))
+    (np.savez_compressed if compress else np.savez)(path, **arrays)
+
+
+def load_checkpoint(path: str) -> Environment:
+    """读取 save_checkpoint 写入的文件，重建并返回根环境；宿主状态按引擎整列写回"""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    meta = json.loads(str(arrays.pop('meta')))
+    if meta['version'] != CHECKPOINT_VERSION:
+        raise ValueError(f'Unsupported checkpoint version: {meta["version"]}')
+    classes = [_load_class(name) for name in meta['classes']]
+
+    # 环境
+    engines = [PopulationEngine(dt=spec['dt'], d=spec['d']) for spec in meta['engines']]
+    envs: List[Environment] = []
+    offsets = np.concatenate([[0], np.cumsum(arrays['env_history_length'])])
+    for k, spec in enumerate(meta['envs']):
+        env = classes[spec['class']].__new__(classes[spec['class']])
+        env.id = _decode_id(spec['id'])
+        _restore_rng(env, spec['rng'])
+        env._sub_env, env._parent_env = [], []
+        env._indexes = {}
+        env._init_agents([])
+        env.map_size = tuple(arrays['env_map_size'][k].tolist())
+        if isinstance(env, ImmuneEnvironment):
+            env.agent_count_history = arrays['env_agent_count'][offsets[k]:offsets[k + 1]].tolist()
+            env.infected_count_history = arrays['env_infected_count'][offsets[k]:offsets[k + 1]].tolist()
+            env.engine = engines[spec['engine']] if spec['engine'] >= 0 else None
+            env.transmission = spec['transmission']
+            env.sparse = spec['sparse']
+            env.recorder = None
+            env.aggregates, env.observers = None, []
+        envs.append(env)
+    for k, parent in enumerate(arrays['env_parent'].tolist()):
+        if parent >= 0:
+            envs[parent]._sub_env.append(envs[k])
+    for child, parent in arrays['env_parent_links'].tolist():
+        envs[child]._parent_env.append(envs[parent])
+
+    # 宿主：共享相同参数的 ImmuneData 与 Virus 对象
+    native_values, native_index = np.unique(arrays['host_native'], axis=0, return_inverse=True)
+    native_data = [ImmuneData(**dict(zip(IMMUNE_FIELDS, values))) for values in native_values.tolist()]
+    natives = [native_data[k] for k in native_index.reshape(-1).tolist()]
+    system_values, system_index = np.unique(arrays['virus_system'], axis=0, return_inverse=True)
+    systems = [ImmuneData(**dict(zip(IMMUNE_FIELDS, values))) for values in system_values.tolist()]
+    catalog = [Virus(_decode_id(virus_id), 0, systems[system], native)
+               for virus_id, system, native in zip(meta['virus_ids'], system_index.reshape(-1).tolist(), arrays['virus_native'].tolist())]
+    bounds = np.concatenate([[0], np.cumsum(arrays['host_slot_count'])]) if len(natives) else [0]
+    slot_virus = arrays['slot_virus'].tolist()
+    viruses = [[catalog[code] for code in slot_virus[bounds[h]:bounds[h + 1]]] for h in range(len(natives))]
+
+    agent_env, agent_host = arrays['agent_env'], arrays['agent_host']
+    host_env = np.full(len(natives), -1, dtype=int)
+    host_env[agent_host[agent_host >= 0]] = agent_env[agent_host >= 0]
+    host_engine = np.array([meta['envs'][k]['engine'] for k in host_env.tolist()], dtype=int)
+    scratch = PopulationEngine(dt=meta['host_dt'], d=meta['host_d']) if (host_engine < 0).any() else None
+    sims = [None] * len(natives)
+    for e, engine in list(enumerate(engines)) + [(-1, scratch)]:
+        members = np.flatnonzero(host_engine == e)
+        if engine is None or not len(members): continue
+        state = {name[len('host_'):]: arrays[name][members] for name in arrays if name.startswith('host_')
+                 and name not in ('host_native', 'host_record_every', 'host_slot_count', 'host_V', 'host_Ab')}
+        state['slot_count'] = arrays['host_slot_count'][members]
+        slot_mask = np.repeat(np.isin(np.arange(len(natives)), members), arrays['host_slot_count'])
+        state['V'], state['Ab'] = arrays['host_V'][slot_mask], arrays['host_Ab'][slot_mask]
+        rows = engine.import_rows(state, [natives[h] for h in members], [viruses[h] for h in members])
+        for h, row in zip(members.tolist(), rows.tolist()):
+            # 不使用引擎的环境中的宿主还原为独立的 MultiSimulation
+            sims[h] = engine._views[row] if e >= 0 else engine.release(row, int(arrays['host_record_every'][h]))
+
+    # 代理
+    ids, positions = meta['agent_ids'], arrays['agent_position'].tolist()
+    immunity, virus = arrays['agent_immunity_level'].tolist(), arrays['agent_virus_level'].tolist()
+    for k, (env, cls, host) in enumerate(zip(agent_env.tolist(), arrays['agent_class'].tolist(), agent_host.tolist())):
+        agent = classes[cls].__new__(classes[cls])
+        agent.id = _decode_id(ids[k])
+        agent.position = tuple(positions[k])
+        if host >= 0:
+            agent.virus_simulation = sims[host]
+            agent.immunity_level, agent.virus_level = immunity[k], virus[k]
+        envs[env]._append(agent)
+    for env, spec in zip(envs, meta['envs']):
+        for attribute, threshold in spec.get('indexes', []):
+            env.add_index(attribute, threshold)
+    return envs[0]
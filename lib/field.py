@@ -0,0 +1,56 @@
+import functools
+import math
+import numpy as np
+from typing import Tuple
+
+
+SAME_CELL_RATIO = 0.9  # 同一格子内的感染比例
+
+
+@functools.lru_cache(maxsize=None)
+def infection_kernel(radius: float, same_cell: float = SAME_CELL_RATIO) -> np.ndarray:
+    """按整数偏移量计算感染比例：中心为 same_cell，距离 d <= radius 时为 1 - d / radius"""
+    reach = int(math.floor(radius))
+    offsets = np.arange(-reach, reach + 1)
+    distance = np.sqrt(offsets[:, None] ** 2 + offsets[None, :] ** 2)
+    kernel = np.where(distance <= radius, 1 - distance / radius, 0.0)
+    kernel[reach, reach] = same_cell
+    kernel.flags.writeable = False
+    return kernel
+
+
+@functools.lru_cache(maxsize=32)
+def kernel_spectrum(map_size: Tuple[int, int], radius: float, same_cell: float = SAME_CELL_RATIO) -> np.ndarray:
+    """每个地图尺寸只计算一次的核频谱（补零到不会发生环绕的大小）"""
+    kernel = infection_kernel(radius, same_cell)
+    reach = kernel.shape[0] // 2
+    shape = (map_size[0] + 2 * reach, map_size[1] + 2 * reach)
+    padded = np.zeros(shape)
+    padded[:kernel.shape[0], :kernel.shape[1]] = kernel
+    padded = np.roll(padded, (-reach, -reach), axis=(0, 1))  # 核中心移到 (0, 0)
+    spectrum = np.fft.rfft2(padded)
+    spectrum.flags.writeable = False
+    return spectrum
+
+
+def exposure(raster: np.ndarray, radius: float, same_cell: float = SAME_CELL_RATIO) -> np.ndarray:
+    """
+    把每个格子的排毒量与感染核做卷积，返回每个格子受到的暴露量
+
+    raster: 形状为 map_size 的排毒量网格
+    """
+    map_size = raster.shape
+    spectrum = kernel_spectrum(tuple(map_size), radius, same_cell)
+    reach = int(math.floor(radius))
+    shape = (map_size[0] + 2 * reach, map_size[1] + 2 * reach)
+    field = np.fft.irfft2(np.fft.rfft2(raster, shape) * spectrum, shape)[:map_size[0], :map_size[1]]
+    # FFT 的舍入误差会在无源区域留下极小的非零值
+    field[field < 1e-12 * raster.sum()] = 0.0
+    return field
+
+
+def rasterize(map_size: Tuple[int, int], x: np.ndarray, y: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """把各代理的排毒量累加到所在格子"""
+    raster = np.zeros(tuple(map_size))
+    np.add.at(raster, (x, y), values)
+    return raster
@@ -1,11 +1,20 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import dataclasses
-
-@dataclasses.dataclass
+from typing import Dict, List
+if __package__:
+    from .solver import DenseHistory, integrate
+    from . import profiler
+else:  # 直接以脚本运行：python lib/iiim_model.py
+    from solver import DenseHistory, integrate
+    import profiler
+
+@dataclasses.dataclass(frozen=True)
 class ImmuneData:
     """
     Initializes the immune simulation model with default or custom parameters.
+
+    Instances are immutable, so one record can be shared by any number of hosts and strains;
+    use dataclasses.replace to derive a variant.
     
     Parameters:
         N (float): Maximum normal cell count.
@@ -31,11 +40,84 @@ class ImmuneData:
 
 
 class Virus:
+    __slots__ = ('id', 'count', 'system', 'native', '_strain')
+
     def __init__(self, virus_id, initial_count, system:ImmuneData, native=1):
         self.id = virus_id
         self.count = initial_count
         self.system = system
         self.native = native
+        self._strain = None  # STRAINS 中登记的记录，首次使用时填入
+
+    def __getstate__(self):
+        # 毒株编号只在当前进程的 STRAINS 中有效，序列化时不保留
+        state = dict(getattr(self, '__dict__', {}))
+        state.update((name, getattr(self, name)) for name in self.__slots__ if name != '_strain')
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._strain = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Strain:
+    """
+    Immutable parameter record of one interned strain.
+
+    Parameters:
+        index (int): Position in the StrainCatalog.
+        id: Strain id; hosts key their strains by it.
+        system (ImmuneData): Strain-specific immune parameters (shared, immutable).
+        native (float): Weight of the host's own antibodies against this strain.
+    """
+    index: int
+    id: object
+    system: ImmuneData
+    native: float
+
+    def virus(self, count: float) -> Virus:
+        virus = Virus(self.id, count, system=self.system, native=self.native)
+        virus._strain = self
+        return virus
+
+
+class StrainCatalog:
+    def __init__(self):
+        """
+        Registry interning strains by value, so that transmission can pass (strain index, dose)
+        arrays instead of building a Virus object for every contact. Strains with the same id
+        but different parameters get different indices. Indices are only valid in the process
+        that created them.
+        """
+        self.strains: List[Strain] = []
+        self._index: Dict[tuple, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.strains)
+
+    def __getitem__(self, index: int) -> Strain:
+        return self.strains[index]
+
+    def intern(self, virus: Virus) -> Strain:
+        """返回与 virus 的 id 和参数相同的记录，必要时新建"""
+        strain = getattr(virus, '_strain', None)
+        if strain is not None and strain.index < len(self.strains) and self.strains[strain.index] is strain:
+            return strain
+        system = virus.system
+        key = (virus.id, system, virus.native)
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.strains)
+            self.strains.append(Strain(index, virus.id, system, virus.native))
+        strain = self.strains[index]
+        if isinstance(virus, Virus):
+            virus._strain = strain
+        return strain
+
+
+STRAINS = StrainCatalog()  # 进程内共享的毒株登记表
 
 
 class ImmuneSimulation:
@@ -166,77 +248,213 @@ class ImmuneSimulation:
             'healthy_cells': self.healthy_values
         }
 
-class MultiList:
-    def __init__(self, target=None):
+class StrainHistory:
+    def __init__(self, capacity: int = 64, strains: int = 1):
         """
-        Initializes the MultiList with a target value.
-        
+        Strain-by-time history backed by one preallocated 2D array.
+
+        Every column is one recorded time step shared by all strains, so each history is
+        aligned with MultiSimulation.time_series even when strains join at different times
+        (a strain is zero before it was added). Storage grows by doubling, the latest values
+        are O(1) to read, and the per-column total is kept next to the data.
+
         Parameters:
-            target: The target parameter to manage multiple lists.
+            capacity (int): Initial number of time columns.
+            strains (int): Initial number of strain rows.
         """
-        self.target = target
-        self.lists = {}  # 用于存储多个列表
-        self.number = 0
-
-    def _get_list(self):
-        """获取当前 target 对应的列表，如果不存在，则创建一个新的列表。"""
-        if self.target not in self.lists:
-            self.lists[self.target] = [0] * (self.number - 1)
-        return self.lists[self.target]
-    
-    def normalize(self):
-        for lst in self.lists.values():
-            lst += lst[-1] * (self.number - len(lst))
-
-    def append(self, item):
-        """像列表一样添加元素到当前 target 的列表中。"""
-        self._get_list().append(item)
-        self.number = self.number + 1
-
-    def extend(self, items):
-        """像列表一样扩展当前 target 的列表。"""
-        self._get_list().extend(items)
-
-    def __getitem__(self, index):
-        """获取当前 target 列表的指定索引元素。"""
-        if type(index) == int:
-            return self._get_list()[index]
-        if type(index) == str:
-            lst = self._get_list(index)
-            return lst[-1] if lst else None
-
-    def __setitem__(self, index, value):
-        """设置当前 target 列表的指定索引元素。"""
-        self._get_list()[index] = value
-
-    def __len__(self):
-        """返回当前 target 列表的长度。"""
-        return len(self._get_list())
-
-    def __str__(self):
-        """返回当前 target 列表的字符串表示。"""
-        return str(self._get_list())
-
-    def get_all_lists(self):
-        """返回所有管理的列表。"""
-        return self.lists
-    
+        self.ids = []
+        self._index = {}
+        self._data = np.zeros((max(1, strains), max(1, capacity)))
+        self._total = np.zeros(max(1, capacity))
+        self.length = 1  # 第 0 列是初始时刻
+        self._dirty = False  # 最后一列在 push 之后被改动过，合计需要重算
+
+    def __contains__(self, id) -> bool:
+        return id in self._index
+
     @property
-    def total(self) -> list:
-        """返回一个 NumPy 数组，包含所有列表中元素的总和。"""
-        # 使用列表生成器将所有列表转换为 NumPy 数组
-        total_array = np.sum([np.array(lst) for lst in self.lists.values()], axis=0)
-        return list(total_array)
+    def strains(self) -> int:
+        return len(self.ids)
+
+    def add_strain(self, id, value: float = 0):
+        """新增一个毒株，之前的时刻补 0，当前时刻取 value。"""
+        row = len(self.ids)
+        if row == self._data.shape[0]:
+            data = np.zeros((row * 2, self._data.shape[1]))
+            data[:row] = self._data
+            self._data = data
+        self._data[row] = 0
+        self._data[row, self.length - 1] = value
+        self._index[id] = row
+        self.ids.append(id)
+        self._dirty = True
+
+    def latest(self, id) -> float:
+        return float(self._data[self._index[id], self.length - 1])
+
+    def latest_values(self) -> list:
+        """按加入顺序返回各毒株的当前值。"""
+        return self._data[:len(self.ids), self.length - 1].tolist()
+
+    def latest_array(self) -> np.ndarray:
+        """与 latest_values 相同，但返回数组副本，供按毒株向量化的更新使用。"""
+        return self._data[:len(self.ids), self.length - 1].copy()
+
+    def add(self, id, delta: float):
+        self._data[self._index[id], self.length - 1] += delta
+        self._dirty = True
+
+    def set_latest(self, id, value: float):
+        self._data[self._index[id], self.length - 1] = value
+        self._dirty = True
+
+    def push(self, values: list, overwrite: bool = False):
+        """写入新的一列（按加入顺序）；overwrite 为真时替换最后一列。"""
+        if not overwrite:
+            self.latest_total  # 先补算被改动过的最后一列的合计，之后它不再是最后一列
+            if self.length == self._data.shape[1]:
+                data = np.zeros((self._data.shape[0], self.length * 2))
+                data[:, :self.length] = self._data
+                self._data = data
+                total = np.zeros(self.length * 2)
+                total[:self.length] = self._total
+                self._total = total
+            self.length += 1
+        column = self.length - 1
+        self._data[:len(values), column] = values
+        self._total[column] = self._sum(values.tolist() if isinstance(values, np.ndarray) else values)
+        self._dirty = False
+
+    @staticmethod
+    def _sum(values) -> float:
+        # 与逐个累加的顺序保持一致
+        number = 0
+        for value in values:
+            number += value
+        return number
+
+    @property
+    def latest_total(self) -> float:
+        if self._dirty:
+            self._total[self.length - 1] = self._sum(self.latest_values())
+            self._dirty = False
+        return float(self._total[self.length - 1])
+
+    def history(self, id) -> np.ndarray:
+        """返回某个毒株完整历史的只读视图（不复制）。"""
+        view = self._data[self._index[id], :self.length]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def total(self) -> np.ndarray:
+        """返回各时刻所有毒株之和的只读视图（不复制）。"""
+        self.latest_total
+        view = self._total[:self.length]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def lists(self) -> dict:
+        return {id: self.history(id) for id in self.ids}
+
+
+class DelayBuffer:
+    __slots__ = ('size', '_data', '_pos', 'count')
+
+    def __init__(self, size: int, values=(), count: int = None):
+        """
+        Fixed-size ring buffer holding the last `size` values of a series.
+
+        Storage is allocated on the first non-zero value, so a host that was never
+        infected does not hold `size` zeros.
+
+        Parameters:
+            size (int): Delay in steps; memory stays constant at `size` values.
+            values: Most recent values of the series, oldest first.
+            count (int): Total length of the series so far (defaults to len(values)).
+        """
+        self.size = size
+        self._data = None
+        self._pos = 0
+        self.count = 0
+        values = list(values)[-size:] if size else []
+        for value in values:
+            self.append(value)
+        self.count = count if count is not None else len(values)
+
+    def append(self, value):
+        if self.size:
+            if self._data is None and value:
+                self._data = [0] * self.size
+            if self._data is not None:
+                self._data[self._pos] = value
+            self._pos = (self._pos + 1) % self.size
+        self.count += 1
+
+    def delayed(self):
+        """Same as history[-size] if len(history) > size else 0."""
+        return self._data[self._pos] if self._data is not None and self.count > self.size else 0
+
+    def values(self) -> list:
+        """Returns the buffered values, oldest first."""
+        n = min(self.count, self.size)
+        if self._data is None: return [0] * n
+        return [self._data[(self._pos - n + k) % self.size] for k in range(n)]
 
 
 class MultiSimulation:
-    def __init__(self, native_immune: ImmuneData, dt: float):
+    def __init__(self, native_immune: ImmuneData, dt: float, d: int = 500, record_every: int = 1,
+                 solver: str = 'euler', rtol: float = 1e-6, atol: float = 1e-9, max_step: float = 1.0,
+                 strain_update: str = 'sequential', cross_reactivity: dict = None):
+        """
+        Within-host model with several virus strains sharing one immune system.
+
+        Parameters:
+            native_immune (ImmuneData): Parameters of the host's own immune system.
+            dt (float): Time step size for simulation (the output grid in adaptive mode).
+            d (int): Immune response delay in steps.
+            record_every (int): Keep every n-th step in the history lists; 0 keeps only the latest
+                values, so memory per simulation stays constant however long it runs.
+            solver (str): 'euler' for the fixed-step model, 'rk45' for adaptive Dormand–Prince
+                steps with error control; delayed terms are then interpolated from a dense history.
+            rtol, atol (float): Error tolerances of the adaptive solver.
+            max_step (float): Largest adaptive step in days.
+            strain_update (str): How the euler solver advances several strains. 'sequential' visits
+                strains one after another, each seeing the host state already changed by the previous
+                ones; 'vectorized' updates all strains from the same state in one NumPy expression,
+                which scales to many strains and agrees with 'sequential' to O(dt).
+            cross_reactivity (dict): Off-diagonal entries of the strain x strain neutralization
+                matrix, {(target_id, antibody_id): rate}: antibodies raised against `antibody_id`
+                also neutralize `target_id` at this rate. The diagonal defaults to each strain's
+                own g1. Needs strain_update='vectorized' or solver='rk45'.
+        """
+        if solver not in ('euler', 'rk45'):
+            raise ValueError(f'Unknown solver: {solver}')
+        if strain_update not in ('sequential', 'vectorized'):
+            raise ValueError(f'Unknown strain update: {strain_update}')
+        if cross_reactivity and solver == 'euler' and strain_update == 'sequential':
+            raise ValueError("cross_reactivity needs strain_update='vectorized' or solver='rk45'")
         self.native = native_immune
         self.dt = dt
-        self.d = 500
-
-        self.virus_values = MultiList()
-        self.antibody_values = MultiList()
+        self.d = d
+        self.record_every = record_every
+        self.solver = solver
+        self.strain_update = strain_update
+        self.cross_reactivity = dict(cross_reactivity or {})
+        self._params = None  # 按毒株排列的参数向量，新增毒株时重建
+        self._strain_rows = None  # STRAINS 编号 -> virus_values 的行号，按需建立
+        self._strain_indices = None
+        self.rtol, self.atol, self.max_step = rtol, atol, max_step
+        self.rhs_evaluations = 0
+        self._h = None  # 上一次自适应步长，下次继续使用
+        self._dense = DenseHistory(d * dt, 0.0, [0.0, 0.0]) if solver != 'euler' else None
+        self.steps = 0
+        self._overwrite = not record_every  # 最后一条历史是否只是最新值（下一步会被覆盖）
+
+        # 只保留最新值时历史只有一列
+        self.virus_values = StrainHistory(64 if record_every else 1)
+        self.antibody_values = StrainHistory(64 if record_every else 1)
 
         self.infected_virus = []
         
@@ -244,6 +462,10 @@ class MultiSimulation:
         self.infected_cells = 0
         self.immune_cells = 0
         self.antibodies = 0
+
+        # Ring buffers for the delayed terms I(t-d) and M(t-d)
+        self.infected_delay = DelayBuffer(d, [0])
+        self.immune_delay = DelayBuffer(d, [0])
         
         # Lists to store time series data for each variable
         self.infected_values = [0]
@@ -252,44 +474,108 @@ class MultiSimulation:
         self.healthy_values = [self.native.N]
         self.time_series = [0]
     
+    def __getstate__(self):
+        # 毒株编号只在当前进程中有效，缓存在反序列化后重建
+        state = self.__dict__.copy()
+        state['_strain_rows'] = state['_strain_indices'] = None
+        return state
+
     def add_virus(self, virus:Virus):
-        if virus.id in self.virus_values.lists:
-            self.virus_values.lists[virus.id][-1] += virus.count * self.dt
+        if virus.id in self.virus_values:
+            self.virus_values.add(virus.id, virus.count * self.dt)
         else:
-            self.virus_values.target = virus.id
-            self.antibody_values.target = virus.id
-            self.antibody_values.append(0)
-            self.virus_values.append(virus.count)
+            self.antibody_values.add_strain(virus.id, 0)
+            self.virus_values.add_strain(virus.id, virus.count)
             self.infected_virus.append(virus)
+            self._params = None
+            self._strain_indices = None
+            if self._strain_rows is not None:
+                self._strain_rows[STRAINS.intern(virus).index] = len(self.infected_virus) - 1
+
+    def add_virus_batch(self, strains, doses):
+        """
+        按 STRAINS 编号批量加入病毒（数组或列表），与依次调用 add_virus(STRAINS[k].virus(dose)) 的结果相同：
+        已感染的毒株累加 dose * dt，新毒株以 dose 为初始量登记
+        """
+        if isinstance(strains, np.ndarray): strains = strains.tolist()
+        if isinstance(doses, np.ndarray): doses = doses.tolist()
+        history = self.virus_values
+        column = history._data[:, history.length - 1]
+        rows = self._rows()
+        for index, dose in zip(strains, doses):
+            row = rows.get(index)
+            if row is None:
+                strain = STRAINS[index]
+                if strain.id not in history:
+                    self.add_virus(strain.virus(dose))
+                    column = history._data[:, history.length - 1]  # 新增毒株可能重新分配存储
+                    continue
+                row = rows[index] = history._index[strain.id]  # 同 id、不同参数的记录并入已有毒株
+            column[row] += dose * self.dt
+        history._dirty = True
+
+    def _rows(self) -> Dict[int, int]:
+        """STRAINS 编号 -> virus_values 的行号"""
+        if self._strain_rows is None:
+            self._strain_rows = {index: row for row, index in enumerate(self.strain_indices.tolist())}
+        return self._strain_rows
+
+    @property
+    def strain_indices(self) -> np.ndarray:
+        """各毒株（按感染顺序）在 STRAINS 中的编号"""
+        if self._strain_indices is None:
+            self._strain_indices = np.array([STRAINS.intern(virus).index for virus in self.infected_virus], dtype=int)
+        return self._strain_indices
+
+    def latest_virus_values(self) -> np.ndarray:
+        """按感染顺序返回各毒株的当前病毒量"""
+        return self.virus_values.latest_array()
+
+    def set_cross_reactivity(self, target_id, antibody_id, rate: float):
+        """设置交叉反应矩阵中的一项：针对 antibody_id 的抗体以 rate 中和 target_id"""
+        if self.solver == 'euler' and self.strain_update == 'sequential':
+            raise ValueError("cross_reactivity needs strain_update='vectorized' or solver='rk45'")
+        self.cross_reactivity[(target_id, antibody_id)] = rate
+        self._params = None
+
+    def cross_reactivity_matrix(self) -> np.ndarray:
+        """毒株 x 毒株的中和系数矩阵 X（按加入顺序），病毒 k 被抗体中和的速率为 (X @ Ab)[k]"""
+        return self._strain_params()['cross'].copy()
     
     @property
     def total_virus(self) -> float:
-        number = 0
-        for i in self.virus_values.lists.values():
-            number += i[-1]
-        return number
+        return self.virus_values.latest_total
+
+    def latest_virus(self, id) -> float:
+        return self.virus_values.latest(id)
+
+    def has_virus(self, id) -> bool:
+        return id in self.virus_values
     
     def update(self):
+        if self.strain_update == 'vectorized':
+            self._update_vectorized()
+            return
+        overwrite = self._overwrite
         H = min(self.native.N, self.native.N - self.infected_cells)
-        for virus in self.infected_virus:
+        viruses = self.virus_values.latest_values()
+        antibodies = self.antibody_values.latest_values()
+        for k, virus in enumerate(self.infected_virus):
             immune = virus.system
-            self.virus_values.target = virus.id
-            self.antibody_values.target = virus.id
-
-            virus_number = self.virus_values[-1]
-            antibody_number = self.antibody_values[-1]
+            virus_number = viruses[k]
+            antibody_number = antibodies[k]
             # Virus change rate
             dV_dt = immune.s * (1 - self.infected_cells / self.native.N) * virus_number - immune.u * virus_number * H \
                 - self.native.g1 * self.antibodies * virus_number * (1 + self.infected_cells / self.native.N) * virus.native \
                 - immune.g1 * antibody_number * virus_number * (1 + self.infected_cells / self.native.N)
         
             # Immune cells change rate, with delay in immune response
-            delayed_infected = self.infected_values[-self.d] if len(self.infected_values) > self.d else 0
+            delayed_infected = self.infected_delay.delayed()
             dM_dt = immune.i * delayed_infected * virus_number - immune.m * self.immune_cells
 
             # Infected cells change rate
 
-            delayed_immune = self.immune_values[-self.d] if len(self.immune_values) > self.d else 0
+            delayed_immune = self.immune_delay.delayed()
             dI_dt = immune.a * max(0, virus_number) - self.native.m * delayed_immune
         
             # Antibodies change rate
@@ -299,46 +585,176 @@ class MultiSimulation:
             # Update current values
             virus_number += dV_dt * self.dt - 1e-4
             antibody_number += dA_dt_sys * self.dt
-            self.virus_values.append(max(0, virus_number))
-            self.antibody_values.append(antibody_number)
+            viruses[k] = max(0, virus_number)
+            antibodies[k] = antibody_number
 
             self.antibodies += dA_dt_native * self.dt
             self.infected_cells += dI_dt * self.dt
             self.immune_cells += dM_dt * self.dt
 
-        #self.antibody_values.normalize()
-        #self.virus_values.normalize()
+        self.virus_values.push(viruses, overwrite)
+        self.antibody_values.push(antibodies, overwrite)
         
         self.infected_cells = min(self.native.N, max(0, self.infected_cells))
+        self.infected_delay.append(self.infected_cells)
+        self.immune_delay.append(self.immune_cells)
+        self.rhs_evaluations += len(self.infected_virus)
+        self._record(overwrite)
 
-        self.infected_values.append(self.infected_cells)
-        self.immune_values.append(self.immune_cells)
-        self.healthy_values.append(self.native.N - self.infected_cells)
-        self.antibody_native_values.append(self.antibodies)
+    def _update_vectorized(self):
+        """
+        One Euler step with every strain computed from the same host state (Jacobi instead of the
+        sequential sweep): V, Ab are strain vectors and X is the cross-reactivity matrix.
+        """
+        overwrite = self._overwrite
+        params = self._strain_params()
+        native, k = self.native, len(self.infected_virus)
+        N, I, M, A = native.N, self.infected_cells, self.immune_cells, self.antibodies
+        H = min(N, N - I)
+        V = self.virus_values.latest_array()
+        Ab = self.antibody_values.latest_array()
+        delayed_infected = self.infected_delay.delayed()
+        delayed_immune = self.immune_delay.delayed()
+
+        dV_dt = params['s'] * (1 - I / N) * V - params['u'] * V * H \
+            - (native.g1 * A * params['native'] + params['cross'] @ Ab) * V * (1 + I / N)
+        dM_dt = (params['i'] * delayed_infected * V - params['m'] * M).sum()
+        dI_dt = (params['a'] * np.maximum(0, V) - native.m * delayed_immune).sum()
+        dA_dt = k * (native.g3 * M - native.g2 * A)
+        dAb_dt = params['g3'] * M - params['g2'] * Ab
+
+        self.virus_values.push(np.maximum(0, V + (dV_dt * self.dt - 1e-4)), overwrite)
+        self.antibody_values.push(Ab + dAb_dt * self.dt, overwrite)
+        self.antibodies = float(A + dA_dt * self.dt)
+        self.immune_cells = float(M + dM_dt * self.dt)
+        self.infected_cells = min(N, max(0, float(I + dI_dt * self.dt)))
+        self.infected_delay.append(self.infected_cells)
+        self.immune_delay.append(self.immune_cells)
+        self.rhs_evaluations += k
+        self._record(overwrite)
+
+    def _record(self, overwrite: bool):
+        self.steps += 1
+        self._push(self.infected_values, self.infected_cells, overwrite)
+        self._push(self.immune_values, self.immune_cells, overwrite)
+        self._push(self.healthy_values, self.native.N - self.infected_cells, overwrite)
+        self._push(self.antibody_native_values, self.antibodies, overwrite)
+        self._push(self.time_series, self.steps * self.dt, overwrite)
+        self._overwrite = not (self.record_every and self.steps % self.record_every == 0)
+
+    @staticmethod
+    def _push(values: list, value, overwrite: bool):
+        if overwrite:
+            values[-1] = value
+        else:
+            values.append(value)
     
     def simulate(self, total_time: float):
         """Runs the simulation for a specified total time."""
+        prof = profiler.active()
+        started = prof.begin() if prof is not None else 0.0
         num_steps = int(total_time / self.dt)
-        for _ in range(num_steps):
-            self.update()
-            self.time_series.append(len(self.time_series) * self.dt)
+        if self.solver != 'euler':
+            self.solve((self.steps + np.arange(1, num_steps + 1)) * self.dt)
+        else:
+            for _ in range(num_steps):
+                self.update()
+        if prof is not None:
+            prof.end('MultiSimulation.simulate', started, 'within-host', event=prof.agent_events, steps=num_steps)
+
+    def _strain_params(self):
+        if self._params is not None:
+            return self._params
+        systems = [virus.system for virus in self.infected_virus]
+        params = {name: np.array([getattr(system, name) for system in systems], dtype=float)
+                  for name in ('s', 'a', 'u', 'i', 'm', 'g1', 'g2', 'g3')}
+        params['native'] = np.array([virus.native for virus in self.infected_virus], dtype=float)
+        # 对角线是各毒株自身的 g1，其余项来自 cross_reactivity（尚未感染的毒株忽略）
+        cross = np.diag(params['g1'])
+        rows = {virus.id: k for k, virus in enumerate(self.infected_virus)}
+        for (target, source), rate in self.cross_reactivity.items():
+            if target in rows and source in rows:
+                cross[rows[target], rows[source]] = rate
+        params['cross'] = cross
+        self._params = params
+        return params
+
+    def rhs(self, params: dict, leak: float):
+        """
+        Continuous right-hand side matching the Euler update as dt -> 0.
+
+        State y = [I, M, A, V_1..V_k, Ab_1..Ab_k]; `lag` holds I(t-d*dt) and M(t-d*dt).
+        The fixed -1e-4 per step virus decay becomes the rate `leak`.
+        """
+        native = self.native
+        N, k = native.N, len(params['s'])
+        s, a, u, i, m = params['s'], params['a'], params['u'], params['i'], params['m']
+        g2, g3, strain_native, cross = params['g2'], params['g3'], params['native'], params['cross']
+
+        def f(t, y, lag):
+            I, M, A = y[0], y[1], y[2]
+            V, Ab = y[3:3 + k], y[3 + k:]
+            delayed_infected, delayed_immune = lag
+            H = min(N, N - I)
+            dV_dt = s * (1 - I / N) * V - u * V * H \
+                - native.g1 * A * V * (1 + I / N) * strain_native \
+                - (cross @ Ab) * V * (1 + I / N) - leak
+            dV_dt = np.where((V <= 0) & (dV_dt < 0), 0.0, dV_dt)
+            dM_dt = np.sum(i * delayed_infected * V - m * M)
+            dI_dt = np.sum(a * np.maximum(0, V) - native.m * delayed_immune)
+            if (I <= 0 and dI_dt < 0) or (I >= N and dI_dt > 0):
+                dI_dt = 0.0
+            dA_dt = k * (native.g3 * M - native.g2 * A)
+            dAb_dt = g3 * M - g2 * Ab
+            return np.concatenate(([dI_dt, dM_dt, dA_dt], dV_dt, dAb_dt))
+        return f
+
+    def solve(self, t_eval):
+        """
+        Advances the adaptive solver to t_eval[-1] and records the state at every time in t_eval
+        (absolute times after the current one, e.g. the dt grid used by simulate).
+        """
+        k = len(self.infected_virus)
+        N = self.native.N
+        y0 = np.concatenate(([self.infected_cells, self.immune_cells, self.antibodies],
+                             self.virus_values.latest_values(), self.antibody_values.latest_values()))
+
+        def project(y):
+            y = y.copy()
+            y[..., 0] = np.clip(y[..., 0], 0.0, N)
+            y[..., 3:3 + k] = np.maximum(0.0, y[..., 3:3 + k])
+            return y
+
+        f = self.rhs(self._strain_params(), 1e-4 / self.dt)
+        ys, self._h, nfev = integrate(f, self.steps * self.dt, y0, t_eval, self._dense, (0, 1),
+                                      rtol=self.rtol, atol=self.atol, h0=self._h, max_step=self.max_step,
+                                      project=project)
+        self.rhs_evaluations += nfev * k
+        for y in ys:
+            overwrite = self._overwrite
+            self.infected_cells, self.immune_cells, self.antibodies = float(y[0]), float(y[1]), float(y[2])
+            self.virus_values.push(y[3:3 + k].tolist(), overwrite)
+            self.antibody_values.push(y[3 + k:].tolist(), overwrite)
+            self._record(overwrite)
     
     @property
     def death_ratio(self):
         return self.infected_cells / self.native.N
     
-    def req_all_virus_history(self) -> list:
+    def req_all_virus_history(self) -> np.ndarray:
         return self.virus_values.total
 
-    def req_virus_history(self, id) -> list:
-        return self.virus_values.lists[id]
+    def req_virus_history(self, id) -> np.ndarray:
+        return self.virus_values.history(id)
     
-    def req_antibody_history(self, id) -> list:
-        return self.antibody_values.lists[id]
+    def req_antibody_history(self, id) -> np.ndarray:
+        return self.antibody_values.history(id)
 
 
 # 测试类的功能
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     time_duration = 42  # 总时间
     # immune_simulation = ImmuneSimulation(dt=0.01, virus=0.1)  # 创建仿真实例
     immune_simulation = MultiSimulation(native_immune=ImmuneData(), dt=0.01)
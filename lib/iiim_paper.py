@@ -1,192 +1,373 @@
+"""
+论文中的详细免疫模型：病毒、抗体、感染细胞、受刺激的巨噬细胞、TH1 / TH2 辅助 T 细胞、细胞毒性 T 细胞与 B 细胞
+
+PaperModel 把多组参数作为数组的列同时积分，延迟项（t_H1、t_H2、t_C、t_B、t_a，单位为步）保存在环形缓冲区中，
+结果以数组返回，不依赖 matplotlib。PaperSimulation 把单个宿主包装成 MultiSimulation 的接口，可作为 ImmuneAgent 的宿主内模型。
+直接运行本文件时按原来的参数积分一次并绘图。
+"""
+import dataclasses
 import numpy as np
-import matplotlib.pyplot as plt
-
-# 初始化参数
-delta_t = 1e-2  # 时间步长
-total_time = 1.5   # 总时间（单位：week）
-time_steps = int(total_time / delta_t)  # 计算的时间步数
-
-# 初始化数组
-V = np.zeros(time_steps)  # 病毒浓度数组
-A = np.zeros(time_steps)  # 抗体浓度数组
-CV = np.zeros(time_steps)  # 感染细胞数量数组
-MSV = np.zeros(time_steps)  # 刺激的巨噬细胞数量数组
-TH1 = np.zeros(time_steps)  # 类1辅助T淋巴细胞数量数组
-TH2 = np.zeros(time_steps)  # 类2辅助T淋巴细胞数量数组
-TE = np.zeros(time_steps)   # 细胞毒性T淋巴细胞数量数组
-B = np.zeros(time_steps)    # B淋巴细胞数量数组
-
-# 初始条件
-CT = 1.7e-14   # 总细胞数量
-AT = 8.5e12    # 最大抗体量
-MT = 1e-18     # 初始巨噬细胞数量
-TH1_T = 1e-18  # TH1细胞的目标浓度
-TH2_T = 1e-18  # TH2细胞的目标浓度
-TE_T = 1e-18   # TE细胞的目标浓度
-B_T = 1e-21    # B细胞的目标浓度
-
-# 变量设置
-V[0] = 1e-15   # 初始病毒量
-A[0] = 8.5e-16      # 初始抗体量
-CV[0] = 0      # 初始感染细胞数量
-TH1[0] = TH1_T # 初始TH1细胞数量
-TH2[0] = TH2_T # 初始TH2细胞数量
-TE[0] = TE_T   # 初始细胞毒性T淋巴细胞数量
-B[0] = B_T     # 初始B细胞数量
-
-# 参数设置
-
-# 健康细胞感染和病毒相关参数
-s = 3.43e13    # 健康细胞感染速率
-v = 970.9      # 病毒生成速率
-g_vc = 5.39e13 # 病毒感染细胞的损耗率
-g_va = 3.56e15  # 病毒受到抗体的中和率
-b_ce = 1.9e8   # 破坏细胞常数
-bm = 12.92
-n = 0
-
-# 抗体相关参数
-g_av = 7.77e7  # 抗体对病毒的抑制率
-b_a = 0.4     # 抗体生成率
-t_a = 1        # 抗体生成延迟
-
-# 巨噬细胞相关参数
-g_vm = 1.7     # 巨噬细胞对病毒的清除率
-a_m = 3.3      # 巨噬细胞的自然死亡率
-
-# TH1细胞的生成参数
-b_hMv = 1e28   # TH1细胞生成率
-p_hMv = 4      # TH1细胞生成的比例
-t_H1 = 6       # TH1细胞响应的延迟
-a_h = 1        # TH1细胞的自然死亡率
-
-# TH2细胞的生成参数
-b_hB = 3.15e28 # TH2细胞生成率
-p_hB = 4       # TH2细胞生成的比例
-t_H2 = 6       # TH2细胞响应的延迟
-a_hB = 1       # TH2细胞的自然死亡率
-
-# TE细胞的生成参数
-b_p = 5.5e45   # TE细胞生成率
-p_e = 14        # TE细胞生成的比例
-t_C = 3        # TE细胞响应的延迟
-b_ec = 1.2e13  # TE细胞因感染细胞而死亡的损耗率
-a_e = 0.4002   # TE细胞的自然死亡率
-
-# B细胞的生成参数
-b_pB = 5.4e46  # B细胞生成率
-p_b = 1        # B细胞生成的比例
-t_B = 1        # B细胞响应的延迟
-a_b = 0.3      # B细胞的自然死亡率
-
-# 主循环
-for t in range(1, time_steps):
-
-    Chiv = CT - CV[t-1]  # 当前健康细胞数量
-
-    # 更新病毒量
-    V[t] = V[t-1] + (v * CV[t-1] * (1 - CV[t-1] / CT)) * delta_t  # 病毒自然增长
-    V[t] -= (g_va * A[t-1] * V[t-1] * (1 + (CV[t-1] / CT))) * delta_t  # 抗体中和导致的损耗
-    V[t] -= (g_vc * Chiv * V[t-1]) * delta_t  # 由于感染导致的病毒损耗
-
-    # 更新刺激的巨噬细胞数量
-    MSV[t] = MSV[t-1] + (g_vm * MT * V[t-1]) * delta_t  # 巨噬细胞数量增加
-    MSV[t] -= (a_m * MSV[t-1]) * delta_t  # 巨噬细胞自然死亡
-
-    # 更新TH1细胞数量
-    TH1[t] = TH1[t-1] + (b_hMv * (p_hMv * MSV[t-t_H1] * TH1[t-t_H1] - MSV[t-1] * TH1[t-1])) * delta_t  # TH1细胞生成
-    TH1[t] += a_h * (TH1_T - TH1[t-1]) * delta_t  # 调整TH1细胞数量接近目标浓度
-
-    # 更新TH2细胞数量
-    TH2[t] = TH2[t-1] + (b_hB * (p_hB * MSV[t-t_H2] * TH2[t-t_H2] - MSV[t-1] * TH2[t-1])) * delta_t  # TH2细胞生成
-    TH2[t] += a_hB * (TH2_T - TH2[t-1]) * delta_t  # 调整TH2细胞数量接近目标浓度
-
-    # 更新细胞毒性T淋巴细胞数量
-    TE[t] = TE[t-1] + b_p * (p_e * MSV[t - t_C] * TH1[t-t_C] * TH2[t-t_C]) * delta_t  # TE细胞生成
-    TE[t] += b_ec * CV[t-1] * TE[t-1] * delta_t  # TE细胞因感染细胞而死亡
-    TE[t] += a_e * (TE_T - TE[t-1]) * delta_t  # 调整TE细胞数量接近目标浓度
-    
-    # 更新B细胞数量
-    B[t] = B[t-1] + b_pB * (p_b * TH2[t-1] * MSV[t-t_B] * B[t-t_B]) * delta_t  # B细胞生成
-    B[t] += a_b * (B_T - B[t-1]) * delta_t  # 调整B细胞数量接近目标浓度
-
-    # 更新抗体量
-    A[t] = A[t-1] + b_a * A[t-t_a] * (1 - A[t-t_a]/AT) * delta_t  # 抗体生成
-    A[t] -= (g_av * A[t-1] * V[t-1]) * delta_t  # 抗体因中和病毒而减少
-
-    # 更新感染细胞数量
-    CV[t] = CV[t-1] + s * V[t] * Chiv * delta_t  # 新增感染细胞
-    CV[t] -= b_ce * CV[t-1] * TE[t-1] * delta_t  # 杀死的感染细胞
-
-
-time = np.linspace(0, 14, time_steps)
-
-# 绘图
-plt.figure(figsize=(14, 12))
-
-# 绘制病毒浓度
-plt.subplot(4, 2, 1)
-plt.plot(time, V, label='Virus Concentration (V)', color='red')
-plt.title('Virus Concentration Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Concentration (mol/L)')
-plt.grid(True)
-
-# 绘制抗体浓度
-plt.subplot(4, 2, 2)
-plt.plot(time, A, label='Antibody Concentration (A)', color='blue')
-plt.title('Antibody Concentration Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Concentration (mol/L)')
-plt.grid(True)
-
-# 绘制感染细胞数量
-plt.subplot(4, 2, 3)
-plt.plot(time, CV, label='Infected Cells (CV)', color='green')
-plt.title('Infected Cells Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Number of Cells')
-plt.grid(True)
-
-# 绘制刺激的巨噬细胞数量
-plt.subplot(4, 2, 4)
-plt.plot(time, MSV, label='Stimulated Macrophages (MSV)', color='orange')
-plt.title('Stimulated Macrophages Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Number of Cells')
-plt.grid(True)
-
-# 绘制 TH1 细胞数量
-plt.subplot(4, 2, 5)
-plt.plot(time, TH1, label='TH1 Cells', color='purple')
-plt.title('TH1 Cells Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Number of Cells')
-plt.grid(True)
-
-# 绘制 TH2 细胞数量
-plt.subplot(4, 2, 6)
-plt.plot(time, TH2, label='TH2 Cells', color='brown')
-plt.title('TH2 Cells Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Number of Cells')
-plt.grid(True)
-
-# 绘制细胞毒性T淋巴细胞数量
-plt.subplot(4, 2, 7)
-plt.plot(time, TE, label='Cytotoxic T Cells (TE)', color='cyan')
-plt.title('Cytotoxic T Cells Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Number of Cells')
-plt.grid(True)
-
-# 绘制 B 细胞数量
-plt.subplot(4, 2, 8)
-plt.plot(time, B, label='B Cells', color='magenta')
-plt.title('B Cells Over Time')
-plt.xlabel('Time (days)')
-plt.ylabel('Number of Cells')
-plt.grid(True)
-
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+from typing import Dict, List, Union
+if __package__:
+    from .iiim_model import Virus, STRAINS
+else:  # 直接以脚本运行：python lib/iiim_paper.py
+    from iiim_model import Virus, STRAINS
+
+
+@dataclasses.dataclass
+class PaperData:
+    """
+    Parameters and initial conditions of the detailed immune model.
+
+    Every field may be a scalar or an array of per-variant values; PaperModel broadcasts
+    them to one column per variant. Delays (t_H1, t_H2, t_C, t_B, t_a) are integer steps >= 1.
+    """
+    # 初始条件
+    CT: float = 1.7e-14   # 总细胞数量
+    AT: float = 8.5e12    # 最大抗体量
+    MT: float = 1e-18     # 初始巨噬细胞数量
+    TH1_T: float = 1e-18  # TH1细胞的目标浓度
+    TH2_T: float = 1e-18  # TH2细胞的目标浓度
+    TE_T: float = 1e-18   # TE细胞的目标浓度
+    B_T: float = 1e-21    # B细胞的目标浓度
+    V0: float = 1e-15     # 初始病毒量
+    A0: float = 8.5e-16   # 初始抗体量
+
+    # 健康细胞感染和病毒相关参数
+    s: float = 3.43e13    # 健康细胞感染速率
+    v: float = 970.9      # 病毒生成速率
+    g_vc: float = 5.39e13 # 病毒感染细胞的损耗率
+    g_va: float = 3.56e15 # 病毒受到抗体的中和率
+    b_ce: float = 1.9e8   # 破坏细胞常数
+
+    # 抗体相关参数
+    g_av: float = 7.77e7  # 抗体对病毒的抑制率
+    b_a: float = 0.4      # 抗体生成率
+    t_a: int = 1          # 抗体生成延迟
+
+    # 巨噬细胞相关参数
+    g_vm: float = 1.7     # 巨噬细胞对病毒的清除率
+    a_m: float = 3.3      # 巨噬细胞的自然死亡率
+
+    # TH1细胞的生成参数
+    b_hMv: float = 1e28   # TH1细胞生成率
+    p_hMv: float = 4      # TH1细胞生成的比例
+    t_H1: int = 6         # TH1细胞响应的延迟
+    a_h: float = 1        # TH1细胞的自然死亡率
+
+    # TH2细胞的生成参数
+    b_hB: float = 3.15e28 # TH2细胞生成率
+    p_hB: float = 4       # TH2细胞生成的比例
+    t_H2: int = 6         # TH2细胞响应的延迟
+    a_hB: float = 1       # TH2细胞的自然死亡率
+
+    # TE细胞的生成参数
+    b_p: float = 5.5e45   # TE细胞生成率
+    p_e: float = 14       # TE细胞生成的比例
+    t_C: int = 3          # TE细胞响应的延迟
+    b_ec: float = 1.2e13  # TE细胞因感染细胞而死亡的损耗率
+    a_e: float = 0.4002   # TE细胞的自然死亡率
+
+    # B细胞的生成参数
+    b_pB: float = 5.4e46  # B细胞生成率
+    p_b: float = 1        # B细胞生成的比例
+    t_B: int = 1          # B细胞响应的延迟
+    a_b: float = 0.3      # B细胞的自然死亡率
+
+
+PAPER_FIELDS = tuple(field.name for field in dataclasses.fields(PaperData))
+DELAYS = ('t_H1', 't_H2', 't_C', 't_B', 't_a')
+STATE = ('V', 'A', 'CV', 'MSV', 'TH1', 'TH2', 'TE', 'B')
+DELAYED = ('A', 'MSV', 'TH1', 'TH2', 'B')  # 带延迟项的状态
+
+
+class PaperModel:
+    def __init__(self, params: Union[PaperData, List[PaperData]] = None, dt: float = 1e-2):
+        """
+        Batched integrator of the detailed immune model.
+
+        Parameters:
+            params (PaperData | list): One parameter set (fields may be arrays, one entry per
+                variant) or a list of parameter sets, one per column.
+            dt (float): Time step size (weeks in the original parameterisation).
+        """
+        if params is None:
+            params = PaperData()
+        if isinstance(params, (list, tuple)):
+            values = {name: np.array([getattr(p, name) for p in params]) for name in PAPER_FIELDS}
+        else:
+            values = {name: np.asarray(getattr(params, name)) for name in PAPER_FIELDS}
+        self.n = int(np.broadcast_shapes(*(value.shape for value in values.values()), (1,))[0])
+        self.p = {name: np.broadcast_to(value, (self.n,)).astype(int if name in DELAYS else float)
+                  for name, value in values.items()}
+        if any((self.p[name] < 1).any() for name in DELAYS):
+            raise ValueError('Delays must be at least one step')
+        self.dt = dt
+        self.steps = 0
+
+        p = self.p
+        zeros = np.zeros(self.n)
+        self.state = {'V': p['V0'].copy(), 'A': p['A0'].copy(), 'CV': zeros.copy(), 'MSV': zeros.copy(),
+                      'TH1': p['TH1_T'].copy(), 'TH2': p['TH2_T'].copy(), 'TE': p['TE_T'].copy(), 'B': p['B_T'].copy()}
+        # 环形缓冲区保存最近 size 步的值，第 t 步的值位于 t % size 行
+        self.size = int(max(p[name].max() for name in DELAYS))
+        self._buffers = {name: np.zeros((self.size, self.n)) for name in DELAYED}
+        self._columns = np.arange(self.n)
+        self._store()
+
+    def _store(self):
+        row = self.steps % self.size
+        for name in DELAYED:
+            self._buffers[name][row] = self.state[name]
+
+    def delayed(self, name: str, lag: np.ndarray) -> np.ndarray:
+        """当前要计算的第 steps + 1 步所需的 X[t - lag]；t - lag < 0 时为 0"""
+        index = self.steps + 1 - lag
+        values = self._buffers[name][index % self.size, self._columns]
+        return np.where(index >= 0, values, 0.0)
+
+    def step(self):
+        """推进一步，运算顺序与原脚本相同"""
+        p, dt, x = self.p, self.dt, self.state
+        V, A, CV, MSV, TH1, TH2, TE, B = (x[name] for name in STATE)
+        delayed = self.delayed
+
+        Chiv = p['CT'] - CV  # 当前健康细胞数量
+
+        # 更新病毒量
+        V_new = V + (p['v'] * CV * (1 - CV / p['CT'])) * dt  # 病毒自然增长
+        V_new -= (p['g_va'] * A * V * (1 + (CV / p['CT']))) * dt  # 抗体中和导致的损耗
+        V_new -= (p['g_vc'] * Chiv * V) * dt  # 由于感染导致的病毒损耗
+
+        # 更新刺激的巨噬细胞数量
+        MSV_new = MSV + (p['g_vm'] * p['MT'] * V) * dt  # 巨噬细胞数量增加
+        MSV_new -= (p['a_m'] * MSV) * dt  # 巨噬细胞自然死亡
+
+        # 更新TH1细胞数量
+        lag = p['t_H1']
+        TH1_new = TH1 + (p['b_hMv'] * (p['p_hMv'] * delayed('MSV', lag) * delayed('TH1', lag) - MSV * TH1)) * dt  # TH1细胞生成
+        TH1_new += p['a_h'] * (p['TH1_T'] - TH1) * dt  # 调整TH1细胞数量接近目标浓度
+
+        # 更新TH2细胞数量
+        lag = p['t_H2']
+        TH2_new = TH2 + (p['b_hB'] * (p['p_hB'] * delayed('MSV', lag) * delayed('TH2', lag) - MSV * TH2)) * dt  # TH2细胞生成
+        TH2_new += p['a_hB'] * (p['TH2_T'] - TH2) * dt  # 调整TH2细胞数量接近目标浓度
+
+        # 更新细胞毒性T淋巴细胞数量
+        lag = p['t_C']
+        TE_new = TE + p['b_p'] * (p['p_e'] * delayed('MSV', lag) * delayed('TH1', lag) * delayed('TH2', lag)) * dt  # TE细胞生成
+        TE_new += p['b_ec'] * CV * TE * dt  # TE细胞因感染细胞而死亡
+        TE_new += p['a_e'] * (p['TE_T'] - TE) * dt  # 调整TE细胞数量接近目标浓度
+
+        # 更新B细胞数量
+        lag = p['t_B']
+        B_new = B + p['b_pB'] * (p['p_b'] * TH2 * delayed('MSV', lag) * delayed('B', lag)) * dt  # B细胞生成
+        B_new += p['a_b'] * (p['B_T'] - B) * dt  # 调整B细胞数量接近目标浓度
+
+        # 更新抗体量
+        A_lag = delayed('A', p['t_a'])
+        A_new = A + p['b_a'] * A_lag * (1 - A_lag / p['AT']) * dt  # 抗体生成
+        A_new -= (p['g_av'] * A * V) * dt  # 抗体因中和病毒而减少
+
+        # 更新感染细胞数量
+        CV_new = CV + p['s'] * V_new * Chiv * dt  # 新增感染细胞
+        CV_new -= p['b_ce'] * CV * TE * dt  # 杀死的感染细胞
+
+        self.state = {'V': V_new, 'A': A_new, 'CV': CV_new, 'MSV': MSV_new,
+                      'TH1': TH1_new, 'TH2': TH2_new, 'TE': TE_new, 'B': B_new}
+        self.steps += 1
+        self._store()
+
+    def run(self, steps: int, record_every: int = 1) -> Dict[str, np.ndarray]:
+        """
+        推进 steps 步，返回 {状态名: 数组 (记录数, 变体数)}，第一行是开始时的状态；另有 'step' 为对应的步数。
+        record_every 为 0 时只返回开始与结束两行。
+        """
+        every = record_every or max(steps, 1)
+        records = {name: [self.state[name]] for name in STATE}
+        taken = [self.steps]
+        for k in range(1, steps + 1):
+            self.step()
+            if k % every == 0 or k == steps:
+                for name in STATE:
+                    records[name].append(self.state[name])
+                taken.append(self.steps)
+        result = {name: np.array(values) for name, values in records.items()}
+        result['step'] = np.array(taken)
+        return result
+
+    def simulate(self, total_time: float, record_every: int = 1) -> Dict[str, np.ndarray]:
+        """按时间推进，步数为 int(total_time / dt)"""
+        return self.run(int(total_time / self.dt), record_every)
+
+
+class PaperSimulation:
+    def __init__(self, params: PaperData = None, dt: float = 1e-2, days_per_unit: float = 7.0, scale: float = 1e15):
+        """
+        Single-host wrapper exposing the MultiSimulation interface used by ImmuneAgent.
+
+        The model has one virus compartment: all strains share V, and each strain's level is
+        its share of the doses received so far. Viral quantities are multiplied by `scale` on the
+        way out and divided by it on the way in, so the ABM thresholds stay meaningful.
+
+        Parameters:
+            params (PaperData): Parameters of the host (scalars); by default the paper's values
+                without the initial virus, which arrives through add_virus instead.
+            dt (float): Time step in model units.
+            days_per_unit (float): Days per model time unit (weeks in the original parameterisation).
+            scale (float): ABM virus units per model concentration unit.
+        """
+        self.model = PaperModel(params if params is not None else dataclasses.replace(PaperData(), V0=0.0), dt)
+        if self.model.n != 1:
+            raise ValueError('PaperSimulation holds a single host; use PaperModel for batches')
+        self.dt = dt
+        self.solver = 'paper'  # PopulationEngine 只接受 euler 模拟
+        self.days_per_unit = days_per_unit
+        self.scale = scale
+        self.infected_virus: List[Virus] = []
+        self._shares: Dict[object, float] = {}
+        self._time = 0.0  # 尚未推进的天数（不足一步的部分）
+
+    def simulate(self, total_time: float):
+        self._time += total_time
+        steps = int(self._time / (self.dt * self.days_per_unit) + 1e-9)
+        self._time -= steps * self.dt * self.days_per_unit
+        self.model.run(steps, record_every=0)
+
+    @property
+    def total_virus(self) -> float:
+        return float(self.model.state['V'][0]) * self.scale
+
+    @property
+    def immune_cells(self) -> float:
+        return float(self.model.state['TE'][0])
+
+    @property
+    def infected_cells(self) -> float:
+        return float(self.model.state['CV'][0])
+
+    @property
+    def antibodies(self) -> float:
+        return float(self.model.state['A'][0])
+
+    @property
+    def death_ratio(self):
+        return self.infected_cells / float(self.model.p['CT'][0])
+
+    def latest_virus(self, id) -> float:
+        return self.total_virus * self._shares[id]
+
+    def has_virus(self, id) -> bool:
+        return id in self._shares
+
+    def add_virus(self, virus: Virus):
+        # 与 MultiSimulation 相同：已有毒株的剂量按 dt 计入，新毒株按原量计入
+        dose = virus.count * self.dt if virus.id in self._shares else virus.count
+        if virus.id not in self._shares:
+            self.infected_virus.append(virus)
+            self._shares[virus.id] = 0.0
+        self._add(virus.id, dose)
+
+    def _add(self, id, dose: float):
+        total = self.total_virus
+        new = total + abs(dose)
+        if new > 0:
+            for sid in self._shares:
+                self._shares[sid] = (self._shares[sid] * total + (abs(dose) if sid == id else 0.0)) / new
+        self.model.state['V'] = self.model.state['V'] + dose / self.scale
+
+    def add_virus_batch(self, strains, doses):
+        for index, dose in zip(np.asarray(strains, dtype=int).tolist(), np.asarray(doses, dtype=float).tolist()):
+            strain = STRAINS[index]
+            self.add_virus(strain.virus(dose))
+
+    @property
+    def strain_indices(self) -> np.ndarray:
+        return np.array([STRAINS.intern(virus).index for virus in self.infected_virus], dtype=int)
+
+    def latest_virus_values(self) -> np.ndarray:
+        return np.array([self.latest_virus(virus.id) for virus in self.infected_virus])
+
+
+# 按原来的参数积分一次并绘图
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    delta_t = 1e-2  # 时间步长
+    total_time = 1.5   # 总时间（单位：week）
+    time_steps = int(total_time / delta_t)  # 计算的时间步数
+
+    result = PaperModel(PaperData(), delta_t).run(time_steps - 1)
+    V, A, CV, MSV, TH1, TH2, TE, B = (result[name][:, 0] for name in STATE)
+
+    time = np.linspace(0, 14, time_steps)
+
+    # 绘图
+    plt.figure(figsize=(14, 12))
+
+    # 绘制病毒浓度
+    plt.subplot(4, 2, 1)
+    plt.plot(time, V, label='Virus Concentration (V)', color='red')
+    plt.title('Virus Concentration Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Concentration (mol/L)')
+    plt.grid(True)
+
+    # 绘制抗体浓度
+    plt.subplot(4, 2, 2)
+    plt.plot(time, A, label='Antibody Concentration (A)', color='blue')
+    plt.title('Antibody Concentration Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Concentration (mol/L)')
+    plt.grid(True)
+
+    # 绘制感染细胞数量
+    plt.subplot(4, 2, 3)
+    plt.plot(time, CV, label='Infected Cells (CV)', color='green')
+    plt.title('Infected Cells Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Number of Cells')
+    plt.grid(True)
+
+    # 绘制刺激的巨噬细胞数量
+    plt.subplot(4, 2, 4)
+    plt.plot(time, MSV, label='Stimulated Macrophages (MSV)', color='orange')
+    plt.title('Stimulated Macrophages Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Number of Cells')
+    plt.grid(True)
+
+    # 绘制 TH1 细胞数量
+    plt.subplot(4, 2, 5)
+    plt.plot(time, TH1, label='TH1 Cells', color='purple')
+    plt.title('TH1 Cells Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Number of Cells')
+    plt.grid(True)
+
+    # 绘制 TH2 细胞数量
+    plt.subplot(4, 2, 6)
+    plt.plot(time, TH2, label='TH2 Cells', color='brown')
+    plt.title('TH2 Cells Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Number of Cells')
+    plt.grid(True)
+
+    # 绘制细胞毒性T淋巴细胞数量
+    plt.subplot(4, 2, 7)
+    plt.plot(time, TE, label='Cytotoxic T Cells (TE)', color='cyan')
+    plt.title('Cytotoxic T Cells Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Number of Cells')
+    plt.grid(True)
+
+    # 绘制 B 细胞数量
+    plt.subplot(4, 2, 8)
+    plt.plot(time, B, label='B Cells', color='magenta')
+    plt.title('B Cells Over Time')
+    plt.xlabel('Time (days)')
+    plt.ylabel('Number of Cells')
+    plt.grid(True)
+
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,88 @@
+import dataclasses
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclasses.dataclass
+class StepRecord:
+    step: int
+    agent_count: int
+    infected: Dict[float, int]  # 阈值 -> 病毒量不低于该阈值的代理数
+    new_infections: int  # 本步病毒量升到 level 以上的代理数
+    recoveries: int  # 本步病毒量降到 level 以下的代理数
+    strain_virus: Dict[str, float]  # 毒株 id -> 所有代理该毒株的病毒量之和
+
+
+class Aggregates:
+    def __init__(self, thresholds: Iterable[float] = (10,), level: float = 10):
+        """
+        随代理状态变化增量维护的汇总量，不需要每步重新扫描所有代理
+
+        thresholds: 统计感染人数的病毒量阈值
+        level: 判断新增感染与康复所用的阈值
+        与 AttributeIndex 一样按代理在环境中的下标记录，随环境的增删（append / remove）同步维护；
+        代理加入时立即计入，之后只有调用 update 的代理才会改变汇总量，环境只对本步重新计算过的代理调用它。
+        """
+        self.thresholds: Tuple[float, ...] = tuple(sorted(set(thresholds) | {level}))
+        self.level = level
+        self.infected: Dict[float, int] = {threshold: 0 for threshold in self.thresholds}
+        self.strain_virus: Dict[str, float] = {}
+        self.total_infections = 0  # 累计新增感染
+        self.new_infections = 0
+        self.recoveries = 0
+        self._levels: List[Optional[float]] = []  # 下标 -> 最近一次的病毒量，不计入汇总的代理为 None
+        self._strains: List[Dict[str, float]] = []  # 下标 -> 各毒株病毒量
+
+    def begin_step(self):
+        """开始新的统计窗口：new_infections 与 recoveries 从 0 计起"""
+        self.new_infections = 0
+        self.recoveries = 0
+
+    def update(self, slot: int, agent):
+        """按 slot 处代理当前的 virus_level 与各毒株病毒量修正汇总量"""
+        level = float(agent.virus_level)
+        old = self._levels[slot]
+        if old is None or old != level:
+            for threshold in self.thresholds:
+                self.infected[threshold] += (level >= threshold) - (old is not None and old >= threshold)
+            if level >= self.level and (old is None or old < self.level):
+                self.new_infections += 1
+                self.total_infections += 1
+            elif level < self.level and old is not None and old >= self.level:
+                self.recoveries += 1
+            self._levels[slot] = level
+
+        sim = agent.virus_simulation
+        strains = {virus.id: float(sim.latest_virus(virus.id)) for virus in sim.infected_virus}
+        previous = self._strains[slot]
+        for sid, value in strains.items():
+            change = value - previous.get(sid, 0.0)
+            if change:
+                self.strain_virus[sid] = self.strain_virus.get(sid, 0.0) + change
+        self._strains[slot] = strains
+
+    def append(self, agent=None):
+        """环境在末尾加入了一个代理；agent 为 None 表示该代理不计入汇总（非免疫代理）"""
+        self._levels.append(None)
+        self._strains.append({})
+        if agent is not None:
+            self.update(len(self._levels) - 1, agent)
+
+    def remove(self, slot: int):
+        """环境删除了 slot 处的代理（撤销它的贡献），并把最后一个代理移到 slot"""
+        old = self._levels[slot]
+        if old is not None:
+            for threshold in self.thresholds:
+                self.infected[threshold] -= old >= threshold
+        for sid, value in self._strains[slot].items():
+            self.strain_virus[sid] -= value
+        self._levels[slot] = self._levels[-1]
+        self._strains[slot] = self._strains[-1]
+        self._levels.pop()
+        self._strains.pop()
+
+    def record(self, step: int, agent_count: int) -> StepRecord:
+        return StepRecord(step, agent_count, dict(self.infected), self.new_infections, self.recoveries,
+                          dict(self.strain_virus))
+
+
+Observer = Callable[[StepRecord], None]
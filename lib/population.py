@@ -0,0 +1,548 @@
+import numpy as np
+from typing import Dict, List
+from .iiim_model import ImmuneData, Virus, MultiSimulation, DelayBuffer, STRAINS
+
+
+# 每个感染槽位携带的毒株参数（来自 Virus.system 与 Virus.native）
+SLOT_PARAMS = ('s', 'a', 'u', 'i', 'm', 'g1', 'g2', 'g3', 'native')
+# 每行的状态列（导出、导入时整列复制）
+HOST_FIELDS = ('I', 'M', 'A', 'lag', 'buf_pos', 'buf_count', 'infected_buf', 'immune_buf')
+# 延迟缓冲区按需分配，保存在独立的缓冲区表中，由 buf_row 指向
+BUFFER_FIELDS = ('infected_buf', 'immune_buf')
+
+
+class PopulationEngine:
+    def __init__(self, dt: float = 1e-2, d: int = 500, capacity: int = 64, slots: int = 1):
+        """
+        Struct-of-arrays engine that advances the within-host model of many hosts at once.
+
+        Each row is one host. Strain columns are infection slots in the order the host
+        acquired its strains, so one batched update reproduces MultiSimulation.update
+        for every host, including the sequential per-strain coupling.
+
+        The d-step delay buffers dominate the per-host memory, so they live in a separate
+        table: a host gets its own buffer row only once a non-zero I or M has to be stored.
+        Until then buf_row is 0, a shared row of zeros, and a never-infected host costs a
+        few hundred bytes instead of 16 * d.
+
+        Parameters:
+            dt (float): Time step size shared by all hosts.
+            d (int): Immune response delay in steps.
+            capacity (int): Initial number of host rows.
+            slots (int): Initial number of strain slots per host.
+        """
+        self.dt = dt
+        self.d = d
+        self.size = 0
+        self.strain_index: Dict[str, int] = {}  # 毒株 id -> slot_of 的列号
+        self._free = []
+        self._views: List[EngineSimulation] = []
+        self._buf_size = 1  # 第 0 行是共享的全零缓冲区
+        self._buf_free = []
+        self.infected_buf = np.zeros((1, d))
+        self.immune_buf = np.zeros((1, d))
+        self._allocate(max(1, capacity), max(1, slots))
+
+    def _allocate(self, capacity: int, slots: int):
+        """按新容量重新分配所有数组，保留已有数据"""
+        old = self.__dict__.get('N')
+        rows = 0 if old is None else self.N.shape[0]
+        cols = 0 if old is None else self.V.shape[1]
+
+        def grow(name, shape, dtype=float):
+            array = np.zeros(shape, dtype=dtype)
+            if old is not None:
+                prev = getattr(self, name)
+                array[tuple(slice(0, n) for n in prev.shape)] = prev
+            setattr(self, name, array)
+
+        for name in ('N', 'g1', 'g2', 'g3', 'm', 'I', 'M', 'A'):
+            grow(name, (capacity,))
+        grow('slot_count', (capacity,), int)
+        grow('buf_pos', (capacity,), int)
+        grow('buf_count', (capacity,), int)
+        grow('lag', (capacity,), int)
+        grow('buf_row', (capacity,), int)
+        grow('V', (capacity, slots))
+        grow('Ab', (capacity, slots))
+        grow('params', (len(SLOT_PARAMS), capacity, slots))
+        strains = max(1, len(self.strain_index))
+        if old is None or self.slot_of.shape != (capacity, strains):
+            slot_of = np.full((capacity, strains), -1, dtype=int)
+            if old is not None:
+                slot_of[:rows, :self.slot_of.shape[1]] = self.slot_of
+            self.slot_of = slot_of
+        self._views += [None] * (capacity - rows)
+        self._capacity, self._slots = capacity, slots
+        return rows, cols
+
+    def _new_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self.size == self._capacity:
+            self._allocate(self._capacity * 2, self._slots)
+        self.size += 1
+        return self.size - 1
+
+    def _own_buffers(self, rows):
+        """为仍指向共享零缓冲区的行分配各自的延迟缓冲区（内容为 0）"""
+        rows = np.asarray(rows, dtype=int)
+        rows = rows[self.buf_row[rows] == 0]
+        if not len(rows): return
+        reused = self._buf_free[max(0, len(self._buf_free) - len(rows)):]
+        del self._buf_free[len(self._buf_free) - len(reused):]
+        fresh = len(rows) - len(reused)
+        if self._buf_size + fresh > len(self.infected_buf):
+            capacity = max(2 * len(self.infected_buf), self._buf_size + fresh)
+            for name in BUFFER_FIELDS:
+                table = np.zeros((capacity, self.d))
+                table[:self._buf_size] = getattr(self, name)[:self._buf_size]
+                setattr(self, name, table)
+        index = np.concatenate([np.array(reused, dtype=int), np.arange(self._buf_size, self._buf_size + fresh)])
+        self._buf_size += fresh
+        self.infected_buf[index] = 0
+        self.immune_buf[index] = 0
+        self.buf_row[rows] = index
+
+    def _drop_buffers(self, row: int):
+        if self.buf_row[row]:
+            self._buf_free.append(int(self.buf_row[row]))
+            self.buf_row[row] = 0
+
+    def _init_row(self, row: int, native: ImmuneData, infected_cells, immune_cells, antibodies):
+        self.N[row], self.g1[row], self.g2[row], self.g3[row], self.m[row] = native.N, native.g1, native.g2, native.g3, native.m
+        self.I[row], self.M[row], self.A[row] = infected_cells, immune_cells, antibodies
+        self.slot_count[row] = 0
+        self.slot_of[row] = -1
+        self.V[row] = 0
+        self.Ab[row] = 0
+        self.lag[row] = 0
+        self._drop_buffers(row)
+
+    def adopt(self, sim: MultiSimulation) -> 'EngineSimulation':
+        """把一个 MultiSimulation 的当前状态迁入引擎，返回代替它的视图"""
+        if sim.solver != 'euler':
+            raise ValueError('PopulationEngine only integrates fixed-step (euler) simulations')
+        if sim.strain_update != 'sequential' or sim.cross_reactivity:
+            raise ValueError('PopulationEngine reproduces the sequential strain update without cross-reactivity')
+        if abs(sim.dt - self.dt) > 1e-12 or sim.d != self.d:
+            raise ValueError(f'Simulation (dt={sim.dt}, d={sim.d}) does not match engine (dt={self.dt}, d={self.d})')
+        row = self._new_row()
+        native = sim.native
+        self._init_row(row, native, sim.infected_cells, sim.immune_cells, sim.antibodies)
+
+        # 延迟项只需要最近 d 个值
+        infected, immune = sim.infected_delay.values(), sim.immune_delay.values()
+        if any(infected) or any(immune):
+            self._own_buffers([row])
+            buffer = self.buf_row[row]
+            self.infected_buf[buffer, :len(infected)] = infected
+            self.immune_buf[buffer, :len(immune)] = immune
+        self.buf_pos[row] = len(infected) % self.d
+        self.buf_count[row] = sim.infected_delay.count
+
+        view = EngineSimulation(self, row, native)
+        self._views[row] = view
+        for virus in sim.infected_virus:
+            slot = self._add_slot(row, virus, sim.latest_virus(virus.id))
+            self.Ab[row, slot] = sim.antibody_values.latest(virus.id)
+            view._slots[virus.id] = slot
+            view.infected_virus.append(virus)
+        return view
+
+    def spawn(self, native: ImmuneData, dt: float = None) -> 'EngineSimulation':
+        """
+        新建一个未感染的宿主行，状态与 adopt(MultiSimulation(native, dt, d)) 相同，
+        但不构造 MultiSimulation，也不分配延迟缓冲区
+        """
+        if dt is not None and abs(dt - self.dt) > 1e-12:
+            raise ValueError(f'Simulation (dt={dt}, d={self.d}) does not match engine (dt={self.dt}, d={self.d})')
+        row = self._new_row()
+        self._init_row(row, native, 0, 0, 0)
+        self.buf_pos[row] = 1 % self.d  # 新的 MultiSimulation 的延迟缓冲区中已有初始时刻的 0
+        self.buf_count[row] = 1
+        view = self._views[row] = EngineSimulation(self, row, native)
+        return view
+
+    def release(self, row: int, record_every: int = 1) -> MultiSimulation:
+        """把某一行还原为独立的 MultiSimulation（历史从当前时刻开始记录），并释放该行"""
+        self.sync([row])
+        view = self._views[row]
+        sim = MultiSimulation(native_immune=view.native, dt=self.dt, d=self.d, record_every=record_every)
+        sim.infected_cells, sim.immune_cells, sim.antibodies = float(self.I[row]), float(self.M[row]), float(self.A[row])
+        count = int(self.buf_count[row])
+        order = (np.arange(self.d) + self.buf_pos[row]) % self.d if count >= self.d else np.arange(count)
+        buffer = self.buf_row[row]
+        sim.infected_delay = DelayBuffer(self.d, self.infected_buf[buffer, order].tolist(), count)
+        sim.immune_delay = DelayBuffer(self.d, self.immune_buf[buffer, order].tolist(), count)
+        sim.steps = count - 1
+        sim.infected_values, sim.immune_values = [sim.infected_cells], [sim.immune_cells]
+        sim.antibody_native_values = [sim.antibodies]
+        sim.healthy_values = [view.native.N - sim.infected_cells]
+        sim.time_series = [sim.steps * self.dt]
+        for virus in view.infected_virus:
+            slot = view._slots[virus.id]
+            sim.add_virus(Virus(virus.id, float(self.V[row, slot]), system=virus.system, native=virus.native))
+            sim.antibody_values.set_latest(virus.id, float(self.Ab[row, slot]))
+
+        view.engine, view.row = None, None
+        self._views[row] = None
+        self.slot_count[row] = 0
+        self.slot_of[row] = -1
+        self._drop_buffers(row)
+        self._free.append(row)
+        return sim
+
+    def _strain(self, id) -> int:
+        """返回毒株在 slot_of 中的列号，必要时扩充列"""
+        if id not in self.strain_index:
+            self.strain_index[id] = len(self.strain_index)
+            if len(self.strain_index) > self.slot_of.shape[1]:
+                self._allocate(self._capacity, self._slots)
+        return self.strain_index[id]
+
+    def _add_slot(self, row: int, virus: Virus, count: float) -> int:
+        slot, strain = int(self.slot_count[row]), self._strain(virus.id)
+        if slot == self._slots:
+            self._allocate(self._capacity, self._slots * 2)
+        self.slot_of[row, strain] = slot
+        system = virus.system
+        values = (system.s, system.a, system.u, system.i, system.m, system.g1, system.g2, system.g3, virus.native)
+        self.params[:, row, slot] = values
+        self.V[row, slot] = count
+        self.Ab[row, slot] = 0
+        self.slot_count[row] = slot + 1
+        return slot
+
+    def export_rows(self, rows) -> Dict[str, np.ndarray]:
+        """按行导出状态列；各行的槽位 V、Ab 按 (行, 感染顺序) 展平"""
+        rows = np.asarray(rows, dtype=int)
+        state = {name: getattr(self, name)[self.buf_row[rows] if name in BUFFER_FIELDS else rows] for name in HOST_FIELDS}
+        count = self.slot_count[rows]
+        mask = np.arange(self._slots) < count[:, None]
+        state['slot_count'] = count
+        state['V'], state['Ab'] = self.V[rows][mask], self.Ab[rows][mask]
+        return state
+
+    def import_rows(self, state: Dict[str, np.ndarray], natives: List[ImmuneData], viruses: List[List[Virus]]) -> np.ndarray:
+        """
+        export_rows 的逆操作：一次分配全部新行并整列写入，返回新行号
+
+        natives: 每行的宿主免疫参数；viruses: 每行按感染顺序排列的毒株
+        """
+        n = len(natives)
+        if state['infected_buf'].shape[1:] != (self.d,):
+            raise ValueError(f'Delay buffers of length {state["infected_buf"].shape[1:]} do not match engine (d={self.d})')
+        flat = [virus for strains in viruses for virus in strains]
+        strains = np.array([self._strain(virus.id) for virus in flat], dtype=int)
+        count = np.asarray(state['slot_count'], dtype=int)
+        capacity = max(self._capacity, self.size + n)
+        slots = max(self._slots, int(count.max(initial=0)))
+        if capacity > self._capacity or slots > self._slots:
+            self._allocate(capacity, slots)
+        rows = np.arange(self.size, self.size + n)
+        self.size += n
+
+        for name in HOST_FIELDS:
+            if name not in BUFFER_FIELDS:
+                getattr(self, name)[rows] = state[name]
+        self.buf_row[rows] = 0
+        stored = np.asarray(state['infected_buf']).any(axis=1) | np.asarray(state['immune_buf']).any(axis=1)
+        self._own_buffers(rows[stored])
+        for name in BUFFER_FIELDS:
+            getattr(self, name)[self.buf_row[rows[stored]]] = state[name][stored]
+        self.N[rows], self.g1[rows], self.g2[rows], self.g3[rows], self.m[rows] = np.array(
+            [(native.N, native.g1, native.g2, native.g3, native.m) for native in natives], dtype=float).reshape(n, 5).T
+        mask = np.arange(self._slots) < count[:, None]
+        self.slot_count[rows] = count
+        for name in ('V', 'Ab'):
+            values = np.zeros((n, self._slots))
+            values[mask] = state[name]
+            getattr(self, name)[rows] = values
+        params = np.zeros((len(SLOT_PARAMS), n, self._slots))
+        params[:, mask] = np.array([[getattr(virus.system, name) for name in SLOT_PARAMS[:-1]] + [virus.native]
+                                    for virus in flat], dtype=float).reshape(-1, len(SLOT_PARAMS)).T
+        self.params[:, rows] = params
+        self.slot_of[rows] = -1
+        host, slot = np.nonzero(mask)
+        self.slot_of[rows[host], strains] = slot
+
+        for row, native, strains in zip(rows.tolist(), natives, viruses):
+            view = EngineSimulation(self, row, native)
+            view.infected_virus = list(strains)
+            view._slots = {virus.id: slot for slot, virus in enumerate(strains)}
+            self._views[row] = view
+        return rows
+
+    def add_virus(self, rows, virus: Virus, doses):
+        """向多行同时加入同一毒株；语义与 MultiSimulation.add_virus 逐个调用相同（rows 不可重复）"""
+        rows, doses = np.asarray(rows, dtype=int), np.asarray(doses, dtype=float)
+        strain = self._strain(virus.id)
+        slots = self.slot_of[rows, strain]
+        have = slots >= 0
+        self.sync(rows[(doses != 0) | ~have])  # 0 剂量加到已有槽位不改变状态，无需补算
+        self.V[rows[have], slots[have]] += doses[have] * self.dt
+        for row, dose in zip(rows[~have], doses[~have]):
+            self._views[row]._new_strain(virus, dose)
+
+    def latest_virus(self, row: int) -> np.ndarray:
+        """按感染顺序返回某一行各毒株的当前病毒量"""
+        return self.V[row, :self.slot_count[row]]
+
+    def rows(self) -> np.ndarray:
+        """返回所有在用的行号"""
+        return np.flatnonzero([view is not None for view in self._views[:self.size]])
+
+    def total_virus(self, rows=None) -> np.ndarray:
+        """逐槽累加病毒量（与 MultiSimulation.total_virus 的求和顺序一致）"""
+        sel = slice(0, self.size) if rows is None else np.asarray(rows)
+        V = self.V[sel]
+        total = np.zeros(V.shape[0])
+        for j in range(int(self.slot_count[sel].max(initial=0))):
+            total = total + V[:, j]
+        return total
+
+    def simulate(self, total_time: float, rows=None, sparse: bool = False):
+        """
+        对指定行（默认全部）批量推进 total_time，每个子步只做一次向量化更新
+
+        sparse 为 True 时跳过空闲行（见 idle），只记下推迟的步数，之后由 sync 以闭式解补上
+        """
+        num_steps = int(total_time / self.dt)
+        sel = slice(0, self.size) if rows is None else np.asarray(rows, dtype=int)
+        if sparse and num_steps > 0:
+            sel = np.arange(self.size) if rows is None else sel
+            idle = self.idle(sel)
+            self.lag[sel[idle]] += num_steps
+            sel = sel[~idle]
+            self.sync(sel)
+        if num_steps <= 0 or len(self.N[sel]) == 0:
+            return
+
+        dt, d = self.dt, self.d
+        N, g1n, g2n, g3n, mn = self.N[sel], self.g1[sel], self.g2[sel], self.g3[sel], self.m[sel]
+        I, M, A = self.I[sel], self.M[sel], self.A[sel]
+        V, Ab = self.V[sel], self.Ab[sel]
+        s, a, u, i, m, g1, g2, g3, native = self.params[:, sel]
+        count, pos = self.buf_count[sel], self.buf_pos[sel]
+        # 没有病毒且 I、M 为 0 的行在这些步里只会写入 0，继续共用零缓冲区；其余行需要自己的缓冲区
+        buffer = self.buf_row[sel]
+        pending = (buffer == 0) & ((I != 0) | (M != 0) | (V != 0).any(axis=1))
+        if pending.any():
+            self._own_buffers(np.arange(self.size)[sel][pending])
+            buffer = self.buf_row[sel]
+        owned = buffer > 0
+        owned = None if owned.all() else owned
+        infected_buf, immune_buf = self.infected_buf, self.immune_buf
+        slot_count = self.slot_count[sel]
+        masks = [slot_count > j for j in range(int(slot_count.max()))]
+
+        for _ in range(num_steps):
+            H = np.minimum(N, N - I)
+            full = count > d
+            delayed_infected = np.where(full, infected_buf[buffer, pos], 0)
+            delayed_immune = np.where(full, immune_buf[buffer, pos], 0)
+            for j, mask in enumerate(masks):
+                v, ab = V[:, j], Ab[:, j]
+                dV_dt = s[:, j] * (1 - I / N) * v - u[:, j] * v * H \
+                    - g1n * A * v * (1 + I / N) * native[:, j] \
+                    - g1[:, j] * ab * v * (1 + I / N)
+                dM_dt = i[:, j] * delayed_infected * v - m[:, j] * M
+                dI_dt = a[:, j] * np.maximum(0, v) - mn * delayed_immune
+                dA_dt_native = g3n * M - g2n * A
+                dA_dt_sys = g3[:, j] * M - g2[:, j] * ab
+
+                V[:, j] = np.where(mask, np.maximum(0, v + (dV_dt * dt - 1e-4)), v)
+                Ab[:, j] = np.where(mask, ab + dA_dt_sys * dt, ab)
+                A = np.where(mask, A + dA_dt_native * dt, A)
+                I = np.where(mask, I + dI_dt * dt, I)
+                M = np.where(mask, M + dM_dt * dt, M)
+
+            I = np.minimum(N, np.maximum(0, I))
+            if owned is None:
+                infected_buf[buffer, pos] = I
+                immune_buf[buffer, pos] = M
+            else:
+                infected_buf[buffer[owned], pos[owned]] = I[owned]
+                immune_buf[buffer[owned], pos[owned]] = M[owned]
+            pos = (pos + 1) % d
+            count = count + 1
+
+        self.I[sel], self.M[sel], self.A[sel] = I, M, A
+        self.V[sel], self.Ab[sel] = V, Ab
+        self.buf_pos[sel], self.buf_count[sel] = pos, count
+
+
+    def idle(self, rows) -> np.ndarray:
+        """
+        没有病毒且感染细胞为 0 的行处于空闲状态：病毒与 I 保持为 0，
+        M 按几何级数衰减，A 与 Ab 只受 M 驱动，都是线性的，可以用闭式解推进
+        """
+        rows = np.asarray(rows, dtype=int)
+        return (self.I[rows] == 0) & ~(self.V[rows] != 0).any(axis=1)
+
+    def _idle_factors(self, rows: np.ndarray):
+        """
+        Per-step linear map of idle rows, accumulated over each host's slots in order:
+        M' = r M,  A' = alpha A + beta M,  Ab_j' = alpha_ab_j Ab_j + beta_ab_j M.
+        """
+        dt, n = self.dt, len(rows)
+        count = self.slot_count[rows]
+        params = dict(zip(SLOT_PARAMS, self.params[:, rows]))
+        m, g2, g3 = params['m'], params['g2'], params['g3']
+        decay, gain = 1 - self.g2[rows] * dt, self.g3[rows] * dt
+        r, alpha, beta = np.ones(n), np.ones(n), np.zeros(n)
+        alpha_ab, beta_ab = np.ones((n, self._slots)), np.zeros((n, self._slots))
+        for j in range(int(count.max(initial=0))):
+            mask = count > j
+            # 每个槽位先用更新前的 M 计算 A 与 Ab，再衰减 M
+            beta = np.where(mask, beta * decay + gain * r, beta)
+            alpha = np.where(mask, alpha * decay, alpha)
+            alpha_ab[:, j] = np.where(mask, 1 - g2[:, j] * dt, 1.0)
+            beta_ab[:, j] = np.where(mask, g3[:, j] * dt * r, 0.0)
+            r = np.where(mask, r * (1 - m[:, j] * dt), r)
+        return r, alpha, beta, alpha_ab, beta_ab
+
+    def sync(self, rows=None):
+        """把空闲行推迟的步数一次补上，并按同样的规则填充延迟缓冲区"""
+        sel = np.arange(self.size) if rows is None else np.asarray(rows, dtype=int)
+        sel = sel[self.lag[sel] > 0]
+        if not len(sel): return
+        lag = self.lag[sel]
+        r, alpha, beta, alpha_ab, beta_ab = self._idle_factors(sel)
+        M = self.M[sel]
+        self.A[sel] = alpha ** lag * self.A[sel] + beta * M * _geometric(alpha, r, lag)
+        self.Ab[sel] = alpha_ab ** lag[:, None] * self.Ab[sel] + beta_ab * M[:, None] * _geometric(alpha_ab, r[:, None], lag[:, None])
+        self.M[sel] = M * r ** lag
+
+        # 缓冲区只保留最近 d 步：第 t 步（1..lag）写在 buf_pos + t - 1 处，I 为 0，M 为 M0 r^t；
+        # M 为 0 且仍共用零缓冲区的行只会写入 0，跳过
+        self._own_buffers(sel[M != 0])
+        d = self.d
+        owned = self.buf_row[sel] > 0
+        keep = np.minimum(lag[owned], d)
+        # 只展开到最长的补算步数，而不是每行 d 列
+        offset = np.arange(keep.max(initial=0))
+        valid = offset < keep[:, None]
+        step = lag[owned][:, None] - keep[:, None] + 1 + offset
+        where = (self.buf_pos[sel[owned]][:, None] + step - 1) % d
+        row = np.broadcast_to(self.buf_row[sel[owned]][:, None], where.shape)
+        self.infected_buf[row[valid], where[valid]] = 0.0
+        self.immune_buf[row[valid], where[valid]] = (M[owned][:, None] * r[owned][:, None] ** step)[valid]
+        self.buf_pos[sel] = (self.buf_pos[sel] + lag) % d
+        self.buf_count[sel] += lag
+        self.lag[sel] = 0
+
+    def immune_cells(self, rows) -> np.ndarray:
+        """各行当前的免疫细胞数；空闲行按闭式解推算，不修改状态"""
+        rows = np.asarray(rows, dtype=int)
+        M = self.M[rows].copy()
+        lagging = self.lag[rows] > 0
+        if lagging.any():
+            M[lagging] *= self._idle_factors(rows[lagging])[0] ** self.lag[rows[lagging]]
+        return M
+
+
+def _geometric(alpha: np.ndarray, r: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """sum_{t<k} alpha^(k-1-t) r^t，alpha 与 r 接近时也不损失精度"""
+    q = np.log1p((r - alpha) / alpha)
+    ratio = np.divide(np.expm1(k * q), np.expm1(q), out=k.astype(float) * np.ones_like(q), where=q != 0)
+    return alpha ** (k - 1) * ratio
+
+
+class EngineSimulation:
+    __slots__ = ('engine', 'row', 'native', 'dt', 'd', 'infected_virus', '_slots', '_strain_indices')
+
+    def __init__(self, engine: PopulationEngine, row: int, native: ImmuneData):
+        """
+        Thin view exposing the MultiSimulation interface over one row of a PopulationEngine.
+
+        Only the current state lives in the engine; per-step histories are not recorded.
+        """
+        self.engine = engine
+        self.row = row
+        self.native = native
+        self.dt = engine.dt
+        self.d = engine.d
+        self.infected_virus: List[Virus] = []
+        self._slots: Dict[str, int] = {}
+        self._strain_indices = None
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['_strain_indices'] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def infected_cells(self) -> float:
+        return self.engine.I[self.row]
+
+    @property
+    def immune_cells(self) -> float:
+        self.engine.sync([self.row])
+        return self.engine.M[self.row]
+
+    @property
+    def antibodies(self) -> float:
+        self.engine.sync([self.row])
+        return self.engine.A[self.row]
+
+    @property
+    def total_virus(self) -> float:
+        number = 0
+        for slot in range(len(self.infected_virus)):
+            number += self.engine.V[self.row, slot]
+        return number
+
+    @property
+    def death_ratio(self):
+        return self.infected_cells / self.native.N
+
+    def latest_virus(self, id) -> float:
+        return self.engine.V[self.row, self._slots[id]]
+
+    def has_virus(self, id) -> bool:
+        return id in self._slots
+
+    def add_virus(self, virus: Virus):
+        self.engine.sync([self.row])
+        if virus.id in self._slots:
+            self.engine.V[self.row, self._slots[virus.id]] += virus.count * self.dt
+        else:
+            self._new_strain(virus, virus.count)
+
+    def add_virus_batch(self, strains, doses):
+        """按 STRAINS 编号批量加入病毒，语义与 MultiSimulation.add_virus_batch 相同"""
+        if isinstance(strains, np.ndarray): strains = strains.tolist()
+        if isinstance(doses, np.ndarray): doses = doses.tolist()
+        self.engine.sync([self.row])
+        V = self.engine.V
+        for index, dose in zip(strains, doses):
+            strain = STRAINS[index]
+            slot = self._slots.get(strain.id)
+            if slot is None:
+                self._new_strain(strain.virus(dose), dose)
+            else:
+                V[self.row, slot] += dose * self.dt
+
+    def _new_strain(self, virus: Virus, count: float):
+        self._slots[virus.id] = self.engine._add_slot(self.row, virus, count)
+        self.infected_virus.append(virus)
+        self._strain_indices = None
+
+    @property
+    def strain_indices(self) -> np.ndarray:
+        if self._strain_indices is None:
+            self._strain_indices = np.array([STRAINS.intern(virus).index for virus in self.infected_virus], dtype=int)
+        return self._strain_indices
+
+    def latest_virus_values(self) -> np.ndarray:
+        return self.engine.V[self.row, :len(self.infected_virus)].copy()
+
+    def simulate(self, total_time: float):
+        """单独推进这一行（批量场景请直接调用 PopulationEngine.simulate）"""
+        self.engine.simulate(total_time, rows=[self.row])
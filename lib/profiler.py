@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+
+_active = None  # 当前启用的 Profiler；为 None 时各处钩子只做一次判断
+
+
+def active() -> 'Profiler':
+    return _active
+
+
+def scope_of(env) -> str:
+    """环境在统计与 trace 中的名字"""
+    return f'{type(env).__name__}:{env.id}'
+
+
+class Profiler:
+    def __init__(self, events: bool = True, agent_events: bool = False):
+        """
+        分阶段的耗时统计：每个 (环境, 阶段) 的调用次数与总耗时，并可导出 Chrome / Perfetto trace
+
+        events: 记录环境级阶段（step、move、simulate、spread ……）的 trace 事件
+        agent_events: 同时记录逐代理调用（move、update_immunity、spread_virus）的事件，数量很大，默认只计入统计
+        用法：with Profiler() as profiler: env.step() ...，结束后 profiler.summary() / profiler.export_trace(path)
+        """
+        self.events_enabled = events
+        self.agent_events = agent_events
+        self.stats: Dict[Tuple[str, str], List[float]] = {}  # (scope, phase) -> [调用次数, 总秒数]
+        self.events: List[dict] = []
+        self._tracks: Dict[str, int] = {}
+        self._origin = time.perf_counter()
+        self._previous = None
+
+    def __enter__(self):
+        global _active
+        self._previous, _active = _active, self
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self._previous
+
+    @staticmethod
+    def begin() -> float:
+        return time.perf_counter()
+
+    def end(self, phase: str, start: float, scope: str = '', event: bool = True, **args) -> float:
+        """结束一个从 start 开始的阶段，计入统计并（可选）记录 trace 事件，返回耗时"""
+        now = time.perf_counter()
+        duration = now - start
+        stat = self.stats.get((scope, phase))
+        if stat is None:
+            stat = self.stats[(scope, phase)] = [0, 0.0]
+        stat[0] += 1
+        stat[1] += duration
+        if event and self.events_enabled:
+            self.events.append({'name': phase, 'cat': scope.split(':')[0] or 'model', 'ph': 'X',
+                                'ts': (start - self._origin) * 1e6, 'dur': duration * 1e6,
+                                'pid': os.getpid(), 'tid': self._track(scope), 'args': args})
+        return duration
+
+    def lap(self, phase: str, start: float, scope: str = '', **args) -> float:
+        """结束一个阶段并返回下一个阶段的开始时间，用于连续的多个阶段"""
+        self.end(phase, start, scope, **args)
+        return time.perf_counter()
+
+    def call(self, phase: str, scope: str, func, *args):
+        """计时一次逐代理调用；默认只计入统计"""
+        start = time.perf_counter()
+        result = func(*args)
+        self.end(phase, start, scope, event=self.agent_events)
+        return result
+
+    def _track(self, scope: str) -> int:
+        if scope not in self._tracks:
+            self._tracks[scope] = len(self._tracks) + 1
+        return self._tracks[scope]
+
+    def trace(self) -> dict:
+        """Chrome trace 格式（可直接在 chrome://tracing 或 ui.perfetto.dev 打开），每个环境一条轨道"""
+        names = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': scope or 'model'}}
+                 for scope, tid in self._tracks.items()]
+        return {'traceEvents': names + self.events, 'displayTimeUnit': 'ms'}
+
+    def export_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+
+    def summary(self) -> str:
+        """按总耗时排序的表格：环境、阶段、调用次数、总耗时、平均耗时以及占所在环境 step 的比例"""
+        steps = {scope: stat[1] for (scope, phase), stat in self.stats.items() if phase == 'step'}
+        lines = [f'{"scope":<28} {"phase":<24} {"calls":>9} {"total s":>10} {"mean ms":>10} {"% step":>7}']
+        for (scope, phase), (count, total) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            share = f'{100 * total / steps[scope]:.1f}' if steps.get(scope) else '-'
+            lines.append(f'{scope or "-":<28} {phase:<24} {count:>9} {total:>10.4f} {1e3 * total / count:>10.4f} {share:>7}')
+        return '\n'.join(lines)
@@ -0,0 +1,196 @@
+import json
+import os
+import numpy as np
+from typing import Dict, Iterator, List
+
+
+AGENT_FIELDS = ('virus', 'infected_cells', 'immune_cells', 'antibodies', 'x', 'y')
+ENV_FIELDS = ('step', 'agent_count', 'infected_count')
+
+
+class TrajectoryRecorder:
+    def __init__(self, path: str, chunk_size: int = 1024, every: int = 1, level: float = 10):
+        """
+        把环境与每个代理的轨迹分块写入内存映射的 .npy 文件
+
+        path: 输出目录；每个字段每块一个文件，meta.json 记录块信息与代理 id
+        chunk_size: 每块的行数（记录次数）
+        every: 抽稀间隔，每 every 次 record 才真正写一行
+        level: 统计感染人数的病毒阈值
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.every = max(1, every)
+        self.level = level
+        self.ids: List[str] = []
+        self.chunks: List[dict] = []
+        self._column: Dict[int, int] = {}  # id(agent) -> 列号
+        self._agents: List = []  # 列号 -> 代理；持有引用，离开后被回收的代理的 id() 不会被新代理复用
+        self._agent_maps: Dict[str, np.memmap] = {}
+        self._env_maps: Dict[str, np.memmap] = {}
+        self._calls = 0
+        self._row = 0
+        os.makedirs(path, exist_ok=True)
+
+    def record(self, env):
+        """记录环境当前状态（由 ImmuneEnvironment.step 在每步结束时调用）"""
+        call = self._calls
+        self._calls += 1
+        if call % self.every: return
+
+        agents = env.get_agents()
+        for agent in agents:
+            column = self._column.get(id(agent))
+            if column is None or self._agents[column] is not agent:
+                self._column[id(agent)] = len(self.ids)
+                self._agents.append(agent)
+                self.ids.append(str(agent.id))
+        if not self.chunks or self._row == self.chunk_size:
+            self._open_chunk(call)
+        elif self.chunks[-1]['width'] < len(self.ids):
+            self._widen(len(self.ids))
+
+        columns = np.array([self._column[id(agent)] for agent in agents], dtype=int)
+        values = agent_values(agents)
+        row = self._row
+        for name, array in self._agent_maps.items():
+            array[row] = np.nan
+            array[row, columns] = values[name]
+        self._env_maps['step'][row] = call
+        self._env_maps['agent_count'][row] = len(agents)
+        self._env_maps['infected_count'][row] = int(np.count_nonzero(values['virus'] >= self.level))
+        self._row += 1
+        self.chunks[-1]['rows'] = self._row
+
+    def _open_chunk(self, call: int):
+        self._flush()
+        # 沿用上一块的列数（包括扩宽时留出的余量），代理陆续加入时不必每块都扩宽
+        index, width = len(self.chunks), max(len(self.ids), self.chunks[-1]['width'] if self.chunks else 0)
+        self.chunks.append({'index': index, 'start': call, 'rows': 0, 'width': width})
+        self._agent_maps = {name: np.lib.format.open_memmap(self._file('agent', name, index), mode='w+', dtype=np.float64, shape=(self.chunk_size, width))
+                            for name in AGENT_FIELDS}
+        self._env_maps = {name: np.lib.format.open_memmap(self._file('env', name, index), mode='w+', dtype=np.float64, shape=(self.chunk_size,))
+                          for name in ENV_FIELDS}
+        self._row = 0
+        self._write_meta()
+
+    def _widen(self, width: int):
+        """
+        新代理出现时就地扩宽当前块，而不是新开一块：按 1/8（至少 64 列）留出余量，
+        已写入的行原样复制，新列为 NaN；扩宽次数随代理数按几何级数减少
+        """
+        chunk = self.chunks[-1]
+        old, rows = chunk['width'], self._row
+        width = max(width, old + max(64, old // 8))
+        for name in AGENT_FIELDS:
+            path = self._file('agent', name, chunk['index'])
+            previous = self._agent_maps.pop(name)
+            grown = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=np.float64, shape=(self.chunk_size, width))
+            grown[:rows] = np.nan
+            grown[:rows, :old] = previous[:rows]
+            grown.flush()
+            del grown, previous  # 先关闭映射再替换文件
+            os.replace(path + '.tmp', path)
+            self._agent_maps[name] = np.load(path, mmap_mode='r+')
+        chunk['width'] = width
+        self._write_meta()
+
+    def _file(self, kind: str, name: str, index: int) -> str:
+        return os.path.join(self.path, f'{kind}_{name}_{index:05d}.npy')
+
+    def _flush(self):
+        for array in list(self._agent_maps.values()) + list(self._env_maps.values()):
+            array.flush()
+
+    def _write_meta(self):
+        meta = {'chunk_size': self.chunk_size, 'every': self.every, 'ids': self.ids, 'chunks': self.chunks,
+                'agent_fields': list(AGENT_FIELDS), 'env_fields': list(ENV_FIELDS)}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def close(self):
+        """写回所有数据与块信息"""
+        self._flush()
+        self._write_meta()
+        self._agent_maps, self._env_maps = {}, {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def agent_values(agents) -> Dict[str, np.ndarray]:
+    """收集代理的当前状态；绑定批量引擎的代理直接从引擎数组读取"""
+    n = len(agents)
+    values = {name: np.full(n, np.nan) for name in AGENT_FIELDS}
+    if not n: return values
+    positions = np.array([agent.position for agent in agents], dtype=float).reshape(n, 2)
+    values['x'], values['y'] = positions[:, 0], positions[:, 1]
+    sims = [getattr(agent, 'virus_simulation', None) for agent in agents]
+    engine = getattr(sims[0], 'engine', None)
+    if engine is not None and all(getattr(sim, 'engine', None) is engine for sim in sims):
+        rows = np.array([sim.row for sim in sims], dtype=int)
+        engine.sync(rows)
+        values['virus'] = engine.total_virus(rows)
+        values['infected_cells'], values['immune_cells'], values['antibodies'] = engine.I[rows], engine.M[rows], engine.A[rows]
+        return values
+    for k, sim in enumerate(sims):
+        if sim is None: continue
+        values['virus'][k] = sim.total_virus
+        values['infected_cells'][k] = sim.infected_cells
+        values['immune_cells'][k] = sim.immune_cells
+        values['antibodies'][k] = sim.antibodies
+    return values
+
+
+class TrajectoryReader:
+    def __init__(self, path: str):
+        """以只读内存映射方式打开 TrajectoryRecorder 的输出，按需加载"""
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.ids: List[str] = self.meta['ids']
+        self._column: Dict[str, int] = {}  # 代理 id -> 列号（重复的 id 取第一列）
+        for column, agent_id in enumerate(self.ids):
+            self._column.setdefault(agent_id, column)
+        self.chunks: List[dict] = [chunk for chunk in self.meta['chunks'] if chunk['rows']]
+
+    def __len__(self):
+        return sum(chunk['rows'] for chunk in self.chunks)
+
+    def _open(self, kind: str, name: str, index: int) -> np.ndarray:
+        chunk = self.chunks[index]
+        array = np.load(os.path.join(self.path, f"{kind}_{name}_{chunk['index']:05d}.npy"), mmap_mode='r')
+        return array[:chunk['rows'], :len(self.ids)] if array.ndim == 2 else array[:chunk['rows']]  # 不含预留的空列
+
+    def iter_chunks(self, name: str) -> Iterator[np.ndarray]:
+        """逐块返回某个字段的内存映射视图，不把整个运行读入内存"""
+        kind = 'agent' if name in self.meta['agent_fields'] else 'env'
+        for index in range(len(self.chunks)):
+            yield self._open(kind, name, index)
+
+    def env(self, name: str) -> np.ndarray:
+        """读取一个环境字段的完整序列"""
+        return np.concatenate(list(self.iter_chunks(name))) if self.chunks else np.zeros(0)
+
+    def agent(self, name: str, agents=None, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        读取代理字段的 [start, stop) 行，返回 (行数, 代理数) 数组
+
+        agents: 只读取这些列（代理 id 字符串或列号），默认全部；之后才出现的代理为 NaN
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        columns = np.arange(len(self.ids)) if agents is None else np.array(
+            [self._column[a] if isinstance(a, str) else a for a in agents], dtype=int)
+        out = np.full((max(0, stop - start), len(columns)), np.nan)
+        offset = 0
+        for index, chunk in enumerate(self.chunks):
+            lo, hi = max(start, offset), min(stop, offset + chunk['rows'])
+            if lo < hi:
+                data = self._open('agent', name, index)
+                present = columns < chunk['width']
+                out[lo - start:hi - start, present] = data[lo - offset:hi - offset][:, columns[present]]
+            offset += chunk['rows']
+        return out
@@ -0,0 +1,196 @@
+"""
+无界面的绘图：先把长序列降采样（largest-triangle-three-buckets），再在多个进程中把图渲染到文件
+
+本模块不在导入时加载 matplotlib；只有真正绘图的进程才会导入，并且只使用 Agg 后端的 Figure，不触碰 pyplot 的全局状态。
+"""
+import dataclasses
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+
+@dataclasses.dataclass
+class Series:
+    y: np.ndarray
+    x: np.ndarray = None  # 默认为 0, 1, 2 ...
+    label: str = None
+    color: str = None
+    linestyle: str = '-'
+    linewidth: float = None
+
+
+@dataclasses.dataclass
+class Panel:
+    series: List[Series]
+    title: str = ''
+    xlabel: str = ''
+    ylabel: str = ''
+    hlines: List[Tuple[float, dict]] = dataclasses.field(default_factory=list)  # (y, 样式) 的水平参考线
+    legend: bool = True
+    grid: bool = True
+
+
+@dataclasses.dataclass
+class FigureSpec:
+    path: str
+    panels: List[Panel]
+    shape: Tuple[int, int] = (1, 1)  # 子图的行数与列数
+    figsize: Tuple[float, float] = (10, 6)
+    dpi: int = 100
+    pad: float = 1.08
+
+
+COLLECTION_THRESHOLD = 50  # 一个子图中超过这么多条序列时合并为一个 LineCollection，且不画图例
+
+
+def lttb_indices(x: np.ndarray, Y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    largest-triangle-three-buckets：为每条序列选出 threshold 个保留形状的点，返回下标 (序列数, threshold)
+
+    所有序列共用同一个 x，按桶循环、在序列方向上向量化，一万条序列也只循环 threshold 次
+    """
+    x = np.asarray(x, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    count, n = Y.shape
+    if threshold >= n or threshold < 3:
+        return np.tile(np.arange(n), (count, 1))
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)  # threshold - 2 个桶，覆盖首尾之外的点
+    rows = np.arange(count)
+    selected = np.empty((count, threshold), dtype=int)
+    selected[:, 0], selected[:, -1] = 0, n - 1
+    a = np.zeros(count, dtype=int)
+    for b in range(threshold - 2):
+        low, high = edges[b], edges[b + 1]
+        # 下一个桶的平均点；最后一个桶之后是末尾的点
+        next_low, next_high = (edges[b + 1], edges[b + 2]) if b + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_low:next_high].mean()
+        avg_y = Y[:, next_low:next_high].mean(axis=1)
+        ax, ay = x[a], Y[rows, a]
+        area = np.abs((ax[:, None] - avg_x) * (Y[:, low:high] - ay[:, None])
+                      - (ax[:, None] - x[low:high]) * (avg_y - ay)[:, None])
+        a = low + area.argmax(axis=1)
+        selected[:, b + 1] = a
+    return selected
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """单条序列的降采样，返回 (x, y)"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    index = lttb_indices(x, y, threshold)[0]
+    return x[index], y[index]
+
+
+def downsample(spec: FigureSpec, max_points: int = 2000, budget: int = 500_000) -> FigureSpec:
+    """
+    返回降采样后的副本：每条序列最多 max_points 个点，同一子图的点数合计不超过 budget（每条至少 50 个点）。
+    长度相同、x 相同的序列一起处理
+    """
+    panels = []
+    for panel in spec.panels:
+        limit = max(50, min(max_points, budget // max(1, len(panel.series))))
+        groups: Dict[tuple, List[int]] = {}
+        xs = []
+        for k, series in enumerate(panel.series):
+            y = np.asarray(series.y, dtype=float)
+            x = np.arange(len(y), dtype=float) if series.x is None else np.asarray(series.x, dtype=float)
+            xs.append(x)
+            key = (len(y), None if series.x is None else id(series.x))
+            groups.setdefault(key, []).append(k)
+        reduced = list(panel.series)
+        for members in groups.values():
+            x = xs[members[0]]
+            Y = np.array([np.asarray(panel.series[k].y, dtype=float) for k in members])
+            index = lttb_indices(x, Y, limit)
+            for row, k in enumerate(members):
+                reduced[k] = dataclasses.replace(panel.series[k], x=x[index[row]], y=Y[row, index[row]])
+        panels.append(dataclasses.replace(panel, series=reduced))
+    return dataclasses.replace(spec, panels=panels)
+
+
+def draw(spec: FigureSpec) -> str:
+    """在当前进程中把一张图渲染到 spec.path（按扩展名决定格式），返回路径"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=spec.figsize, dpi=spec.dpi)
+    FigureCanvasAgg(figure)
+    rows, cols = spec.shape
+    for k, panel in enumerate(spec.panels):
+        axes = figure.add_subplot(rows, cols, k + 1)
+        many = len(panel.series) > COLLECTION_THRESHOLD
+        if many:
+            lines = [np.column_stack((np.arange(len(s.y)) if s.x is None else s.x, s.y)) for s in panel.series]
+            collection = LineCollection(lines, linewidths=0.5, alpha=0.5, antialiaseds=False)
+            axes.add_collection(collection)
+            axes.autoscale()
+        else:
+            for s in panel.series:
+                x = np.arange(len(s.y)) if s.x is None else s.x
+                axes.plot(x, s.y, label=s.label, color=s.color, linestyle=s.linestyle, linewidth=s.linewidth)
+        for y, style in panel.hlines:
+            axes.axhline(y=y, **style)
+        axes.set_title(panel.title)
+        axes.set_xlabel(panel.xlabel)
+        axes.set_ylabel(panel.ylabel)
+        if panel.grid:
+            axes.grid()
+        if panel.legend and not many and (any(s.label for s in panel.series) or panel.hlines):
+            axes.legend()
+    figure.tight_layout(pad=spec.pad)
+    directory = os.path.dirname(spec.path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(spec.path)
+    return spec.path
+
+
+def render(specs: Sequence[FigureSpec], workers: int = None, max_points: int = 2000) -> List[str]:
+    """
+    降采样后渲染多张图，返回文件路径
+
+    workers: 进程数，默认取 CPU 数与图数的较小值；为 1 时在当前进程中顺序渲染
+    降采样在当前进程完成，只把缩小后的数据发给工作进程
+    """
+    specs = [downsample(spec, max_points) for spec in specs]
+    workers = min(workers or os.cpu_count() or 1, len(specs))
+    if workers <= 1:
+        return [draw(spec) for spec in specs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(draw, specs))
+
+
+def agent_virus_figure(agents: list, path: str) -> FigureSpec:
+    """每个代理的病毒量历史"""
+    series = [Series(agent.virus_simulation.req_all_virus_history(), label=f'Agent {agent.id}')
+              for agent in agents if hasattr(agent.virus_simulation, 'req_all_virus_history')]
+    return FigureSpec(path, [Panel(series, 'Virus Levels Over Time for Each Agent', 'Time Steps', 'Virus Level')])
+
+
+def infected_figure(env, path: str) -> FigureSpec:
+    """环境的感染人数变化"""
+    series = [Series(np.asarray(env.infected_count_history), label='Infected Count', color='red', linestyle='--', linewidth=2)]
+    return FigureSpec(path, [Panel(series, 'Infected Count Over Time', 'Time Steps', 'Number of Infected Agents')], figsize=(12, 6))
+
+
+def host_figure(sim, path: str) -> FigureSpec:
+    """单个宿主 MultiSimulation 的病毒、感染细胞、健康细胞、免疫细胞与抗体"""
+    t = np.asarray(sim.time_series, dtype=float)
+    panels = [
+        Panel([Series(sim.req_all_virus_history(), t, 'Virus Quantity (V)', 'blue')], 'Virus Quantity Over Time', 'Time', 'Virus Quantity (V)'),
+        Panel([Series(np.asarray(sim.infected_values), t, 'Infected Cells (I)', 'green')], 'Infected Cells Over Time', 'Time', 'Infected Cells (I)',
+              [(0, {'color': 'blue', 'linestyle': '--', 'label': 'Initial Infected Cells'})]),
+        Panel([Series(np.asarray(sim.healthy_values), t, 'Healthy Cells (H)', 'orange')], 'Healthy Cells Over Time', 'Time', 'Healthy Cells (H)',
+              [(0, {'color': 'blue', 'linestyle': '--', 'label': 'Healthy Cells Min'})]),
+        Panel([Series(np.asarray(sim.immune_values), t, 'Immune Cells (M)', 'purple')], 'Immune Cells Over Time', 'Time', 'Immune Cells (M)'),
+        Panel([Series(np.asarray(sim.antibody_native_values), t, 'Antibodies (A)', 'cyan')], 'Antibodies Over Time', 'Time', 'Antibodies (A)'),
+    ]
+    return FigureSpec(path, panels, shape=(3, 2), figsize=(12, 12), pad=3.0)
+
+
+def report_environment(env, directory: str, workers: int = None, max_points: int = 2000) -> List[str]:
+    """把环境的感染人数与各代理的病毒量渲染到 directory 下的 PNG 文件"""
+    agents = [agent for agent in env.get_agents() if hasattr(agent, 'virus_simulation')]
+    return render([agent_virus_figure(agents, os.path.join(directory, 'agent_virus.png')),
+                   infected_figure(env, os.path.join(directory, 'infected_count.png'))], workers, max_points)
@@ -2,21 +2,21 @@ from .abm_model import *
 
 
 class Class(ImmuneEnvironment):
-    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None):
-        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size)
+    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None, **kwargs):
+        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size, **kwargs)
 
 class Build(ImmuneEnvironment):
-    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None):
-        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size)
+    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None, **kwargs):
+        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size, **kwargs)
 
 class SportsGround(ImmuneEnvironment):
-    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None):
-        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size)
+    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None, **kwargs):
+        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size, **kwargs)
 
 class Canteen(ImmuneEnvironment):
-    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None):
-        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size)
+    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None, **kwargs):
+        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size, **kwargs)
 
 class School(ImmuneEnvironment):
-    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None):
-        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size)
\ No newline at end of file
+    def __init__(self, id = ..., generate_agents = None, agents = None, sub_env = None, parent_env = None, map_size = None, **kwargs):
+        super().__init__(id, generate_agents, agents, sub_env, parent_env, map_size, **kwargs)
\ No newline at end of file
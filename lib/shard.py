@@ -0,0 +1,228 @@
+import copy
+import multiprocessing
+import os
+import pickle
+import traceback
+from typing import Callable, Dict, List, Tuple
+from .abm import Agent, Environment
+
+
+def _unbind(agents: List[Agent]):
+    """离开分片的代理先从批量引擎中取回独立的病毒模拟，目标分片会在下一步重新绑定"""
+    for agent in agents:
+        unbind = getattr(agent, 'unbind', None)
+        if unbind is not None:
+            unbind()
+
+
+class _Shard:
+    def __init__(self, envs: Dict[int, Environment], rule: Callable = None):
+        """
+        一组环境及其待处理的转移
+
+        rule(key, env) -> [(agent, 目标环境编号), ...]，每步结束后在分片内调用，用于产生转移
+        """
+        self.envs = envs
+        self.rule = rule
+        self._local: Dict[int, Dict[int, List[Agent]]] = {}  # 目标环境 -> {来源环境: 代理}
+
+    def step(self, incoming: Dict[int, Dict[int, List[Agent]]], requests: List[Tuple[int, int, list]]):
+        """
+        放入上一步发往本分片的代理，推进每个环境一步，再收集离开的代理
+
+        返回 (各环境的 (代理数, 感染人数), 发往其他分片的代理 {目标: {来源: 代理}})
+        """
+        self._receive(incoming)
+        for env in self.envs.values():
+            step = getattr(env, 'step', None)
+            if step is not None:
+                step()
+
+        # 统计在转移之前进行，各环境之和即为整个层级的代理数
+        summaries = {key: (len(env._agents), env.infected_count_history[-1] if getattr(env, 'infected_count_history', None) else 0)
+                     for key, env in self.envs.items()}
+
+        leaving: Dict[int, Dict[int, List[Agent]]] = {}
+        for src, dst, ids in requests:
+            wanted = set(ids)
+            leaving.setdefault(src, {}).setdefault(dst, []).extend(
+                agent for agent in self.envs[src]._agents if agent.id in wanted)
+        if self.rule is not None:
+            for key, env in self.envs.items():
+                for agent, dst in self.rule(key, env):
+                    leaving.setdefault(key, {}).setdefault(dst, []).append(agent)
+
+        outgoing: Dict[int, Dict[int, List[Agent]]] = {}
+        for src, targets in leaving.items():
+            for dst, agents in targets.items():
+                if dst == src: continue
+                agents = self.envs[src].remove_agents(agents)
+                if not agents: continue
+                _unbind(agents)
+                box = self._local if dst in self.envs else outgoing
+                box.setdefault(dst, {}).setdefault(src, []).extend(agents)
+
+        return summaries, outgoing
+
+    def _receive(self, incoming: Dict[int, Dict[int, List[Agent]]]):
+        for dst, sources in self._local.items():
+            incoming.setdefault(dst, {}).update(sources)
+        self._local = {}
+        for dst in sorted(incoming):
+            # 按来源环境编号排序，使到达顺序与分片方式无关
+            sources = incoming[dst]
+            self.envs[dst].add_agents([agent for src in sorted(sources) for agent in sources[src]])
+
+    def gather(self, incoming: Dict[int, Dict[int, List[Agent]]]) -> Dict[int, Environment]:
+        self._receive(incoming)
+        return self.envs
+
+
+def _serve(conn, payload: bytes):
+    """工作进程：持有若干环境，按父进程的指令推进并交换代理"""
+    shard = pickle.loads(payload)
+    while True:
+        command, args = conn.recv()
+        if command == 'close': break
+        try:
+            conn.send(('ok', getattr(shard, command)(*args)))
+        except Exception:
+            conn.send(('error', traceback.format_exc()))
+    conn.close()
+
+
+class ShardedRunner:
+    def __init__(self, root: Environment, workers: int = None, rule: Callable = None):
+        """
+        把环境层级（例如 School 及其 Build、Class、Canteen ……）拆成分片，在多个进程中并行推进
+
+        每个环境都是一个独立的单元，按代理数分配到 workers 个进程（默认全部 CPU）；
+        workers 为 0 时在当前进程中按相同的规则顺序执行，便于调试。
+        跨环境的转移在步与步之间以批量消息交换：第 k 步结束时离开的代理，在第 k + 1 步开始时加入目标环境。
+        环境以先序编号（root 为 0），见 keys。
+        rule(key, env) -> [(agent, 目标编号), ...] 在每步结束后于分片内调用，必须是可 pickle 的模块级函数。
+        每个环境都应传入独立的 rng，结果才可复现且与进程数无关。
+        进程模式下，工作进程持有环境的副本，调用 gather 取回后原对象才会更新。
+        """
+        self.root = root
+        self.envs = root.environments()
+        self.keys = {id(env): key for key, env in enumerate(self.envs)}
+        self.parents: Dict[int, int] = {}
+        for key, env in enumerate(self.envs):
+            for sub in env._sub_env:
+                self.parents.setdefault(self.keys[id(sub)], key)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.agent_count_history: List[int] = []  # 整个层级的代理数量
+        self.infected_count_history: List[int] = []  # 整个层级的感染人数
+        self.summaries: Dict[int, Tuple[int, int]] = {}  # 每个环境最近一步的 (代理数, 感染人数)
+        self._requests: Dict[int, List[Tuple[int, int, list]]] = {}
+        self._incoming: Dict[int, Dict[int, List[Agent]]] = {}
+        self._closed = False
+
+        if self.workers == 0:
+            self._owner = {key: 0 for key in range(len(self.envs))}
+            self._shards = [_Shard(dict(enumerate(self.envs)), rule)]
+            self._processes = []
+            return
+
+        if any(getattr(env, 'recorder', None) is not None for env in self.envs):
+            raise ValueError('TrajectoryRecorder cannot be used inside worker processes')
+        groups = self._partition(min(self.workers, len(self.envs)))
+        self._owner = {key: index for index, group in enumerate(groups) for key in group}
+        self._shards, self._processes = [], []
+        for group in groups:
+            # 同一进程的环境一起序列化，共享的引擎等对象在进程内仍然共享
+            shard = _Shard({key: self._detach(self.envs[key]) for key in group}, rule)
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(child, pickle.dumps(shard)), daemon=True)
+            process.start()
+            child.close()
+            self._shards.append(parent)
+            self._processes.append(process)
+
+    def _partition(self, workers: int) -> List[List[int]]:
+        """按代理数从多到少依次分给当前负载最小的进程"""
+        groups, loads = [[] for _ in range(workers)], [0] * workers
+        for key in sorted(range(len(self.envs)), key=lambda key: -len(self.envs[key]._agents)):
+            index = loads.index(min(loads))
+            groups[index].append(key)
+            loads[index] += len(self.envs[key]._agents)
+        return [sorted(group) for group in groups]
+
+    @staticmethod
+    def _detach(env: Environment) -> Environment:
+        """浅复制并断开父、子环境链接，只序列化环境本身"""
+        shard = copy.copy(env)
+        shard._sub_env, shard._parent_env = [], []
+        return shard
+
+    def key(self, env: Environment) -> int:
+        return self.keys[id(env)]
+
+    def transfer(self, source, target, ids: list):
+        """请求在本步结束时把 source 中 id 属于 ids 的代理转移到 target（环境对象或编号）"""
+        source = source if isinstance(source, int) else self.key(source)
+        target = target if isinstance(target, int) else self.key(target)
+        self._requests.setdefault(self._owner[source], []).append((source, target, list(ids)))
+
+    def _call(self, command: str, args_of: Callable) -> list:
+        if self._closed:
+            raise RuntimeError('ShardedRunner is closed')
+        if not self._processes:
+            return [getattr(self._shards[0], command)(*args_of(0))]
+        for index, conn in enumerate(self._shards):
+            conn.send((command, args_of(index)))
+        replies = []
+        for conn in self._shards:
+            status, value = conn.recv()
+            if status == 'error':
+                raise RuntimeError(f'Shard worker failed:\n{value}')
+            replies.append(value)
+        return replies
+
+    def _incoming_for(self, index: int) -> Dict[int, Dict[int, List[Agent]]]:
+        return {dst: sources for dst, sources in self._incoming.items() if self._owner[dst] == index}
+
+    def step(self):
+        """所有分片并行推进一步，然后收集跨分片转移的代理"""
+        requests, self._requests = self._requests, {}
+        replies = self._call('step', lambda index: (self._incoming_for(index), requests.get(index, [])))
+        self._incoming = {}
+        for summaries, outgoing in replies:
+            self.summaries.update(summaries)
+            for dst, sources in outgoing.items():
+                self._incoming.setdefault(dst, {}).update(sources)
+        self.agent_count_history.append(sum(count for count, _ in self.summaries.values()))
+        self.infected_count_history.append(sum(infected for _, infected in self.summaries.values()))
+
+    def run(self, steps: int):
+        for _ in range(steps):
+            self.step()
+
+    def gather(self) -> Environment:
+        """放入仍在途中的代理，取回所有环境并重建层级，返回根环境；之后不能再推进"""
+        replies = self._call('gather', lambda index: (self._incoming_for(index),))
+        self._incoming = {}
+        envs = {key: env for reply in replies for key, env in reply.items()}
+        if self._processes:
+            for key, env in envs.items():
+                env._sub_env = [envs[self.key(sub)] for sub in self.envs[key]._sub_env]
+                env._parent_env = [envs[self.key(parent)] if id(parent) in self.keys else parent
+                                   for parent in self.envs[key]._parent_env]
+        self.close()
+        self.root = envs[0]
+        return self.root
+
+    def close(self):
+        if self._closed: return
+        self._closed = True
+        for conn, process in zip(self._shards, self._processes):
+            conn.send(('close', ()))
+            conn.close()
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
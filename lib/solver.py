@@ -0,0 +1,137 @@
+import bisect
+import numpy as np
+from typing import Callable, Sequence
+
+
+# Dormand–Prince 5(4) coefficients
+_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+_B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+_E = _B - np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+
+def hermite(t: float, t0: float, y0, f0, t1: float, y1, f1):
+    """Cubic Hermite interpolation between two points with known derivatives."""
+    h = t1 - t0
+    if h <= 0:
+        return y1
+    s = (np.asarray(t) - t0) / h
+    if s.ndim:
+        s = s[:, None]
+    h00 = (1 + 2 * s) * (1 - s) ** 2
+    h10 = s * (1 - s) ** 2
+    h01 = s * s * (3 - 2 * s)
+    h11 = s * s * (s - 1)
+    return h00 * y0 + h10 * h * f0 + h01 * y1 + h11 * h * f1
+
+
+class DenseHistory:
+    def __init__(self, delay: float, t0: float = 0.0, y0: Sequence[float] = (0.0,)):
+        """
+        Dense history of the delayed components of a system.
+
+        Stores accepted step endpoints with their derivatives and interpolates between them,
+        so a delayed term x(t - delay) can be evaluated at any time. Values before the first
+        point are zero, matching the Euler model where history[-d] is 0 until d steps exist.
+        Points older than the delay window are dropped, so memory stays bounded.
+        """
+        self.delay = delay
+        self.t = [t0]
+        self.y = [np.asarray(y0, dtype=float)]
+        self.f = [np.zeros(len(y0))]
+        self._zero = np.zeros(len(y0))
+
+    def append(self, t: float, y, f):
+        self.t.append(t)
+        self.y.append(np.asarray(y, dtype=float))
+        self.f.append(np.asarray(f, dtype=float))
+        cutoff = t - self.delay
+        # 保留 cutoff 之前的最后一个点用于插值，超过一半过期时再整体压缩
+        keep = bisect.bisect_right(self.t, cutoff) - 1
+        if keep > 64 and keep > len(self.t) // 2:
+            del self.t[:keep], self.y[:keep], self.f[:keep]
+
+    def __call__(self, t: float) -> np.ndarray:
+        if t < self.t[0]:
+            return self._zero
+        k = bisect.bisect_right(self.t, t)
+        if k >= len(self.t):
+            return self.y[-1]
+        return hermite(t, self.t[k - 1], self.y[k - 1], self.f[k - 1], self.t[k], self.y[k], self.f[k])
+
+
+def integrate(rhs: Callable, t0: float, y0, t_eval: Sequence[float], history: DenseHistory, lagged: Sequence[int],
+              rtol: float = 1e-6, atol: float = 1e-9, h0: float = None, max_step: float = np.inf,
+              project: Callable = None):
+    """
+    Adaptive Dormand–Prince 5(4) integration of y' = rhs(t, y, lag) with constant delays.
+
+    Parameters:
+        rhs: Right-hand side; `lag` is history(t - delay) for the `lagged` components.
+        t0, y0: Initial time and state.
+        t_eval: Increasing output times in (t0, t_end]; the last one is the end of integration.
+        history: Dense history of the lagged components, extended with every accepted step.
+        lagged: Indices of y that are recorded in the history.
+        rtol, atol: Relative and absolute error tolerances.
+        h0: Initial step (defaults to a conservative guess).
+        max_step: Upper bound on the step size; steps never exceed the delay.
+        project: Optional function mapping states (last axis) back onto their admissible set (e.g. y >= 0).
+
+    Returns:
+        (ys, h, nfev): states at t_eval, the last accepted step size and the number of rhs calls.
+    """
+    t_eval = np.asarray(t_eval, dtype=float)
+    ys = np.empty((len(t_eval), len(y0)))
+    if not len(t_eval):
+        return ys, h0, 0
+    lagged = np.asarray(lagged, dtype=int)
+    delay = history.delay
+    max_step = min(max_step, delay) if delay > 0 else max_step
+    t_end = t_eval[-1]
+
+    t, y = t0, np.asarray(y0, dtype=float)
+    f = rhs(t, y, history(t - delay))
+    nfev = 1
+    h = h0 if h0 else min(max_step, 1e-2, t_end - t0)
+    k_out = 0
+    K = np.empty((7, len(y)))
+    while k_out < len(t_eval):
+        h = min(h, max_step, t_end - t)
+        K[0] = f
+        for i in range(1, 7):
+            ti = t + _C[i] * h
+            yi = y + h * np.dot(_A[i], K[:i])
+            K[i] = rhs(ti, yi, history(ti - delay))
+        nfev += 6
+        y_new = y + h * np.dot(_B, K)
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        err = np.sqrt(np.mean((h * np.dot(_E, K) / scale) ** 2)) if len(y) else 0.0
+
+        if err <= 1 or h <= 1e-12:
+            t_new = t + h
+            projected = project(y_new) if project is not None else y_new
+            if np.array_equal(projected, y_new):
+                f_new = K[6].copy()  # FSAL: the last stage is already f(t_new, y_new)
+            else:
+                y_new = projected
+                f_new = rhs(t_new, y_new, history(t_new - delay))
+                nfev += 1
+            stop = int(np.searchsorted(t_eval, t_new + 1e-12, side='right'))
+            if stop > k_out:
+                ys[k_out:stop] = hermite(t_eval[k_out:stop], t, y, f, t_new, y_new, f_new)
+                if project is not None:
+                    ys[k_out:stop] = project(ys[k_out:stop])
+                k_out = stop
+            history.append(t_new, y_new[lagged], f_new[lagged])
+            t, y, f = t_new, y_new, f_new
+        factor = 0.9 * err ** -0.2 if err > 0 else 5.0
+        h = h * min(5.0, max(0.2, factor))
+    return ys, h, nfev
@@ -0,0 +1,100 @@
+import math
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+
+class GridIndex:
+    def __init__(self, radius: float, cell_size: float = None):
+        """
+        均匀网格（cell list）索引，用于查找某位置感染半径内的候选代理
+
+        radius: 查询半径；cell_size 默认取 ceil(radius)，这样只需扫描 3x3 个格子
+        """
+        self.radius = radius
+        self.cell_size = cell_size if cell_size is not None else max(1, math.ceil(radius))
+        self.reach = math.ceil(radius / self.cell_size)
+        self._cells: Dict[Tuple[int, int], Dict[int, object]] = {}
+        self._where: Dict[int, Tuple[int, int]] = {}  # id(agent) -> 所在格子
+
+    def cell_of(self, position) -> Tuple[int, int]:
+        return (math.floor(position[0] / self.cell_size), math.floor(position[1] / self.cell_size))
+
+    def rebuild(self, agents: Iterable):
+        """按当前位置重建索引"""
+        self._cells.clear()
+        self._where.clear()
+        for agent in agents:
+            self.insert(agent)
+
+    def insert(self, agent):
+        cell = self.cell_of(agent.position)
+        self._cells.setdefault(cell, {})[id(agent)] = agent
+        self._where[id(agent)] = cell
+
+    def remove(self, agent):
+        cell = self._where.pop(id(agent), None)
+        if cell is None: return
+        bucket = self._cells[cell]
+        del bucket[id(agent)]
+        if not bucket:
+            del self._cells[cell]
+
+    def update(self, agent):
+        """代理移动后调用，只有跨格子时才需要改动索引"""
+        cell = self.cell_of(agent.position)
+        if self._where.get(id(agent)) == cell: return
+        self.remove(agent)
+        self.insert(agent)
+
+    def neighbours(self, position) -> List:
+        """返回与 position 距离可能不超过 radius 的所有代理（按格子粗筛，可能包含稍远的代理）"""
+        cx, cy = self.cell_of(position)
+        reach = self.reach
+        found = []
+        for x in range(cx - reach, cx + reach + 1):
+            for y in range(cy - reach, cy + reach + 1):
+                bucket = self._cells.get((x, y))
+                if bucket:
+                    found.extend(bucket.values())
+        return found
+
+    def __len__(self):
+        return len(self._where)
+
+
+class ArrayGridIndex:
+    def __init__(self, positions: np.ndarray, radius: float, cell_size: float = None):
+        """
+        GridIndex 的数组版本：一次按格子对 positions（n x 2）的行排序，查询返回行号，不为每个代理建立字典
+
+        格子划分与 GridIndex 相同，neighbours 返回的集合也相同
+        """
+        self.radius = radius
+        self.cell_size = cell_size if cell_size is not None else max(1, math.ceil(radius))
+        self.reach = math.ceil(radius / self.cell_size)
+        self._cells = np.floor(np.asarray(positions, dtype=float).reshape(-1, 2) / self.cell_size).astype(np.int64)
+        self._low = self._cells.min(axis=0) if len(self._cells) else np.zeros(2, dtype=np.int64)
+        # 每列格子的键留出 reach 的余量，查询范围不会越到相邻的列
+        self._span = int(self._cells[:, 1].max() - self._low[1]) + 1 + 2 * self.reach if len(self._cells) else 1
+        keys = self._key(self._cells[:, 0], self._cells[:, 1])
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+
+    def _key(self, cx, cy):
+        return (cx - self._low[0]) * self._span + (cy - self._low[1] + self.reach)
+
+    def neighbours(self, row: int, radius: float = None) -> np.ndarray:
+        """
+        与第 row 行距离可能不超过 radius（默认为建立索引时的半径）的行号
+        （升序，包含 row 自身，可能包含稍远的行）
+        """
+        reach = self.reach if radius is None else math.ceil(radius / self.cell_size)
+        cx, cy = self._cells[row]
+        columns = np.arange(cx - reach, cx + reach + 1)
+        # reach 超出建立时的余量时查询范围会跨到相邻的列，只会多出稍远的行
+        lo = np.searchsorted(self._keys, self._key(columns, cy - reach), 'left')
+        hi = np.searchsorted(self._keys, self._key(columns, cy + reach), 'right')
+        return np.sort(np.concatenate([self._order[a:b] for a, b in zip(lo.tolist(), hi.tolist())]))
+
+    def __len__(self):
+        return len(self._cells)
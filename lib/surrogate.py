@@ -0,0 +1,326 @@
+import bisect
+import math
+import numpy as np
+from typing import Dict, List, Sequence
+from .iiim_model import ImmuneData, MultiSimulation, Virus, STRAINS
+
+
+# 查表得到的量：病毒量、免疫细胞、宿主抗体、感染细胞
+QUANTITIES = ('virus', 'immune', 'antibodies', 'infected')
+
+
+class ResponseTable:
+    def __init__(self, native: ImmuneData, virus: Virus, doses: Sequence[float], priors: Sequence[float] = (0.0,),
+                 dt: float = 1e-2, d: int = 500, horizon: float = 30.0, step_time: float = 0.1):
+        """
+        Precomputed MultiSimulation trajectories of a fresh host infected once with one strain.
+
+        Parameters:
+            native (ImmuneData): Host immune parameters shared by the agents using the table.
+            virus (Virus): Strain (its system and native weight; the count is ignored).
+            doses: Grid of inoculum doses; interpolation is linear in log(dose), 0 is always included.
+            priors: Grid of prior host antibody levels (immunity left by an earlier infection).
+            dt (float), d (int): Step and delay of the exact model.
+            horizon (float): Days covered; later times keep the last tabulated value.
+            step_time (float): Spacing of the tabulated times in days.
+        """
+        self.native = native
+        self.virus = virus
+        self.doses = np.unique(np.concatenate(([0.0], np.asarray(doses, dtype=float))))
+        self.priors = np.unique(np.asarray(priors, dtype=float))
+        self.dt, self.d = dt, d
+        self.step_time = step_time
+        self.steps = int(round(horizon / step_time)) + 1
+        positive = self.doses[self.doses > 0]
+        self._floor = positive.min() * 1e-3 if len(positive) else 1.0  # log 坐标的下限，使 0 剂量也能插值
+        self._coords = np.log(self.doses + self._floor)
+        self.tables: Dict[str, np.ndarray] = {name: np.zeros((len(self.priors), len(self.doses), self.steps))
+                                              for name in QUANTITIES}
+        for p, prior in enumerate(self.priors):
+            for k, dose in enumerate(self.doses):
+                for name, values in self.exact(dose, prior, self.steps).items():
+                    self.tables[name][p, k] = values
+        # 逐个宿主查询时使用列表，避免 numpy 标量索引的开销
+        self._lists = {name: table.tolist() for name, table in self.tables.items()}
+        self._coord_list = self._coords.tolist()
+        self._prior_list = self.priors.tolist()
+
+    def exact(self, dose: float, prior: float, steps: int) -> Dict[str, np.ndarray]:
+        """精确路径：以 dose 感染的新宿主（宿主抗体初值 prior），每 step_time 天记录一次，第 0 个点是感染时刻"""
+        sim = MultiSimulation(self.native, self.dt, d=self.d, record_every=0)
+        sim.antibodies = prior
+        sim.add_virus(Virus(self.virus.id, dose, system=self.virus.system, native=self.virus.native))
+        values = {name: np.empty(steps) for name in QUANTITIES}
+        for k in range(steps):
+            if k:
+                sim.simulate(self.step_time)
+            values['virus'][k] = sim.total_virus
+            values['immune'][k] = sim.immune_cells
+            values['antibodies'][k] = sim.antibodies
+            values['infected'][k] = sim.infected_cells
+        return values
+
+    @staticmethod
+    def _locate(grid: list, x: float):
+        """返回 (下标, 权重)，x 落在 grid[i] 与 grid[i + 1] 之间；超出范围时取端点"""
+        if len(grid) == 1 or x <= grid[0]:
+            return 0, 0.0
+        if x >= grid[-1]:
+            return len(grid) - 2, 1.0
+        i = bisect.bisect_right(grid, x) - 1
+        return i, (x - grid[i]) / (grid[i + 1] - grid[i])
+
+    def value(self, name: str, dose: float, elapsed: float, prior: float = 0.0) -> float:
+        """单个宿主的插值（剂量、感染后经过的天数、先前免疫三个方向线性插值）"""
+        table = self._lists[name]
+        p, wp = self._locate(self._prior_list, prior)
+        k, wk = self._locate(self._coord_list, math.log(dose + self._floor))
+        position = min(max(elapsed / self.step_time, 0.0), self.steps - 1)
+        t = min(int(position), self.steps - 2) if self.steps > 1 else 0
+        wt = position - t if self.steps > 1 else 0.0
+        number = 0.0
+        for pi, pw in ((p, 1 - wp), (p + 1, wp)):
+            if not pw: continue
+            for ki, kw in ((k, 1 - wk), (k + 1, wk)):
+                if not kw: continue
+                row = table[pi][ki]
+                number += pw * kw * ((1 - wt) * row[t] + (wt * row[t + 1] if wt else 0.0))
+        return number
+
+    def rescale(self, target: float, dose: float, value: float, elapsed: float, prior: float = 0.0) -> float:
+        """
+        再次暴露：value 是 dose 在 elapsed 时的病毒量，返回同一时刻病毒量为 target 的剂量。
+        从当前剂量沿网格向上查找，病毒量不再随剂量增加时（已过峰值）停在最后一个单调的点
+        """
+        low = dose
+        if target <= value:
+            return dose
+        start = bisect.bisect_right(self._coord_list, math.log(dose + self._floor))
+        for k in range(start, len(self.doses)):
+            high = float(self.doses[k])
+            number = self.value('virus', high, elapsed, prior)
+            if number < value:
+                break
+            if number >= target:
+                # 在 log 剂量上按病毒量线性插值
+                w = (target - value) / (number - value) if number > value else 1.0
+                a, b = math.log(low + self._floor), math.log(high + self._floor)
+                return math.exp(a + w * (b - a)) - self._floor
+            low, value = high, number
+        return low
+
+    def lookup(self, name: str, dose, elapsed, prior=0.0) -> np.ndarray:
+        """value 的向量化版本，用于大批量的筛选"""
+        dose, elapsed, prior = np.broadcast_arrays(np.asarray(dose, dtype=float), np.asarray(elapsed, dtype=float),
+                                                   np.asarray(prior, dtype=float))
+        table = self.tables[name]
+
+        def locate(grid, x):
+            if len(grid) == 1:
+                return np.zeros(x.shape, dtype=int), np.zeros(x.shape)
+            x = np.clip(x, grid[0], grid[-1])
+            i = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+            return i, (x - grid[i]) / (grid[i + 1] - grid[i])
+
+        p, wp = locate(self.priors, prior)
+        k, wk = locate(self._coords, np.log(dose + self._floor))
+        t, wt = locate(np.arange(self.steps, dtype=float), elapsed / self.step_time)
+        number = np.zeros(dose.shape)
+        for dp in (0, 1):
+            for dk in (0, 1):
+                for dn in (0, 1):
+                    weight = (wp if dp else 1 - wp) * (wk if dk else 1 - wk) * (wt if dn else 1 - wt)
+                    # 只有一个网格点的方向权重恒为 0，下标不会越界
+                    index = (np.minimum(p + dp, table.shape[0] - 1), np.minimum(k + dk, table.shape[1] - 1),
+                             np.minimum(t + dn, table.shape[2] - 1))
+                    number += weight * table[index]
+        return number
+
+
+class SurrogateModel:
+    def __init__(self, native: ImmuneData, doses: Sequence[float] = None, priors: Sequence[float] = (0.0,),
+                 dt: float = 1e-2, d: int = 500, horizon: float = 30.0, step_time: float = 0.1):
+        """
+        一组宿主共享的查表模型：每个毒株第一次出现时建立一张 ResponseTable
+
+        doses 默认 1e-4 到 1e3 之间按对数均匀取 43 个点；其余参数见 ResponseTable
+        """
+        self.native = native
+        self.doses = np.logspace(-4, 3, 43) if doses is None else np.asarray(doses, dtype=float)
+        self.priors = priors
+        self.dt, self.d = dt, d
+        self.horizon = horizon
+        self.step_time = step_time
+        self._tables: Dict[int, ResponseTable] = {}  # STRAINS 编号 -> 表
+
+    def table(self, virus: Virus) -> ResponseTable:
+        index = STRAINS.intern(virus).index
+        table = self._tables.get(index)
+        if table is None:
+            table = self._tables[index] = ResponseTable(self.native, virus, self.doses, self.priors, self.dt, self.d,
+                                                        self.horizon, self.step_time)
+        return table
+
+    def host(self, prior: float = 0.0) -> 'SurrogateSimulation':
+        return SurrogateSimulation(self, prior)
+
+    def attach(self, agents: list, prior: float = 0.0):
+        """
+        把代理的宿主内模型换成查表模型；已有的毒株以当前病毒量作为新的初始剂量，
+        宿主当前的抗体水平作为先前免疫（不小于 prior）
+        """
+        for agent in agents:
+            sim = getattr(agent, 'virus_simulation', None)
+            if sim is None: continue
+            host = self.host(max(prior, float(sim.antibodies)))
+            for virus in sim.infected_virus:
+                host.add_virus(Virus(virus.id, float(sim.latest_virus(virus.id)), system=virus.system, native=virus.native))
+            agent.virus_simulation = host
+
+    def check_accuracy(self, virus: Virus, samples: int = 20, days: float = None, seed: int = 0) -> Dict[str, float]:
+        """
+        与精确路径比较：随机取表格范围内（不在网格点上）的剂量与先前免疫，逐个时刻比较查表值与 MultiSimulation，
+        返回各量的最大绝对误差与相对于该量最大值的误差
+        """
+        table = self.table(virus)
+        rng = np.random.default_rng(seed)
+        positive = table.doses[table.doses > 0]
+        doses = np.exp(rng.uniform(np.log(positive.min()), np.log(positive.max()), samples))
+        priors = rng.uniform(table.priors.min(), table.priors.max(), samples)
+        steps = table.steps if days is None else min(table.steps, int(round(days / table.step_time)) + 1)
+        elapsed = np.arange(steps) * table.step_time
+        report = {}
+        errors = {name: [] for name in QUANTITIES}
+        scales = {name: 0.0 for name in QUANTITIES}
+        for dose, prior in zip(doses, priors):
+            exact = table.exact(dose, prior, steps)
+            for name in QUANTITIES:
+                errors[name].append(np.abs(table.lookup(name, dose, elapsed, prior) - exact[name]).max())
+                scales[name] = max(scales[name], np.abs(exact[name]).max())
+        for name in QUANTITIES:
+            report[f'{name}_max_error'] = float(max(errors[name]))
+            report[f'{name}_relative_error'] = float(max(errors[name]) / scales[name]) if scales[name] else 0.0
+        return report
+
+
+class SurrogateSimulation:
+    def __init__(self, model: SurrogateModel, prior: float = 0.0):
+        """
+        Within-host stand-in for MultiSimulation that reads the state from lookup tables.
+
+        Each strain is looked up independently from an effective inoculum and the time since its
+        first non-zero dose; totals are summed over strains. Re-exposure while infected raises the
+        effective inoculum so that the current virus count grows by count * dt (as MultiSimulation
+        adds it) and keeps the clock. Repeated exposure and strain interaction are therefore
+        approximations; a single infection matches the exact path up to interpolation error
+        (see SurrogateModel.check_accuracy).
+        """
+        self.model = model
+        self.native = model.native
+        self.dt = model.dt
+        self.solver = 'surrogate'  # PopulationEngine 只接受 euler 模拟
+        self.prior = prior
+        self.infected_virus: List[Virus] = []
+        self._tables: List[ResponseTable] = []
+        self._doses: List[float] = []
+        self._started: List[float] = []  # 各毒株首次非零剂量的时刻，尚未开始时为 None
+        self._levels: List[float] = []  # 各毒株当前病毒量的缓存，None 表示需要重新查表
+        self._index: Dict[object, int] = {}
+        self._strain_rows: Dict[int, int] = {}  # STRAINS 编号 -> 毒株序号
+        self.time = 0.0
+
+    def _value(self, name: str, k: int) -> float:
+        if self._started[k] is None:
+            return 0.0 if name in ('virus', 'immune', 'infected') else self.prior
+        return self._tables[k].value(name, self._doses[k], self.time - self._started[k], self.prior)
+
+    def _level(self, k: int) -> float:
+        level = self._levels[k]
+        if level is None:
+            level = self._levels[k] = self._value('virus', k)
+        return level
+
+    def simulate(self, total_time: float):
+        self.time += total_time
+        self._levels = [None] * len(self._levels)
+
+    @property
+    def total_virus(self) -> float:
+        number = 0
+        for k in range(len(self.infected_virus)):
+            number += self._level(k)
+        return number
+
+    @property
+    def immune_cells(self) -> float:
+        return sum(self._value('immune', k) for k in range(len(self.infected_virus)))
+
+    @property
+    def infected_cells(self) -> float:
+        return min(self.native.N, sum(self._value('infected', k) for k in range(len(self.infected_virus))))
+
+    @property
+    def antibodies(self) -> float:
+        return max((self._value('antibodies', k) for k in range(len(self.infected_virus))), default=self.prior)
+
+    @property
+    def death_ratio(self):
+        return self.infected_cells / self.native.N
+
+    def latest_virus(self, id) -> float:
+        return self._level(self._index[id])
+
+    def has_virus(self, id) -> bool:
+        return id in self._index
+
+    def add_virus(self, virus: Virus):
+        k = self._index.get(virus.id)
+        if k is None:
+            self._new_strain(virus, virus.count)
+        else:
+            self._expose(k, virus.count)
+
+    def _new_strain(self, virus: Virus, count: float):
+        k = self._index[virus.id] = len(self.infected_virus)
+        self.infected_virus.append(virus)
+        self._tables.append(self.model.table(virus))
+        self._doses.append(count)
+        self._started.append(self.time if count > 0 else None)
+        self._levels.append(None)
+        self._strain_rows[STRAINS.intern(virus).index] = k
+
+    def _expose(self, k: int, count: float):
+        if not count: return
+        if self._started[k] is None:
+            self._doses[k] += count * self.dt
+            if self._doses[k] > 0:
+                self._started[k] = self.time
+            self._levels[k] = None
+            return
+        # 感染进行中：找一个剂量，使当前病毒量增加 count * dt，感染时钟不变
+        current = self._level(k)
+        self._doses[k] = self._tables[k].rescale(current + abs(count) * self.dt, self._doses[k], current,
+                                                 self.time - self._started[k], self.prior)
+        self._levels[k] = None
+
+    def add_virus_batch(self, strains, doses):
+        if isinstance(strains, np.ndarray): strains = strains.tolist()
+        if isinstance(doses, np.ndarray): doses = doses.tolist()
+        rows = self._strain_rows
+        for index, dose in zip(strains, doses):
+            k = rows.get(index)
+            if k is None:
+                strain = STRAINS[index]
+                k = self._index.get(strain.id)
+                if k is None:
+                    self._new_strain(strain.virus(dose), dose)
+                    continue
+                rows[index] = k
+            self._expose(k, dose)
+
+    @property
+    def strain_indices(self) -> np.ndarray:
+        return np.array([STRAINS.intern(virus).index for virus in self.infected_virus], dtype=int)
+
+    def latest_virus_values(self) -> np.ndarray:
+        return np.array([self._level(k) for k in range(len(self.infected_virus))])
@@ -0,0 +1,133 @@
+import dataclasses
+import itertools
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+from .abm_model import ImmuneAgent, ImmuneEnvironment, ImmuneData, Virus
+
+
+IMMUNE_FIELDS = tuple(field.name for field in dataclasses.fields(ImmuneData))
+
+
+@dataclasses.dataclass
+class SweepJob:
+    index: int
+    params: dict
+    replicate: int
+    seed: int
+
+
+@dataclasses.dataclass
+class SweepResult:
+    index: int
+    params: dict
+    replicate: int
+    seed: int
+    infected_count_history: np.ndarray
+    peak_virus: float
+    final_infected: int
+
+
+def parameter_grid(**axes) -> List[dict]:
+    """返回各参数取值的笛卡尔积，例如 parameter_grid(s=[0.8, 1.2], g1=[0.01, 0.02])"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def job_seed(seed: int, index: int) -> int:
+    """由基准种子和任务编号派生独立的种子，与任务在哪个进程、以什么顺序执行无关"""
+    return int(np.random.SeedSequence(seed, spawn_key=(index,)).generate_state(1)[0])
+
+
+def default_environment(params: dict, rng: random.Random) -> ImmuneEnvironment:
+    """
+    默认的单环境构造函数
+
+    params 中属于 ImmuneData 的键（s、u、g1、g2、m ……）作为所有代理的免疫参数；
+    另外支持 agents（代理数，默认 50）、map_size（默认 (50, 50)）、dose（初始感染剂量，默认 0.1）、
+    infected（初始感染人数，默认 1）和 transmission（默认 'grid'）
+    """
+    data = ImmuneData(**{key: value for key, value in params.items() if key in IMMUNE_FIELDS})
+    env = ImmuneEnvironment(map_size=params.get('map_size', (50, 50)), transmission=params.get('transmission', 'grid'), rng=rng)
+    for k in range(params.get('agents', 50)):
+        agent = ImmuneAgent(id=k, data=data, record_every=0)
+        if k < params.get('infected', 1):
+            agent.add_virus(Virus('virus', params.get('dose', 0.1), data))
+        env.add_agent(agent)
+    return env
+
+
+def run_job(job: SweepJob, build: Callable, steps: int) -> SweepResult:
+    """在当前进程中执行一个任务，只返回紧凑的汇总结果"""
+    env = build(job.params, random.Random(job.seed))
+    peak = 0.0
+    for _ in range(steps):
+        env.step()
+        peak = max(peak, max((getattr(agent, 'virus_level', 0.0) for agent in env.get_agents()), default=0.0))
+    history = np.asarray(env.infected_count_history, dtype=int)
+    return SweepResult(job.index, job.params, job.replicate, job.seed, history, float(peak),
+                       int(history[-1]) if len(history) else 0)
+
+
+def _run_jobs(args) -> List[SweepResult]:
+    jobs, build, steps = args
+    return [run_job(job, build, steps) for job in jobs]
+
+
+def run_sweep(grid: List[dict], steps: int, replicates: int = 1, seed: int = 0, build: Callable = default_environment,
+              workers: int = None, chunksize: int = 1) -> List[SweepResult]:
+    """
+    在进程池中运行 (参数, 重复) 组合的全部任务
+
+    grid: 参数字典列表，见 parameter_grid
+    build: build(params, rng) -> ImmuneEnvironment，必须是可 pickle 的模块级函数，
+           环境内所有随机数都应来自传入的 rng
+    workers: 进程数，默认使用全部 CPU；为 1 时在当前进程中顺序执行
+    每个任务的种子只由 seed 和任务编号决定，所以结果与进程数无关，按任务编号排序返回
+    """
+    jobs = [SweepJob(index, params, replicate, 0)
+            for index, (params, replicate) in enumerate(itertools.product(grid, range(replicates)))]
+    for job in jobs:
+        job.seed = job_seed(seed, job.index)
+    workers = workers or os.cpu_count() or 1
+    batches = [jobs[k:k + chunksize] for k in range(0, len(jobs), chunksize)]
+    if workers == 1 or len(jobs) <= 1:
+        results = [result for batch in batches for result in _run_jobs((batch, build, steps))]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for batch in executor.map(_run_jobs, [(batch, build, steps) for batch in batches])
+                       for result in batch]
+    return sorted(results, key=lambda result: result.index)
+
+
+def _freeze(value):
+    """把参数值转换为可哈希的等价形式：列表、数组转为元组，字典转为排序后的 (键, 值) 元组"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_freeze(item) for item in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items)
+    return value
+
+
+def summarize(results: List[SweepResult]) -> Dict[tuple, dict]:
+    """
+    按参数组合汇总重复实验：平均感染曲线、平均峰值病毒量
+
+    键为排序后的 (参数名, 值) 元组，列表、字典等不可哈希的值按 _freeze 转换；原始参数见每项的 'params'
+    """
+    groups: Dict[tuple, List[SweepResult]] = {}
+    for result in results:
+        groups.setdefault(_freeze(result.params), []).append(result)
+    summary = {}
+    for key, group in groups.items():
+        histories = np.array([result.infected_count_history for result in group], dtype=float)
+        summary[key] = {'params': group[0].params,
+                        'replicates': len(group),
+                        'infected_mean': histories.mean(axis=0),
+                        'peak_virus_mean': float(np.mean([result.peak_virus for result in group]))}
+    return summary
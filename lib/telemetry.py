@@ -0,0 +1,229 @@
+"""
+共享内存中的实时遥测：模拟进程每步把汇总量写入一个环形缓冲区，其他进程随时接入、读取、断开
+
+    env.publish_telemetry('run1')                 # 模拟进程
+    python -m lib.telemetry run1                  # 另一个终端中持续输出新记录
+
+写入方只有一个，不加锁也不等待读取方；每条记录带序号，写入前把序号置为负数，写完再写回正数，
+读取方前后两次读到相同的序号才采用这条记录，被覆盖的记录直接跳过。
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, Iterator, List, Tuple
+from .observer import StepRecord
+
+
+MAGIC = 0x41424D54454C3031  # 'ABMTEL01'
+VERSION = 1
+HEADER = ('magic', 'version', 'capacity', 'fields', 'written', 'closed', 'pid', 'names')
+NAMES_BYTES = 4096  # 字段名（JSON）占用的字节数
+_created = 0
+
+
+def record_fields(thresholds: Iterable[float]) -> Tuple[str, ...]:
+    """TelemetryWriter 写入 StepRecord 时的字段"""
+    return ('step', 'wall_time', 'step_seconds', 'agents', 'new_infections', 'recoveries', 'strain_virus') + \
+        tuple(f'infected>={threshold:g}' for threshold in thresholds)
+
+
+def _layout(buffer, capacity: int, fields: int):
+    header = np.ndarray((len(HEADER),), dtype=np.int64, buffer=buffer)
+    offset = header.nbytes + NAMES_BYTES
+    sequence = np.ndarray((capacity,), dtype=np.int64, buffer=buffer, offset=offset)
+    values = np.ndarray((capacity, fields), dtype=np.float64, buffer=buffer, offset=offset + sequence.nbytes)
+    return header, sequence, values
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    打开已有的共享内存而不登记到 resource_tracker，否则读取方退出时会删除写入方的缓冲区。
+    与写入方在同一进程中时保留写入方的登记
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((len(HEADER),), dtype=np.int64, buffer=memory.buf)
+        if os.name == 'posix' and header[6] != os.getpid():
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        del header
+        return memory
+
+
+class TelemetryWriter:
+    def __init__(self, name: str = None, fields: Tuple[str, ...] = None, capacity: int = 4096,
+                 thresholds: Iterable[float] = (10,), level: float = 10):
+        """
+        在共享内存中创建环形缓冲区，保留最近 capacity 条记录
+
+        name: 共享内存的名字，读取方以它接入；默认由进程号生成，见 self.name
+        fields: 每条记录的字段；默认为 record_fields(thresholds)，此时写入方可以直接作为环境的观察者（见 __call__）
+        thresholds, level: 作为观察者时统计感染人数的阈值与判断新增感染的阈值
+        """
+        global _created
+        self.thresholds = tuple(sorted(set(thresholds) | {level}))
+        self.level = level
+        self.fields = tuple(fields) if fields is not None else record_fields(self.thresholds)
+        self.capacity = capacity
+        names = json.dumps(self.fields).encode()
+        if len(names) > NAMES_BYTES:
+            raise ValueError('Too many telemetry fields')
+        if name is None:
+            _created += 1
+            name = f'abm_{os.getpid()}_{_created}'
+        size = len(HEADER) * 8 + NAMES_BYTES + capacity * 8 * (1 + len(self.fields))
+        self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self._memory.name
+        self._header, self._sequence, self._values = _layout(self._memory.buf, capacity, len(self.fields))
+        self._memory.buf[self._header.nbytes:self._header.nbytes + len(names)] = names
+        self._sequence[:] = 0
+        self._header[:] = (MAGIC, VERSION, capacity, len(self.fields), 0, 0, os.getpid(), len(names))
+        self._written = 0
+        self._last = None
+
+    def publish(self, values):
+        """写入一条记录（按 fields 的顺序），不等待读取方"""
+        self._written += 1
+        slot = (self._written - 1) % self.capacity
+        self._sequence[slot] = -self._written  # 写入中
+        self._values[slot] = values
+        self._sequence[slot] = self._written
+        self._header[4] = self._written
+
+    def __call__(self, record: StepRecord):
+        """作为 ImmuneEnvironment 的观察者：把一步的汇总量写入缓冲区；step_seconds 为距上一条记录的耗时"""
+        now = time.perf_counter()
+        seconds = now - self._last if self._last is not None else float('nan')
+        self._last = now
+        self.publish([record.step, time.time(), seconds, record.agent_count, record.new_infections,
+                      record.recoveries, sum(record.strain_virus.values())]
+                     + [record.infected.get(threshold, 0) for threshold in self.thresholds])
+
+    def close(self, unlink: bool = True):
+        """标记结束；unlink 为 True 时删除共享内存（已接入的读取方仍可读完）"""
+        if self._memory is None: return
+        self._header[5] = 1
+        self._header = self._sequence = self._values = None
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TelemetryReader:
+    def __init__(self, name: str):
+        """接入名为 name 的遥测缓冲区；只读，可以随时创建与 close，不影响写入方"""
+        self._memory = _attach(name)
+        header = np.ndarray((len(HEADER),), dtype=np.int64, buffer=self._memory.buf)
+        if header[0] != MAGIC or header[1] != VERSION:
+            self._memory.close()
+            raise ValueError(f'{name} is not a telemetry buffer')
+        self.name = name
+        self.capacity, count, length = int(header[2]), int(header[3]), int(header[7])
+        self.fields: Tuple[str, ...] = tuple(json.loads(bytes(self._memory.buf[header.nbytes:header.nbytes + length])))
+        self.pid = int(header[6])
+        self._header, self._sequence, self._values = _layout(self._memory.buf, self.capacity, count)
+        self.position = 0  # 已读到的序号
+        self.dropped = 0  # 读取太慢而被覆盖的记录数
+
+    @property
+    def written(self) -> int:
+        return int(self._header[4])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[5])
+
+    def seek_latest(self, history: int = 0):
+        """跳到最新记录之前 history 条的位置"""
+        self.position = max(0, self.written - history)
+
+    def read(self) -> List[Tuple[int, np.ndarray]]:
+        """读取上次之后的新记录 [(序号, 值)]；期间被写入方覆盖的记录跳过并计入 dropped"""
+        written = self.written
+        first = max(self.position + 1, written - self.capacity + 1)
+        self.dropped += first - self.position - 1
+        records = []
+        for number in range(first, written + 1):
+            slot = (number - 1) % self.capacity
+            before = self._sequence[slot]
+            values = self._values[slot].copy()
+            if before == number and self._sequence[slot] == number:
+                records.append((number, values))
+            else:
+                self.dropped += 1
+        self.position = written
+        return records
+
+    def follow(self, interval: float = 0.5) -> Iterator[Tuple[int, np.ndarray]]:
+        """持续产出新记录，写入方关闭且已读完时结束"""
+        while True:
+            closed = self.closed
+            yield from self.read()
+            if closed: return
+            time.sleep(interval)
+
+    def close(self):
+        if self._memory is None: return
+        self._header = self._sequence = self._values = None
+        self._memory.close()
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _format(value: float, field: str = '') -> str:
+    if field == 'wall_time':
+        return f'{value:.3f}'  # Unix 秒，.6g 只能精确到 1e4 秒
+    return f'{value:.0f}' if math.isfinite(value) and value == int(value) and abs(value) < 1e15 else f'{value:.6g}'
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog='python -m lib.telemetry', description='Tail the live telemetry of a running simulation.')
+    parser.add_argument('name', help='shared memory name printed by the simulation (TelemetryWriter.name)')
+    parser.add_argument('--interval', type=float, default=0.5, help='polling interval in seconds')
+    parser.add_argument('--history', type=int, default=10, help='records already in the buffer to print first')
+    parser.add_argument('--fields', nargs='*', help='only print these fields')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per record')
+    args = parser.parse_args(argv)
+
+    try:
+        reader = TelemetryReader(args.name)
+    except FileNotFoundError:
+        sys.exit(f'No telemetry buffer named {args.name}')
+    with reader:
+        fields = args.fields or list(reader.fields)
+        columns = [reader.fields.index(field) for field in fields]
+        reader.seek_latest(args.history)
+        if not args.json:
+            print('\t'.join(fields), flush=True)
+        try:
+            for _, values in reader.follow(args.interval):
+                if args.json:
+                    print(json.dumps({field: float(values[k]) for field, k in zip(fields, columns)}), flush=True)
+                else:
+                    print('\t'.join(_format(float(values[k]), field) for field, k in zip(fields, columns)), flush=True)
+        except KeyboardInterrupt:
+            pass
+        if reader.dropped:
+            print(f'# {reader.dropped} records were overwritten before they could be read', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
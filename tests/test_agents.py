@@ -0,0 +1,41 @@
+import dataclasses
+import random
+import tracemalloc
+import pytest
+from lib.abm_model import Agent, Environment, ImmuneAgent, ImmuneData, PopulationEngine
+
+
+def bytes_per_agent(build, n: int = 5000) -> float:
+    tracemalloc.start()
+    try:
+        agents = build(n)
+        return tracemalloc.get_traced_memory()[0] / len(agents)
+    finally:
+        tracemalloc.stop()
+
+
+def test_agent_memory():
+    data = ImmuneData()
+    engine = PopulationEngine(capacity=5000)
+    # 引擎中的代理不保存自己的延迟缓冲区与历史；独立代理以 record_every=0 关闭逐步记录
+    assert bytes_per_agent(lambda n: [ImmuneAgent(id=k, engine=engine, data=data) for k in range(n)]) < 1024
+    assert bytes_per_agent(lambda n: [ImmuneAgent(id=k, data=data, record_every=0) for k in range(n)]) < 4096
+
+
+def test_agents_accept_extra_attributes():
+    env = Environment(id='e', rng=random.Random(0))
+    plain, immune = Agent(id='p'), ImmuneAgent(id='i')
+    plain.group = immune.group = 'a'
+    env.add_agents([plain, immune, Agent(id='q')])
+    assert env.filter_agents('group', 'a') == [plain, immune]
+
+
+def test_immune_data_and_dt_are_read_only():
+    data = ImmuneData()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        data.s = 2.0
+    assert dataclasses.replace(data, s=2.0).s == 2.0 and data.s == 0.8
+    agent = ImmuneAgent(dt=0.05, data=data)
+    assert agent.dt == agent.virus_simulation.dt == 0.05
+    with pytest.raises(AttributeError):
+        agent.dt = 0.01
@@ -0,0 +1,52 @@
+import random
+from lib.school import Canteen, Class, School
+from lib.abm_model import ImmuneAgent, ImmuneData, PopulationEngine, Virus
+from lib.checkpoint import load_checkpoint, save_checkpoint
+
+
+def build() -> School:
+    school = School(id='school', map_size=(30, 30), rng=random.Random(0))
+    canteen = Canteen(id='canteen', map_size=(20, 20), rng=random.Random(1), transmission='grid')
+    school.add(canteen)
+    engine = PopulationEngine()
+    for k, transmission in enumerate(('grid', 'field', 'pairwise')):
+        room = Class(id=f'class{k}', map_size=(20, 20), rng=random.Random(10 + k), transmission=transmission,
+                     engine=engine if k < 2 else None, sparse=k == 0)
+        for j in range(25):
+            agent = ImmuneAgent(id=f'{k}_{j}', record_every=0)
+            if j == 0: agent.add_virus(Virus('v', 50.0, ImmuneData()))
+            if j == 1 and k == 1: agent.add_virus(Virus('w', 30.0, ImmuneData(s=1.0, g2=0.02), native=0.5))
+            room.add_agent(agent)
+        school.add(room)
+    canteen.add_agents([ImmuneAgent(id=f'c{j}', data=ImmuneData(N=80), record_every=0) for j in range(10)])
+    school._sub_env[1].add_index('virus_level', 10)
+    return school
+
+
+def advance(root: School, steps: int):
+    for _ in range(steps):
+        for env in root.environments():
+            env.step()
+        classes = root._sub_env
+        classes[1].transfer_agents_to(classes[0], classes[1]._agents[:2])
+        classes[0].transfer_agents_to(classes[3], classes[0]._agents[:1])
+
+
+def state(root: School):
+    return [(env.id, type(env).__name__, env.infected_count_history,
+             [(agent.id, agent.position, float(agent.virus_simulation.total_virus),
+               float(agent.virus_simulation.immune_cells), float(agent.virus_simulation.antibodies)) for agent in env._agents])
+            for env in root.environments()]
+
+
+def test_checkpoint_round_trip_continues_identically(tmp_path):
+    root = build()
+    advance(root, 20)
+    path = str(tmp_path / 'run.npz')
+    save_checkpoint(path, root)
+    advance(root, 20)
+    restored = load_checkpoint(path)
+    advance(restored, 20)
+    assert state(restored) == state(root)
+    assert restored._sub_env[1].index('virus_level', 10) is not None
+    assert restored._sub_env[1].count_infected(10) == root._sub_env[1].count_infected(10)
@@ -0,0 +1,17 @@
+import numpy as np
+from lib.iiim_model import ImmuneData, MultiSimulation, Virus
+
+
+def test_column_totals_match_recount():
+    for record_every in (1, 3):
+        sim = MultiSimulation(ImmuneData(), 1e-2, record_every=record_every)
+        sim.add_virus(Virus('a', 1.0, ImmuneData()))
+        sim.add_virus(Virus('b', 2.0, ImmuneData(s=0.7)))
+        sim.simulate(0.3)
+        sim.add_virus(Virus('c', 3.0, ImmuneData(s=0.9)))
+        sim.add_virus(Virus('a', 1.0, ImmuneData()))
+        sim.simulate(0.3)
+        history = sim.virus_values
+        recount = np.sum([history.history(id) for id in history.ids], axis=0)
+        np.testing.assert_allclose(history.total, recount, rtol=1e-12, atol=1e-12)
+        assert history.total[0] == 3.0
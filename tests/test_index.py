@@ -0,0 +1,38 @@
+import random
+import pytest
+from lib.abm_model import ImmuneAgent, ImmuneData, ImmuneEnvironment, PopulationEngine, Virus
+
+
+def assert_matches_recount(env: ImmuneEnvironment):
+    for (attribute, threshold), index in env._indexes.items():
+        keys = [index.key(agent) for agent in env._agents]
+        for value in set(keys) | set(index.values()):
+            assert sorted(index.slots(value)) == [slot for slot, key in enumerate(keys) if key == value]
+            assert index.count(value) == keys.count(value)
+
+
+@pytest.mark.parametrize('engine,sparse', [(False, False), (True, False), (True, True)])
+def test_indexes_match_recount_through_adds_and_removals(engine, sparse):
+    rng = random.Random(5)
+    env = ImmuneEnvironment(id='e', map_size=(10, 10), engine=PopulationEngine() if engine else None,
+                            sparse=sparse, rng=random.Random(5))
+    env.add_agents([ImmuneAgent(id=k, record_every=0) for k in range(40)])
+    env._agents[0].add_virus(Virus('v', 5.0, ImmuneData()))
+    env.add_index('virus_level', 1.0)
+    env.add_index('immunity_level', 0.5)
+    for t in range(60):
+        env.step()
+        if t % 7 == 3:
+            env.remove_agents(rng.sample(list(env._agents), 3))
+        if t % 5 == 1:
+            env.add_agents([ImmuneAgent(id=f'n{t}_{k}', record_every=0) for k in range(2)])
+        assert_matches_recount(env)
+    assert env.index('virus_level', 1.0).count(True) > 0
+
+
+def test_reindex_rejects_foreign_agents():
+    env = ImmuneEnvironment(id='e', rng=random.Random(0))
+    env.add_agent(ImmuneAgent(id='a'))
+    env.add_index('virus_level', 1.0)
+    with pytest.raises(ValueError, match='not in environment'):
+        env.reindex([ImmuneAgent(id='stranger')])
@@ -0,0 +1,43 @@
+import random
+import pytest
+from lib.abm_model import ImmuneAgent, ImmuneData, ImmuneEnvironment, PopulationEngine, Virus
+
+
+def assert_matches_recount(env: ImmuneEnvironment):
+    aggregates = env.aggregates
+    levels = [agent.virus_level for agent in env._agents]
+    assert aggregates.infected == {threshold: sum(level >= threshold for level in levels) for threshold in aggregates.thresholds}
+    # 每个下标记录的仍是该下标处代理的值（交换删除之后也对齐）
+    assert aggregates._levels == levels
+    # 毒株病毒量取推进之后、传播之前的值，与逐下标记录的值之和一致
+    strains = {}
+    for recorded in aggregates._strains:
+        for sid, value in recorded.items():
+            strains[sid] = strains.get(sid, 0.0) + value
+    assert aggregates.strain_virus.keys() >= strains.keys()
+    for sid, value in aggregates.strain_virus.items():
+        assert value == pytest.approx(strains.get(sid, 0.0), abs=1e-6)
+
+
+@pytest.mark.parametrize('transmission,engine,sparse', [
+    ('pairwise', False, False), ('field', False, False), ('grid', True, False), ('grid', True, True)])
+def test_aggregates_match_recount_through_adds_and_removals(transmission, engine, sparse):
+    rng = random.Random(7)
+    env = ImmuneEnvironment(id='e', map_size=(10, 10), engine=PopulationEngine() if engine else None,
+                            transmission=transmission, sparse=sparse, rng=random.Random(7))
+    env.add_agents([ImmuneAgent(id=k, record_every=0) for k in range(30)])
+    env._agents[0].add_virus(Virus('v', 20.0, ImmuneData()))
+    env.observe(thresholds=(1, 10))
+    left = []
+    for t in range(50):
+        env.step()
+        assert_matches_recount(env)
+        if t % 6 == 2:
+            left += env.remove_agents(rng.sample(list(env._agents), 3))
+        if t % 4 == 1:
+            joining = [ImmuneAgent(id=f'n{t}', record_every=0)] + left[:1]
+            del left[:1]
+            env.add_agents(joining)
+        assert_matches_recount(env)
+        assert env.count_infected(10) == sum(agent.virus_level >= 10 for agent in env._agents)
+    assert env.aggregates.total_infections > 0
@@ -0,0 +1,70 @@
+import numpy as np
+from lib.iiim_model import ImmuneData, MultiSimulation, Virus
+from lib.population import PopulationEngine
+
+
+def infected(d: int = 500) -> MultiSimulation:
+    sim = MultiSimulation(ImmuneData(), 1e-2, d=d, record_every=0)
+    sim.add_virus(Virus('a', 5.0, ImmuneData()))
+    sim.simulate(3)
+    sim.add_virus(Virus('b', 2.0, ImmuneData(s=1.5, g2=0.03), native=0.5))
+    sim.simulate(2)
+    return sim
+
+
+def state(sim):
+    return [float(sim.infected_cells), float(sim.immune_cells), float(sim.antibodies)] + \
+        [float(sim.latest_virus(virus.id)) for virus in sim.infected_virus]
+
+
+def test_engine_matches_multisimulation_bit_for_bit():
+    engine = PopulationEngine(d=500)
+    references = [infected(), MultiSimulation(ImmuneData(N=80), 1e-2, record_every=0)]
+    views = [engine.adopt(infected()), engine.adopt(MultiSimulation(ImmuneData(N=80), 1e-2, record_every=0))]
+    views.append(engine.spawn(ImmuneData(N=120)))
+    references.append(MultiSimulation(ImmuneData(N=120), 1e-2, record_every=0))
+    for day in range(6):
+        dose = Virus('c', 1.0 + day, ImmuneData(s=1.8))
+        for sim in references + views:
+            sim.add_virus(dose)
+        for sim in references:
+            sim.simulate(0.5)
+        engine.simulate(0.5)
+        for reference, view in zip(references, views):
+            assert state(view) == state(reference)
+            assert [virus.id for virus in view.infected_virus] == [virus.id for virus in reference.infected_virus]
+
+
+def test_release_restores_an_equivalent_multisimulation():
+    engine = PopulationEngine(d=50)
+    reference = infected(d=50)
+    view = engine.adopt(infected(d=50))
+    engine.simulate(1.0)
+    reference.simulate(1.0)
+    released = engine.release(view.row)
+    released.simulate(1.0)
+    reference.simulate(1.0)
+    assert state(released) == state(reference)
+    assert engine.rows().tolist() == []
+
+
+def test_idle_rows_catch_up_in_closed_form():
+    dense, sparse = PopulationEngine(d=50), PopulationEngine(d=50)
+    for engine in (dense, sparse):
+        sim = MultiSimulation(ImmuneData(), 1e-2, d=50, record_every=0)
+        sim.immune_cells, sim.antibodies = 30.0, 12.0
+        sim.add_virus(Virus('a', 0.0, ImmuneData(m=0.05, g2=0.03, g3=0.2)))
+        engine.adopt(sim)
+    assert sparse.idle([0]).all()
+    for k in range(7):
+        dense.simulate(0.1 * (k + 1))
+        sparse.simulate(0.1 * (k + 1), sparse=True)
+    assert sparse.lag[0] > 0
+    np.testing.assert_allclose(sparse.immune_cells([0]), dense.M[:1], rtol=1e-12)
+    sparse.sync()
+    for name in ('M', 'A', 'Ab'):
+        np.testing.assert_allclose(getattr(sparse, name)[:1], getattr(dense, name)[:1], rtol=1e-12)
+    for name in ('infected_buf', 'immune_buf'):  # 延迟缓冲区按 buf_row 存放
+        np.testing.assert_allclose(getattr(sparse, name)[sparse.buf_row[0]], getattr(dense, name)[dense.buf_row[0]], rtol=1e-12)
+    assert dense.immune_buf[dense.buf_row[0]].any()
+    assert sparse.buf_pos[0] == dense.buf_pos[0] and sparse.buf_count[0] == dense.buf_count[0]
@@ -0,0 +1,30 @@
+import numpy as np
+from lib.iiim_model import ImmuneData, MultiSimulation, Virus
+
+
+def run(dt: float, **kwargs) -> MultiSimulation:
+    sim = MultiSimulation(ImmuneData(), dt, d=round(5 / dt), **kwargs)  # 延迟固定为 5 天
+    sim.add_virus(Virus('a', 0.1, ImmuneData()))
+    sim.simulate(10)
+    sim.add_virus(Virus('b', 1.5, ImmuneData(s=2)))
+    sim.simulate(20)
+    return sim
+
+
+def relative_errors(dt: float):
+    euler, rk45 = run(dt), run(dt, solver='rk45', rtol=1e-8, atol=1e-10)
+    errors = {}
+    for name in ('infected_values', 'immune_values', 'antibody_native_values'):
+        a, b = np.array(getattr(euler, name)), np.array(getattr(rk45, name))
+        assert a.shape == b.shape
+        errors[name] = np.abs(a - b).max() / np.abs(a).max()
+    a, b = np.asarray(euler.req_all_virus_history()), np.asarray(rk45.req_all_virus_history())
+    errors['virus'] = np.abs(a - b).max() / np.abs(a).max()
+    return errors
+
+
+def test_rk45_agrees_with_euler_at_small_dt():
+    coarse, fine = relative_errors(1e-2), relative_errors(1e-3)
+    for name, error in fine.items():
+        assert error < 5e-3, name
+        assert error < coarse[name], name  # Euler 随 dt 减小向 rk45 收敛
@@ -0,0 +1,77 @@
+import random
+import numpy as np
+from lib.abm_model import ImmuneAgent, ImmuneEnvironment, ImmuneData, PopulationEngine, Virus
+
+
+def build(sparse: bool, transmission: str = 'pairwise') -> ImmuneEnvironment:
+    env = ImmuneEnvironment(id='e', map_size=(12, 12), engine=PopulationEngine(), sparse=sparse,
+                            transmission=transmission, rng=random.Random(3))
+    for k in range(30):
+        agent = ImmuneAgent(id=f'a{k}')
+        if k == 0: agent.add_virus(Virus('v', 50.0, ImmuneData()))
+        env.add_agent(agent)
+    return env
+
+
+def clearance_and_reinfection(sparse: bool, transmission: str):
+    env = build(sparse, transmission)
+    for _ in range(300):
+        env.step()
+    assert env.count_infected(1e-9) == 0  # 病毒已清除，所有代理都空闲
+    new = ImmuneAgent(id='new')
+    env.add_agent(new)
+    env.step()
+    slots = [virus.id for virus in new.virus_simulation.infected_virus]
+    env._agents[3].add_virus(Virus('v', 40.0, ImmuneData()))
+    env._agents[5].add_virus(Virus('w', 40.0, ImmuneData(s=1.0)))
+    for _ in range(150):
+        env.step()
+    strains = [[virus.id for virus in agent.virus_simulation.infected_virus] for agent in env._agents]
+    levels = np.array([agent.virus_simulation.total_virus for agent in env._agents])
+    immune = np.array([agent.virus_simulation.immune_cells for agent in env._agents])
+    return slots, strains, levels, immune, env.infected_count_history
+
+
+def test_sparse_matches_dense_through_clearance_and_reinfection():
+    for transmission in ('pairwise', 'grid'):
+        dense = clearance_and_reinfection(False, transmission)
+        sparse = clearance_and_reinfection(True, transmission)
+        # 空闲代理仍以 0 剂量登记毒株槽位，新加入的代理与密集模式一样持有该毒株
+        assert dense[0] == sparse[0] == ['v']
+        assert dense[1] == sparse[1]
+        # 空闲期的衰减以闭式解补上，只有舍入误差
+        np.testing.assert_allclose(sparse[2], dense[2], rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(sparse[3], dense[3], rtol=1e-9, atol=1e-9)
+        assert dense[4] == sparse[4]
+
+
+class CountingAgent(ImmuneAgent):
+    writes = 0
+
+    @property
+    def virus_level(self):
+        return self._virus_level
+
+    @virus_level.setter
+    def virus_level(self, value):
+        CountingAgent.writes += 1
+        self._virus_level = value
+
+
+def test_sparse_step_only_touches_active_rows():
+    env = ImmuneEnvironment(id='e', map_size=(100, 100), engine=PopulationEngine(), sparse=True, rng=random.Random(3))
+    env.add_agents([CountingAgent(id=k) for k in range(400)])
+    env._agents[0].add_virus(Virus('v', 50.0, ImmuneData()))
+    env.observe()
+    env.add_index('virus_level', 10)
+    for _ in range(5):
+        env.step()
+    engine = env.engine
+    rows = np.array([agent.virus_simulation.row for agent in env._agents])
+    active = int((~engine.idle(rows)).sum())  # 本步会推进的行
+    CountingAgent.writes = 0
+    env.step()
+    assert 0 < CountingAgent.writes == active < len(env._agents) // 10
+    # 跳过的代理保持空闲：病毒量为 0，汇总量与索引仍与逐个代理重新统计的结果一致
+    assert all(agent.virus_level == 0 for agent, row in zip(env._agents, rows) if engine.lag[row] > 0)
+    assert env.count_infected(10) == env.index('virus_level', 10).count(True) == sum(agent.virus_level >= 10 for agent in env._agents)
@@ -0,0 +1,54 @@
+import random
+import numpy as np
+import pytest
+from lib.abm_model import ImmuneAgent, ImmuneData, ImmuneEnvironment, PopulationEngine, Virus
+from lib.spatial import ArrayGridIndex, GridIndex
+
+
+def build(engine: bool, transmission: str) -> ImmuneEnvironment:
+    env = ImmuneEnvironment(id='e', map_size=(30, 30), engine=PopulationEngine() if engine else None,
+                            transmission=transmission, rng=random.Random(3))
+    agents = [ImmuneAgent(id=k % 57, record_every=0) for k in range(60)]  # 含重复 id
+    agents[0].add_virus(Virus('a', 0.5, ImmuneData()))
+    agents[1].add_virus(Virus('b', 0.3, ImmuneData(s=1.5), native=0.3))
+    env.add_agents(agents)
+    return env
+
+
+def snapshot(env: ImmuneEnvironment):
+    return [(agent.position, [virus.id for virus in agent.virus_simulation.infected_virus],
+             float(agent.virus_simulation.total_virus), float(agent.virus_simulation.immune_cells)) for agent in env._agents]
+
+
+@pytest.mark.parametrize('engine', [False, True])
+def test_grid_matches_pairwise(engine):
+    pairwise, grid = build(engine, 'pairwise'), build(engine, 'grid')
+    for _ in range(40):
+        pairwise.step()
+        grid.step()
+    assert pairwise.infected_count_history == grid.infected_count_history
+    assert snapshot(pairwise) == snapshot(grid)
+    assert max(pairwise.infected_count_history) > 0
+
+
+def test_grid_index_neighbours_cover_the_radius():
+    rng = random.Random(0)
+    agents = [ImmuneAgent(id=k, position=(rng.randrange(40), rng.randrange(40))) for k in range(300)]
+    grid = GridIndex(5.0)
+    grid.rebuild(agents)
+    for agent in agents[:30]:
+        near = {id(other) for other in grid.neighbours(agent.position)}
+        assert all(id(other) in near for other in agents if agent.calculate_distance(other) <= 5.0)
+
+
+def test_array_grid_index_matches_grid_index():
+    rng = random.Random(1)
+    agents = [ImmuneAgent(id=k, position=(rng.randrange(-5, 40), rng.randrange(60))) for k in range(400)]
+    grid = GridIndex(5.0)
+    grid.rebuild(agents)
+    array = ArrayGridIndex(np.array([agent.position for agent in agents]), 5.0)
+    slot = {id(agent): k for k, agent in enumerate(agents)}
+    for k, agent in enumerate(agents[:50]):
+        assert array.neighbours(k).tolist() == sorted(slot[id(other)] for other in grid.neighbours(agent.position))
+        wide = set(array.neighbours(k, 12.0).tolist())
+        assert all(j in wide for j, other in enumerate(agents) if agent.calculate_distance(other) <= 12.0)
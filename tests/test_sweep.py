@@ -0,0 +1,17 @@
+import numpy as np
+from lib.sweep import parameter_grid, run_sweep, summarize
+
+
+def test_results_do_not_depend_on_workers():
+    grid = parameter_grid(s=[0.8, 1.2], agents=[20], map_size=[(15, 15)])
+    runs = {workers: run_sweep(grid, steps=15, replicates=2, seed=4, workers=workers) for workers in (0, 1, 2)}
+    reference = runs[1]
+    assert [result.index for result in reference] == list(range(4))
+    for results in runs.values():
+        for result, expected in zip(results, reference):
+            assert (result.index, result.params, result.seed) == (expected.index, expected.params, expected.seed)
+            np.testing.assert_array_equal(result.infected_count_history, expected.infected_count_history)
+            assert result.peak_virus == expected.peak_virus
+            assert result.final_infected == expected.final_infected
+    summary = summarize(runs[2])
+    assert len(summary) == 2 and all(entry['params']['map_size'] == (15, 15) for entry in summary.values())
@@ -0,0 +1,59 @@
+import random
+from multiprocessing import shared_memory
+from lib.abm_model import ImmuneAgent, ImmuneData, ImmuneEnvironment, PopulationEngine, Virus
+from lib.telemetry import TelemetryReader, TelemetryWriter, main, record_fields
+
+
+def unlink(name: str):
+    memory = shared_memory.SharedMemory(name=name)
+    memory.close()
+    memory.unlink()
+
+
+def test_reader_sees_records_in_order_and_counts_overwritten_ones():
+    with TelemetryWriter(fields=('a', 'b'), capacity=4) as writer:
+        with TelemetryReader(writer.name) as reader:
+            assert reader.fields == ('a', 'b') and reader.capacity == 4
+            for k in range(3):
+                writer.publish([k, 10 * k])
+            assert [(number, values.tolist()) for number, values in reader.read()] == [(1, [0, 0]), (2, [1, 10]), (3, [2, 20])]
+            assert reader.read() == []
+            for k in range(3, 10):
+                writer.publish([k, 10 * k])
+            assert [number for number, _ in reader.read()] == [7, 8, 9, 10]  # 4..6 已被覆盖
+            assert reader.dropped == 3
+            reader.seek_latest(2)
+            assert [values[0] for _, values in reader.read()] == [8, 9]
+            assert not reader.closed
+        late = TelemetryReader(writer.name)  # 随时接入，从头读取缓冲区中仍保留的记录
+    # 写入方关闭并删除共享内存后，已接入的读取方仍可读完
+    assert late.closed
+    assert [number for number, _ in late.follow(interval=0)] == [7, 8, 9, 10]
+    late.close()
+
+
+def test_environment_publishes_step_records(capsys):
+    env = ImmuneEnvironment(id='e', map_size=(10, 10), engine=PopulationEngine(), rng=random.Random(1))
+    agents = [ImmuneAgent(id=k, record_every=0) for k in range(20)]
+    agents[0].add_virus(Virus('v', 50.0, ImmuneData()))
+    env.add_agents(agents)
+    writer = env.publish_telemetry(capacity=64, thresholds=(1,))
+    for _ in range(5):
+        env.step()
+    with TelemetryReader(writer.name) as reader:
+        assert reader.fields == record_fields((1, 10))
+        records = reader.read()
+    assert [values[0] for _, values in records] == [1, 2, 3, 4, 5]
+    assert [values[reader.fields.index('infected>=10')] for _, values in records] == env.infected_count_history
+    assert all(values[reader.fields.index('agents')] == 20 for _, values in records)
+
+    env.observers.remove(writer)
+    writer.close(unlink=False)
+    try:
+        main([writer.name, '--interval', '0', '--fields', 'step', 'wall_time'])
+    finally:
+        unlink(writer.name)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == 'step\twall_time' and len(lines) == 6
+    step, wall_time = lines[-1].split('\t')
+    assert step == '5' and len(wall_time.split('.')[1]) == 3  # wall_time 精确到毫秒
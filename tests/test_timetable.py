@@ -0,0 +1,63 @@
+import random
+import pytest
+from lib.abm import Environment, MoveTo, Schedule, Stay
+from lib.abm_model import ImmuneAgent
+
+
+def build():
+    school = Environment(id='school', rng=random.Random(0))
+    classes = [Environment(id=f'class{k}', rng=random.Random(k + 1)) for k in range(2)]
+    canteen, ground = Environment(id='canteen', rng=random.Random(5)), Environment(id='ground', rng=random.Random(6))
+    school.add(classes + [canteen, ground])
+    for k, room in enumerate(classes):
+        room.add_agents([ImmuneAgent(id=f'{k}_{j}', record_every=0) for j in range(6)])
+    return school, classes, canteen, ground
+
+
+def locations(school: Environment) -> dict:
+    return {agent.id: env.id for env in school.environments() for agent in env._agents}
+
+
+def test_timetable_moves_cohorts_between_periods():
+    school, classes, canteen, ground = build()
+    plan = Schedule(periods=3)
+    for room in classes:
+        plan.add(room, canteen, periods=1)
+    plan.add(classes[0], MoveTo(ground), periods=2)
+    plan.add(classes[0], Stay, periods=2, cohort=classes[0]._agents[:2])  # 后加入的安排覆盖先加入的
+    table = plan.compile(school)
+
+    assert table.advance() == 0  # 第 0 个时段都在各自的班级
+    assert locations(school) == {f'{k}_{j}': f'class{k}' for k in range(2) for j in range(6)}
+    assert table.advance() == 12
+    assert set(locations(school).values()) == {'canteen'}
+    assert len(canteen._agents) == 12
+    assert table.advance() == 12  # 都离开食堂：1 班回教室，0 班除两人外去操场
+    where = locations(school)
+    assert [where[f'0_{j}'] for j in range(6)] == ['class0', 'class0'] + ['ground'] * 4
+    assert all(where[f'1_{j}'] == 'class1' for j in range(6))
+    assert table.advance() == 4 and table.period == 0
+    assert locations(school) == {f'{k}_{j}': f'class{k}' for k in range(2) for j in range(6)}
+
+
+def test_timetable_jumps_and_skips_removed_agents():
+    school, classes, canteen, ground = build()
+    plan = Schedule(periods=2)
+    plan.add(classes[0], canteen, periods=1)
+    table = plan.compile(school)
+    gone = classes[0]._agents[0]
+    classes[0].remove_agent(gone)
+    assert table.apply(1) == 5
+    assert gone not in canteen and len(canteen._agents) == 5
+    assert [(table.envs[s].id, table.envs[t].id, len(m)) for s, t, m in table.moves(0)] == [('canteen', 'class0', 6)]
+    assert table.apply(0) == 5
+
+
+def test_schedule_rejects_foreign_environments():
+    school, classes, canteen, ground = build()
+    plan = Schedule(periods=2)
+    with pytest.raises(ValueError):
+        plan.add(classes[0], canteen, periods=2)
+    plan.add(classes[0], Environment(id='elsewhere'), periods=1)
+    with pytest.raises(ValueError):
+        plan.compile(school)